@@ -0,0 +1,202 @@
+"""
+Command line tools for the RCP Database Editor.
+
+    python src/cli.py import Race races.jsonl --batch-size 2000 --upsert
+    python src/cli.py export Race DT_Race.csv
+    python src/cli.py tags Config/DefaultGameplayTags.ini
+    python src/cli.py migrate --dry-run
+    python src/cli.py text-index
+    python src/cli.py move Race Race.Elf.Wood Race.Sylvan.Wood
+
+Connection settings come from the same .env as the editor unless --uri/--db
+are given.
+"""
+import argparse
+import json
+import sys
+import time
+from pymongo import errors
+from forms.form_data import COLLECTION_TYPES
+from db.mongo_handler import MongoDBHandler
+
+def connect(args: argparse.Namespace) -> MongoDBHandler:
+    from env import MONGO_URI, MONGO_DB_NAME
+    db_handler = MongoDBHandler(args.uri or MONGO_URI, args.db or MONGO_DB_NAME)
+    if not db_handler.connect():
+        sys.exit(2)
+    return db_handler
+
+def run_import(args: argparse.Namespace) -> int:
+    from db.bulk_importer import import_file
+    db_handler = connect(args)
+    started = time.monotonic()
+
+    def progress(report, done: int, total: int) -> None:
+        percent = 100 * done / total if total else 100
+        rate = report.read / max(time.monotonic() - started, 1e-6) * 60
+        print(f"\r{percent:5.1f}%  {report.summary()}  ({rate:,.0f} records/min)", end='', file=sys.stderr, flush=True)
+
+    try:
+        report = import_file(
+            db_handler.db, args.collection, args.path, fmt=args.format,
+            batch_size=args.batch_size, upsert=args.upsert, progress=None if args.quiet else progress,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 2
+    finally:
+        db_handler.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(report.summary())
+    if args.errors:
+        with open(args.errors, 'w', encoding='utf-8') as f:
+            for error in report.errors:
+                f.write(json.dumps(error.model_dump()) + '\n')
+    else:
+        for error in report.errors:
+            print(f"Row {error.row}{f' ({error.full_tag})' if error.full_tag else ''}: {error.message}", file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f"... {report.failed - len(report.errors)} more errors not shown", file=sys.stderr)
+    for warning in report.warnings:
+        print(f"Row {warning.row}{f' ({warning.full_tag})' if warning.full_tag else ''} skipped: {warning.message}", file=sys.stderr)
+    return 1 if report.failed else 0
+
+def run_export(args: argparse.Namespace) -> int:
+    from db.datatable_exporter import export_collection
+    db_handler = connect(args)
+
+    def progress(written: int, total: int) -> None:
+        print(f"\r{written} / {max(total, written)} rows", end='', file=sys.stderr, flush=True)
+
+    try:
+        count = export_collection(
+            db_handler.db, args.collection, args.path, fmt=args.format,
+            batch_size=args.batch_size, progress=None if args.quiet else progress, effective=args.effective,
+        )
+    except (OSError, ValueError) as e:
+        print(f"\nExport failed: {e}", file=sys.stderr)
+        return 2
+    finally:
+        db_handler.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Exported {count} rows to {args.path}")
+    return 0
+
+def run_tags(args: argparse.Namespace) -> int:
+    from db.gameplay_tags_exporter import export_gameplay_tags
+    db_handler = connect(args)
+    try:
+        summary = export_gameplay_tags(db_handler.db, args.path, cache_path=args.cache, batch_size=args.batch_size)
+    except OSError as e:
+        print(f"Tag export failed: {e}", file=sys.stderr)
+        return 2
+    finally:
+        db_handler.close()
+    state = f"wrote {args.path}" if summary['written'] else f"{args.path} already up to date"
+    print(f"{summary['tags']} tags; {summary['changed']} documents changed, {summary['removed']} removed; {state}")
+    return 0
+
+def run_migrate(args: argparse.Namespace) -> int:
+    from db.migrations import MigrationRunner
+    db_handler = connect(args)
+    runner = MigrationRunner(db_handler.db, batch_size=args.batch_size)
+    try:
+        pending = runner.pending()
+        if args.list or not pending:
+            for migration in runner.migrations:
+                state = runner.state(migration).get('state', 'pending')
+                print(f"{migration.version:04d} {migration.name}: {state}")
+            return 0
+        for report in runner.run(
+            dry_run=args.dry_run,
+            progress=lambda report: print(f"\r{report.summary()}", end='', file=sys.stderr, flush=True),
+        ):
+            print(file=sys.stderr)
+            print(report.summary())
+    except errors.PyMongoError as e:
+        print(f"\nMigration failed: {e}", file=sys.stderr)
+        return 2
+    finally:
+        db_handler.close()
+    return 0
+
+def run_text_index(args: argparse.Namespace) -> int:
+    db_handler = connect(args)
+    try:
+        problems = db_handler.ensure_text_index()
+    finally:
+        db_handler.close()
+    if problems:
+        return 1
+    print(f"Text index ready on {', '.join(COLLECTION_TYPES)}")
+    return 0
+
+def run_move(args: argparse.Namespace) -> int:
+    db_handler = connect(args)
+    try:
+        started = time.monotonic()
+        success, message, _ = db_handler.move_subtree(args.collection, args.full_tag, args.new_full_tag, use_transaction=not args.no_transaction)
+    finally:
+        db_handler.close()
+    if not success:
+        print(f"Move failed: {message}", file=sys.stderr)
+        return 1
+    print(f"{message} ({time.monotonic() - started:.1f}s)")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='rcp-db', description="RCP Database Editor command line tools.")
+    parser.add_argument('--uri', help="MongoDB URI (default: MONGO_URI from .env)")
+    parser.add_argument('--db', help="Database name (default: MONGO_DB_NAME from .env)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Bulk import a JSON Lines, BSON or CSV file into a collection.")
+    import_parser.add_argument('collection', choices=COLLECTION_TYPES)
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=['jsonl', 'bson', 'csv'], help="Input format (default: from the file extension)")
+    import_parser.add_argument('--batch-size', type=int, default=1000)
+    import_parser.add_argument('--upsert', action='store_true', help="Update documents with the same full_tag instead of inserting")
+    import_parser.add_argument('--errors', help="Write row errors to this JSON Lines file instead of stderr")
+    import_parser.add_argument('--quiet', action='store_true', help="No progress output")
+    import_parser.set_defaults(func=run_import)
+
+    export_parser = commands.add_parser('export', help="Export a collection as an Unreal Engine DataTable (CSV or JSON).")
+    export_parser.add_argument('collection', choices=COLLECTION_TYPES)
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=['csv', 'json'], help="Output format (default: from the file extension)")
+    export_parser.add_argument('--batch-size', type=int, default=1000, help="Documents per cursor batch")
+    export_parser.add_argument('--effective', action='store_true', help="Export grants including those inherited from parent documents")
+    export_parser.add_argument('--quiet', action='store_true', help="No progress output")
+    export_parser.set_defaults(func=run_export)
+
+    tags_parser = commands.add_parser('tags', help="Update a DefaultGameplayTags.ini with every tag in the database.")
+    tags_parser.add_argument('path')
+    tags_parser.add_argument('--cache', help="Content hash cache (default: src/data/<db>.gameplay_tags.json)")
+    tags_parser.add_argument('--batch-size', type=int, default=5000, help="Documents per cursor batch")
+    tags_parser.set_defaults(func=run_tags)
+
+    migrate_parser = commands.add_parser('migrate', help="Apply pending schema migrations (resumes interrupted ones).")
+    migrate_parser.add_argument('--dry-run', action='store_true', help="Report what would change and how fast, without writing")
+    migrate_parser.add_argument('--list', action='store_true', help="Show each migration's state and exit")
+    migrate_parser.add_argument('--batch-size', type=int, default=1000, help="Documents per bulk_write")
+    migrate_parser.set_defaults(func=run_migrate)
+
+    text_parser = commands.add_parser('text-index', help="Create the MongoDB text index used by server-side search.")
+    text_parser.set_defaults(func=run_text_index)
+
+    move_parser = commands.add_parser('move', help="Rename or re-parent a document and its descendants, updating grantedTags references.")
+    move_parser.add_argument('collection', choices=COLLECTION_TYPES)
+    move_parser.add_argument('full_tag')
+    move_parser.add_argument('new_full_tag')
+    move_parser.add_argument('--no-transaction', action='store_true', help="Do not use a transaction even if the server supports one")
+    move_parser.set_defaults(func=run_move)
+    return parser
+
+def main() -> None:
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
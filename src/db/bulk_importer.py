@@ -0,0 +1,328 @@
+"""
+Bulk importer for the RCP Database Editor.
+
+Streams JSON Lines, BSON (e.g. mongodump output) or CSV files record by
+record, validates each record against the collection's pydantic model,
+derives its full_tag and writes unordered batches: insert_many for plain
+imports, or update-by-full_tag upserts. A bad row is reported with its
+row number and never stops the import; an upsert row superseded by a later
+row with the same full_tag in its batch is reported as skipped. Used by File > Import and by
+`python src/cli.py import`.
+"""
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+import bson
+from bson.errors import InvalidBSON
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne, errors
+from pymongo.database import Database
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from models.pydantic_models import DocumentModel_Base, DocumentModel_Race
+from db.mongo_handler import with_hierarchy_fields
+
+FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.bson': 'bson', '.csv': 'csv'}
+DEFAULT_BATCH_SIZE = 1000
+# Errors (and skipped rows) kept in the report; rows beyond this are still counted
+ERROR_LIMIT = 1000
+# CSV list cells (grantedTags) may separate entries with ';' or '|'
+LIST_SEPARATOR = re.compile(r'[;|]')
+LIST_FIELDS = {'grantedTags'}
+# (row number, fields the row gives, model defaults for the rest)
+PreparedRow = Tuple[int, Dict[str, Any], Dict[str, Any]]
+
+class RowError(BaseModel):
+    row: int  # 1-based record number (CSV: data row, header excluded)
+    full_tag: Optional[str] = None
+    message: str
+
+class ImportReport(BaseModel):
+    collection: str
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    skipped: int = 0
+    cancelled: bool = False
+    errors: List[RowError] = []
+    warnings: List[RowError] = []
+
+    def add_error(self, row: int, full_tag: Optional[str], message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < ERROR_LIMIT:
+            self.errors.append(RowError(row=row, full_tag=full_tag, message=message))
+
+    def add_skipped(self, row: int, full_tag: Optional[str], message: str) -> None:
+        self.skipped += 1
+        if len(self.warnings) < ERROR_LIMIT:
+            self.warnings.append(RowError(row=row, full_tag=full_tag, message=message))
+
+    def summary(self) -> str:
+        text = f"{self.read} records read: {self.inserted} inserted, {self.updated} updated, {self.failed} failed"
+        if self.skipped:
+            text += f", {self.skipped} skipped"
+        return text + (" (cancelled)" if self.cancelled else "")
+
+def model_for(collection: str) -> Type[DocumentModel_Base]:
+    return DocumentModel_Race if collection == "Race" else DocumentModel_Base
+
+def detect_format(path: str) -> str:
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown import format for {path}; expected one of {', '.join(sorted(FORMATS))}")
+    return fmt
+
+def _cell(value: str) -> Any:
+    """A CSV cell as JSON when it parses (numbers, objects, arrays, booleans), otherwise the text itself."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    """Nest dotted columns (grantStats.Strength) and parse cells; empty cells count as missing."""
+    record: Dict[str, Any] = {}
+    for column, value in row.items():
+        if column is None or value is None or value == '':
+            continue
+        field, _, key = column.strip().partition('.')
+        if key:
+            record.setdefault(field, {})[key] = _cell(value)
+        elif field in LIST_FIELDS and not value.lstrip().startswith('['):
+            record[field] = [t.strip() for t in LIST_SEPARATOR.split(value) if t.strip()]
+        elif field in ('displayName', 'tag', 'full_tag', 'description', 'iconPath', 'meshPath'):
+            record[field] = value
+        else:
+            record[field] = _cell(value)
+    return record
+
+def read_records(stream: io.BufferedIOBase, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row number, record) pairs from a binary stream without reading it whole.
+
+    A record that cannot be parsed is yielded as an Exception so the caller can
+    report it against its row; unreadable BSON ends the stream (there is no
+    way to find the next document).
+    """
+    if fmt == 'bson':
+        row = 0
+        try:
+            for row, doc in enumerate(bson.decode_file_iter(stream), 1):
+                yield row, doc
+        except InvalidBSON as e:
+            yield row + 1, e
+        return
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for row, values in enumerate(csv.DictReader(text), 1):
+            yield row, _csv_record(values)
+        return
+    row = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, e
+
+def prepare_document(collection: str, record: Any) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Validate a record and derive its full_tag ("<collection>.<tag>") and hierarchy fields; raises ValueError on bad records.
+
+    Returns the fields the record gives (with full_tag and the hierarchy
+    fields) and, separately, the model's defaults for the fields it leaves out.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Expected an object, got {type(record).__name__}")
+    record = dict(record)
+    prefix = collection + '.'
+    tag = str(record.get('tag') or '').strip()
+    full_tag = str(record.get('full_tag') or '').strip()
+    if not tag and full_tag.startswith(prefix):
+        tag = full_tag[len(prefix):]
+    if not tag:
+        raise ValueError("Missing tag")
+    if any(not segment.strip() for segment in tag.split('.')):
+        raise ValueError(f"Empty segment in tag '{tag}'")
+    if full_tag and full_tag != prefix + tag:
+        raise ValueError(f"full_tag '{full_tag}' does not match tag '{tag}' in {collection}")
+    record['tag'] = tag
+    record['full_tag'] = prefix + tag
+    record.setdefault('displayName', tag.rsplit('.', 1)[-1])
+    try:
+        model = model_for(collection).model_validate(record)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())) from None
+    fields = with_hierarchy_fields(model.model_dump(exclude_unset=True))
+    defaults = {name: value for name, value in model.model_dump().items() if name not in fields}
+    return fields, defaults
+
+def server_time(db: Database) -> datetime:
+    """The server's clock, so imported updatedAt values compare with the markers of polling editors."""
+    try:
+        local_time = db.command('hello').get('localTime')
+    except errors.PyMongoError:
+        local_time = None
+    return local_time if isinstance(local_time, datetime) else datetime.now(timezone.utc).replace(tzinfo=None)
+
+class BulkImporter:
+    """Writes prepared documents to one collection in unordered batches.
+
+    Plain imports use insert_many(ordered=False), so a failing row (e.g. a
+    full_tag that already exists) does not stop the rest of its batch. The
+    new documents start at version 1 with updatedAt set to the server's
+    clock (read once per batch), so polling editors pick them up.
+    Upserts match on full_tag and $set only the fields the row gives; the
+    model's defaults for the others are only written to new documents, so
+    the _id and stored fields missing from the file are kept. They stamp
+    updatedAt so open editors pick the change up from their snapshot, and
+    bump the document's version, so edits opened before the import are
+    refused rather than silently undoing it.
+    """
+    def __init__(self, db: Database, collection: str, batch_size: int = DEFAULT_BATCH_SIZE, upsert: bool = False) -> None:
+        self.collection = db[collection]
+        self.report = ImportReport(collection=collection)
+        self.batch_size = max(1, batch_size)
+        self.upsert = upsert
+
+    def run(
+        self,
+        stream: io.BufferedIOBase,
+        fmt: str,
+        progress: Optional[Callable[[ImportReport], None]] = None,
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> ImportReport:
+        """Import every record of the stream; progress is called after each batch."""
+        name = self.collection.name
+        batch: List[PreparedRow] = []
+        for row, record in read_records(stream, fmt):
+            self.report.read += 1
+            if isinstance(record, Exception):
+                self.report.add_error(row, None, f"Unreadable record: {record}")
+                continue
+            try:
+                batch.append((row, *prepare_document(name, record)))
+            except ValueError as e:
+                self.report.add_error(row, record.get('full_tag') if isinstance(record, dict) else None, str(e))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                if progress:
+                    progress(self.report)
+                if cancelled():
+                    self.report.cancelled = True
+                    return self.report
+        if batch:
+            self._flush(batch)
+        if progress:
+            progress(self.report)
+        return self.report
+
+    def _flush(self, batch: List[PreparedRow]) -> None:
+        if self.upsert:
+            self._upsert(batch)
+        else:
+            self._insert(batch)
+
+    def _insert(self, batch: List[PreparedRow]) -> None:
+        stamp = {'version': 1, 'updatedAt': server_time(self.collection.database)}
+        try:
+            result = self.collection.insert_many([{**defaults, **doc, **stamp} for _, doc, defaults in batch], ordered=False)
+            self.report.inserted += len(result.inserted_ids)
+        except errors.BulkWriteError as e:
+            self.report.inserted += e.details.get('nInserted', 0)
+            self._report_write_errors(batch, e.details)
+        except errors.PyMongoError as e:
+            for row, doc, _ in batch:
+                self.report.add_error(row, doc['full_tag'], str(e))
+
+    def _upsert(self, batch: List[PreparedRow]) -> None:
+        # Unordered upserts of the same full_tag could race into duplicates; the last row wins
+        latest: Dict[str, PreparedRow] = {}
+        for row, doc, defaults in batch:
+            earlier = latest.pop(doc['full_tag'], None)
+            if earlier is not None:
+                self.report.add_skipped(earlier[0], doc['full_tag'], f"Superseded by row {row}")
+            latest[doc['full_tag']] = (row, doc, defaults)
+        rows = list(latest.values())
+        requests = [UpdateOne({'full_tag': doc['full_tag']}, self._upsert_update(doc, defaults), upsert=True) for _, doc, defaults in rows]
+        try:
+            result = self.collection.bulk_write(requests, ordered=False)
+            self.report.inserted += result.upserted_count
+            self.report.updated += result.matched_count
+        except errors.BulkWriteError as e:
+            self.report.inserted += e.details.get('nUpserted', 0)
+            self.report.updated += e.details.get('nMatched', 0)
+            self._report_write_errors(rows, e.details)
+        except errors.PyMongoError as e:
+            for row, doc, _ in rows:
+                self.report.add_error(row, doc['full_tag'], str(e))
+
+    @staticmethod
+    def _upsert_update(doc: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+        update: Dict[str, Any] = {'$set': doc, '$inc': {'version': 1}, '$currentDate': {'updatedAt': True}}
+        if defaults:
+            update['$setOnInsert'] = defaults
+        return update
+
+    def _report_write_errors(self, batch: List[PreparedRow], details: Dict[str, Any]) -> None:
+        for error in details.get('writeErrors', []):
+            row, doc, _ = batch[error['index']]
+            self.report.add_error(row, doc['full_tag'], error.get('errmsg', 'Write error'))
+        for error in details.get('writeConcernErrors', []):
+            self.report.add_error(0, None, f"Write concern error: {error.get('errmsg', error)}")
+
+def import_file(
+    db: Database,
+    collection: str,
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    upsert: bool = False,
+    progress: Optional[Callable[[ImportReport, int, int], None]] = None,
+    cancelled: Callable[[], bool] = lambda: False,
+) -> ImportReport:
+    """Import a file; progress receives (report, bytes read, file size)."""
+    fmt = fmt or detect_format(path)
+    total = os.path.getsize(path)
+    importer = BulkImporter(db, collection, batch_size, upsert)
+    with open(path, 'rb') as stream:
+        def on_batch(report: ImportReport) -> None:
+            if progress:
+                progress(report, stream.tell(), total)
+        return importer.run(stream, fmt, on_batch, cancelled)
+
+class ImportWorker(QThread):
+    """Runs import_file off the GUI thread, reporting progress per batch."""
+    importProgress = pyqtSignal(object, int, int)  # (ImportReport so far, bytes read, file size)
+    importFinished = pyqtSignal(object)  # ImportReport
+    importFailed = pyqtSignal(str)
+
+    def __init__(self, db: Database, collection: str, path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 upsert: bool = False, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.collection = collection
+        self.path = path
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        try:
+            report = import_file(
+                self.db, self.collection, self.path, batch_size=self.batch_size, upsert=self.upsert,
+                progress=lambda report, done, total: self.importProgress.emit(report.model_copy(), done, total),
+                cancelled=lambda: self._cancelled,
+            )
+        except (OSError, ValueError, errors.PyMongoError) as e:
+            self.importFailed.emit(str(e))
+            return
+        self.importFinished.emit(report)
@@ -0,0 +1,286 @@
+"""
+Live sync of the collection on screen with edits made by other editors.
+
+ChangeWatcher follows one collection on a worker thread. On a replica set
+it opens a change stream; on a standalone server (or when the stream is
+refused) it polls for documents whose updatedAt moved past its marker, and
+for inserts and deletes through the _id set. Changes are coalesced per
+document and handed to the window as one delta at most every
+EMIT_INTERVAL_MS, so a burst of thousands of writes costs a handful of
+view updates.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from bson import Timestamp
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from pymongo import errors
+from db.collection_loader import server_time
+from db.effective_stats_loader import EFFECTIVE_PROJECTION
+from db.mongo_handler import MongoDBHandler, SKELETON_PROJECTION, skeleton_of
+from db.search_indexer import search_projection
+from db.snapshot_store import SnapshotStore
+
+# Fields a changed document is delivered with: the views' skeleton plus what the search index uses
+# (grant map keys only); the maps themselves are fetched while effective stats are in use, see grants
+WATCH_PROJECTION = {**{field: 1 for field in SKELETON_PROJECTION}, **search_projection()}
+CHANGE_STREAM_PIPELINE = [{'$project': {
+    'operationType': 1, 'documentKey': 1, 'clusterTime': 1,
+    **{f'fullDocument.{field}': 1 for field in SKELETON_PROJECTION},
+    **search_projection('fullDocument.'),
+}}]
+# Shortest time between two deltas handed to the window
+EMIT_INTERVAL_MS = 250
+# How long one wait for change stream events lasts before the watcher checks for cancellation
+WATCH_AWAIT_MS = 500
+POLL_INTERVAL_MS = 5000
+# The _id set is read when the document count changed, and at least every this many polls
+ID_SCAN_POLLS = 6
+RETRY_MS = 5000
+CHANGE_STREAM_HISTORY_LOST = 286
+# Events after which the stream has ended and the collection must be compared in full
+ENDING_EVENTS = ('drop', 'rename', 'dropDatabase', 'invalidate')
+
+LIVE = 'live'
+POLLING = 'polling'
+RECONNECTING = 'reconnecting'
+# Watching ended on an unexpected error; the views are no longer kept in step
+STOPPED = 'stopped'
+
+class ChangeWatcher(QThread):
+    """Reports inserts, updates and deletes in one collection as coalesced deltas.
+
+    Deltas carry the watcher's generation, like CollectionLoader's signals,
+    and have the same shape as its changesLoaded. The receiver calls
+    acknowledge() once it has applied one; until then further changes are
+    merged into the next delta instead of queueing more.
+
+    marker is the server time the views were last synced from (the
+    snapshot's sync marker); the change stream starts there and polling
+    looks for edits since then. known_ids are the documents on screen,
+    which polling compares the server's _id set with. After a dropped
+    connection the stream resumes from the last resume token, so no event
+    is missed while the server was out of reach.
+
+    Changed documents carry the keys of their grant maps, not the maps.
+    While grants is set (the window has effective stats to keep current)
+    each delta's documents are completed with EFFECTIVE_PROJECTION as it
+    is handed over.
+    """
+    changesReceived = pyqtSignal(int, object, object)  # (generation, changed documents, removed _ids)
+    modeChanged = pyqtSignal(int, str)  # (generation, LIVE, POLLING, RECONNECTING or STOPPED)
+
+    def __init__(
+        self,
+        db_handler: MongoDBHandler,
+        collection: str,
+        generation: int,
+        marker: Any = None,
+        known_ids: Iterable[Any] = (),
+        snapshot: Optional[SnapshotStore] = None,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.collection = collection
+        self.generation = generation
+        self.marker = marker if isinstance(marker, datetime) else None
+        self.snapshot = snapshot
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self.mode = ''
+        self.grants = False
+        self._known: Set[Any] = set(known_ids)
+        self._changed: Dict[Any, Dict[str, Any]] = {}
+        self._removed: Set[Any] = set()
+        self._pending_marker: Any = None
+        self._last_emit = 0.0
+        self._polls = 0
+        self._cancelled = threading.Event()
+        self._in_flight = threading.Semaphore(1)
+        self._stream: Optional[Any] = None
+
+    def cancel(self) -> None:
+        """Stop watching as soon as possible; no further signals are emitted."""
+        self._cancelled.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def acknowledge(self) -> None:
+        """Called by the receiver after applying a changesReceived delta."""
+        self._in_flight.release()
+
+    def _set_mode(self, mode: str) -> None:
+        if mode != self.mode and not self.is_cancelled():
+            self.mode = mode
+            self.modeChanged.emit(self.generation, mode)
+
+    # --- Collecting changes ---
+    def _change(self, doc: Dict[str, Any]) -> None:
+        self._known.add(doc['_id'])
+        self._removed.discard(doc['_id'])
+        self._changed[doc['_id']] = doc
+
+    def _remove(self, document_id: Any) -> None:
+        self._known.discard(document_id)
+        self._changed.pop(document_id, None)
+        self._removed.add(document_id)
+
+    def _flush(self) -> None:
+        """Hand the collected changes to the window, unless the last delta was too recent or is still being applied."""
+        if not (self._changed or self._removed) or self.is_cancelled():
+            return
+        if (time.monotonic() - self._last_emit) * 1000 < EMIT_INTERVAL_MS:
+            return
+        if not self._in_flight.acquire(blocking=False):
+            return
+        changed, removed = list(self._changed.values()), list(self._removed)
+        if self.grants and changed:
+            completed = self._with_grants(changed)
+            if completed is None:
+                # The changes stay collected for the next attempt
+                self._in_flight.release()
+                return
+            changed = completed
+        self._changed, self._removed = {}, set()
+        self._last_emit = time.monotonic()
+        self.changesReceived.emit(self.generation, changed, removed)
+        if self.snapshot is not None and self._pending_marker is not None:
+            # Keeps the next startup's reconcile short
+            self.snapshot.apply_changes(self.collection, [skeleton_of(doc) for doc in changed], removed, self._pending_marker)
+
+    def _with_grants(self, changed: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """The documents with their current grant maps in place of the projected keys; None if unreachable."""
+        db = self.db_handler.db
+        if db is None:
+            return None
+        try:
+            found = db[self.collection].find({'_id': {'$in': [doc['_id'] for doc in changed]}}, EFFECTIVE_PROJECTION)
+            grants = {doc['_id']: doc for doc in found}
+        except errors.PyMongoError as e:
+            print(f"Error reading the grants of changed documents in '{self.collection}': {e}")
+            return None
+        # A document deleted meanwhile keeps its keys; its removal is collected next
+        return [{**doc, **grants.get(doc['_id'], {})} for doc in changed]
+
+    def _wait(self, ms: int) -> None:
+        """Sleep for ms, delivering collected changes as the window becomes ready for them."""
+        deadline = time.monotonic() + ms / 1000
+        while not self.is_cancelled() and time.monotonic() < deadline:
+            self._flush()
+            self._cancelled.wait(0.1)
+
+    # --- Change stream ---
+    def _watch(self, db: Any) -> None:
+        if self.resume_token is not None:
+            start = {'resume_after': self.resume_token}
+        elif self.marker is not None:
+            # Events since the views were synced (or last polled); edits already applied are harmless repeats
+            start = {'start_at_operation_time': Timestamp(self.marker, 0)}
+        else:
+            start = {}
+        with db[self.collection].watch(CHANGE_STREAM_PIPELINE, full_document='updateLookup',
+                                       max_await_time_ms=WATCH_AWAIT_MS, **start) as stream:
+            self._stream = stream
+            self._set_mode(LIVE)
+            while stream.alive and not self.is_cancelled():
+                change = stream.try_next()
+                if change is not None and self._event(change):
+                    break
+                self.resume_token = stream.resume_token
+                self._flush()
+        self._stream = None
+
+    def _event(self, change: Dict[str, Any]) -> bool:
+        """Collect one change event; True when it ended the stream."""
+        operation = change.get('operationType')
+        if isinstance(change.get('clusterTime'), Timestamp):
+            # Where polling would pick up if the stream could not be resumed
+            self.marker = self._pending_marker = change['clusterTime'].as_datetime().replace(tzinfo=None)
+        if operation in ENDING_EVENTS:
+            # The collection went away or was replaced: compare it in full, then watch from there
+            self.resume_token = None
+            self._poll(self.db_handler.db, scan_ids=True)
+            return True
+        document_id = (change.get('documentKey') or {}).get('_id')
+        if operation == 'delete':
+            self._remove(document_id)
+        elif change.get('fullDocument'):
+            self._change({**change['fullDocument'], '_id': document_id})
+        # An update whose document was deleted before the lookup has no fullDocument; its delete event follows
+        return False
+
+    # --- Polling ---
+    @staticmethod
+    def _find(collection: Any, query: Dict[str, Any]) -> Any:
+        # An aggregation, since find() projections only take expressions from MongoDB 4.4
+        return collection.aggregate([{'$match': query}, {'$project': WATCH_PROJECTION}])
+
+    def _poll(self, db: Any, scan_ids: bool = False) -> None:
+        """Collect what changed since the marker; inserts and deletes are found from the _id set."""
+        started = server_time(self.db_handler)
+        collection = db[self.collection]
+        changed = list(self._find(collection, {'updatedAt': {'$gte': self.marker}})) if self.marker is not None else []
+        self._polls += 1
+        if scan_ids or self.marker is None or self._polls % ID_SCAN_POLLS == 0 \
+                or collection.estimated_document_count() != len(self._known):
+            server_ids = {doc['_id'] for doc in collection.find({}, {'_id': 1})}
+            for document_id in self._known - server_ids:
+                self._remove(document_id)
+            new_ids = list(server_ids - self._known - {doc['_id'] for doc in changed})
+            if new_ids:
+                changed.extend(self._find(collection, {'_id': {'$in': new_ids}}))
+        for doc in changed:
+            self._change(doc)
+        self.marker = self._pending_marker = started
+
+    def run(self) -> None:
+        # Change streams need a replica set; a standalone server is polled from the start
+        streams = self.db_handler.db is not None and self.db_handler.supports_transactions()
+        while not self.is_cancelled():
+            db = self.db_handler.db
+            if db is None:
+                self._set_mode(RECONNECTING)
+                self._wait(RETRY_MS)
+                continue
+            try:
+                if streams:
+                    self._watch(db)
+                else:
+                    self._set_mode(POLLING)
+                    self._poll(db)
+                    self._wait(POLL_INTERVAL_MS)
+            except errors.OperationFailure as e:
+                if self.is_cancelled():
+                    break
+                if streams and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # Too far behind for the oplog: catch up by comparing, then watch from now
+                    print(f"Change stream history lost for '{self.collection}'; catching up by polling.")
+                    self.resume_token = None
+                    self._poll(db, scan_ids=True)
+                elif streams:
+                    print(f"Change streams unavailable for '{self.collection}' ({e}); polling instead.")
+                    streams = False
+                else:
+                    print(f"Error polling '{self.collection}': {e}")
+                    self._wait(RETRY_MS)
+            except errors.PyMongoError as e:
+                if self.is_cancelled():
+                    break
+                # Connection trouble: keep the resume token (or marker) and try again
+                print(f"Lost the change feed of '{self.collection}': {e}")
+                self._set_mode(RECONNECTING)
+                self._wait(RETRY_MS)
+            except Exception as e:
+                if not self.is_cancelled():
+                    print(f"An unexpected error occurred while watching '{self.collection}': {e}")
+                    self._set_mode(STOPPED)
+                break
+        self._stream = None
@@ -0,0 +1,229 @@
+"""
+Background collection loading for the RCP Database Editor.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from pymongo import errors
+from db.mongo_handler import MongoDBHandler, SKELETON_PROJECTION
+from db.snapshot_store import SnapshotStore
+from models.hierarchy import HierarchyModel, ExpansionState, VisibleHierarchy
+from utils.org_chart_layout import layout_hierarchy
+
+BATCH_SIZE = 500
+# Batches emitted but not yet acknowledged by the GUI; bounds the event-queue backlog
+MAX_BATCHES_IN_FLIGHT = 2
+# First chart snapshot is laid out after this many documents; later ones each time the count doubles
+FIRST_LAYOUT_AT = 2000
+
+def server_time(db_handler: MongoDBHandler) -> datetime:
+    """The server's clock, as a sync marker for comparing with server-stamped updatedAt values."""
+    try:
+        local_time = db_handler.client.admin.command('hello').get('localTime')  # type: ignore
+    except Exception:
+        local_time = None
+    return local_time if isinstance(local_time, datetime) else datetime.now(timezone.utc).replace(tzinfo=None)
+
+class CollectionLoader(QThread):
+    """Streams a collection from MongoDB in batches on a worker thread.
+
+    Every signal carries the loader's generation so the receiver can drop
+    results from a load that has since been superseded. The receiver calls
+    acknowledge_batch() once it has handled a batch; the worker never runs
+    more than MAX_BATCHES_IN_FLIGHT ahead, so queued batches cannot pile up
+    and starve input events on the GUI thread. Org chart layouts
+    (with their spatial indexes) are also computed here, at geometrically
+    spaced document counts, so the GUI thread never lays out the chart; with
+    an expansion state only the expanded part of the tree is laid out.
+
+    With a snapshot store, a collection that has a snapshot is streamed from
+    disk first (loadFinished fires once it is on screen); the worker then
+    fetches only what changed on the server since the snapshot's marker and
+    emits it as one changesLoaded delta. syncFinished reports whether the
+    server was reached.
+    """
+    batchLoaded = pyqtSignal(int, object)  # (generation, list of documents)
+    layoutReady = pyqtSignal(int, object)  # (generation, OrgChartLayout covering the batches emitted so far)
+    progress = pyqtSignal(int, int, int)  # (generation, loaded, estimated total)
+    loadFinished = pyqtSignal(int, int)  # (generation, document count)
+    loadFailed = pyqtSignal(int, str)  # (generation, error message)
+    changesLoaded = pyqtSignal(int, object, object)  # (generation, changed documents, removed _ids)
+    syncFinished = pyqtSignal(int, bool)  # (generation, True if reconciled with the server)
+
+    def __init__(
+        self,
+        db_handler: MongoDBHandler,
+        collection: str,
+        generation: int,
+        batch_size: int = BATCH_SIZE,
+        skeleton: bool = True,
+        snapshot: Optional[SnapshotStore] = None,
+        expansion: Optional[ExpansionState] = None,
+        parent: Optional[QObject] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.collection = collection
+        self.generation = generation
+        self.batch_size = batch_size
+        # Only the display projection is loaded by default; full documents are fetched on edit
+        self.skeleton = skeleton
+        # Snapshots hold the skeleton projection, so full-document loads bypass them
+        self.snapshot = snapshot if skeleton else None
+        self._from_snapshot = False
+        # Read on this thread, so the caller should pass a copy
+        self.expansion = expansion
+        self._cancelled = threading.Event()
+        self._in_flight = threading.Semaphore(MAX_BATCHES_IN_FLIGHT)
+        self._cursor: Optional[Any] = None
+
+    def cancel(self) -> None:
+        """Stop loading as soon as possible; no further signals are emitted."""
+        self._cancelled.set()
+        cursor = self._cursor
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def acknowledge_batch(self) -> None:
+        """Called by the receiver after handling a batchLoaded signal."""
+        self._in_flight.release()
+
+    def _emit_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Emit a batch once the GUI has caught up; False if cancelled while waiting."""
+        while not self._in_flight.acquire(timeout=0.1):
+            if self.is_cancelled():
+                return False
+        if self.is_cancelled():
+            return False
+        self.batchLoaded.emit(self.generation, batch)
+        return True
+
+    def _emit_layout(self, hierarchy: HierarchyModel) -> None:
+        layout = layout_hierarchy(VisibleHierarchy(hierarchy, self.expansion) if self.expansion is not None else hierarchy)
+        layout.build_indexes()
+        if not self.is_cancelled():
+            self.layoutReady.emit(self.generation, layout)
+
+    def _stream(
+        self,
+        batches: Iterable[List[Dict[str, Any]]],
+        hierarchy: HierarchyModel,
+        streamed: Dict[Any, Dict[str, Any]],
+        total: int,
+    ) -> bool:
+        """Emit batches (with progress and doubling layout snapshots) and a final layout; False if cancelled.
+
+        Every streamed document is also recorded in streamed by _id. The
+        hierarchy keeps one document per full_tag (and none without one), so
+        it cannot stand for what the server or snapshot actually holds.
+        """
+        next_layout_at = FIRST_LAYOUT_AT
+        for batch in batches:
+            if self.is_cancelled():
+                return False
+            streamed.update((doc.get('_id'), doc) for doc in batch)
+            hierarchy.add_many(batch)
+            if not self._emit_batch(batch):
+                return False
+            self.progress.emit(self.generation, len(hierarchy), max(total, len(hierarchy)))
+            if len(hierarchy) >= next_layout_at:
+                self._emit_layout(hierarchy)
+                next_layout_at = len(hierarchy) * 2
+        if self.is_cancelled():
+            return False
+        self._emit_layout(hierarchy)
+        return not self.is_cancelled()
+
+    def _server_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        self._cursor = self.db_handler.find_documents(self.collection, skeleton=self.skeleton, batch_size=self.batch_size)
+        batch: List[Dict[str, Any]] = []
+        for doc in self._cursor:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _server_time(self) -> datetime:
+        return server_time(self.db_handler)
+
+    def _reconcile(self, local: Dict[Any, Dict[str, Any]], marker: Any) -> None:
+        """Fetch what changed on the server since the snapshot and emit it as one delta."""
+        db = self.db_handler.db
+        sync_started = self._server_time()
+        projection = SKELETON_PROJECTION if self.skeleton else None
+        if marker is None:
+            # No marker to go by: compare against everything
+            fetched = list(db[self.collection].find({}, projection))
+            removed_ids = local.keys() - {doc.get('_id') for doc in fetched}
+        else:
+            # Inserts and deletes show up in the _id set; edits carry a newer updatedAt
+            server_ids = {doc['_id'] for doc in db[self.collection].find({}, {'_id': 1})}
+            removed_ids = local.keys() - server_ids
+            new_ids = list(server_ids - local.keys())
+            query = {'$or': [{'updatedAt': {'$gte': marker}}, {'_id': {'$in': new_ids}}]}
+            fetched = list(db[self.collection].find(query, projection))
+        if self.is_cancelled():
+            return
+        changed = [doc for doc in fetched if local.get(doc.get('_id')) != doc]
+        if changed or removed_ids:
+            self.changesLoaded.emit(self.generation, changed, list(removed_ids))
+        if self.snapshot is not None:
+            self.snapshot.apply_changes(self.collection, changed, removed_ids, sync_started)
+
+    def run(self) -> None:
+        db = self.db_handler.db
+        sync_info = self.snapshot.sync_info(self.collection) if self.snapshot is not None else None
+        if db is None and sync_info is None:
+            self.loadFailed.emit(self.generation, "Not connected to MongoDB.")
+            return
+        # Worker-side copy of the hierarchy, used only to lay out chart snapshots
+        hierarchy = HierarchyModel(self.collection)
+        streamed: Dict[Any, Dict[str, Any]] = {}
+        try:
+            if sync_info is not None:
+                # Render the local snapshot first, then catch up with the server
+                marker, _ = sync_info
+                self._from_snapshot = True
+                if not self._stream(self.snapshot.iter_batches(self.collection, self.batch_size), hierarchy, streamed, 0):  # type: ignore
+                    return
+                self.loadFinished.emit(self.generation, len(hierarchy))
+                if db is None:
+                    self.syncFinished.emit(self.generation, False)
+                    return
+                self._reconcile(streamed, marker)
+            else:
+                sync_started = self._server_time()
+                total = db[self.collection].estimated_document_count()
+                self.progress.emit(self.generation, 0, total)
+                if not self._stream(self._server_batches(), hierarchy, streamed, total):
+                    return
+                self.loadFinished.emit(self.generation, len(hierarchy))
+                if self.snapshot is not None:
+                    self.snapshot.replace_collection(self.collection, streamed.values(), sync_started)
+            if not self.is_cancelled():
+                self.syncFinished.emit(self.generation, True)
+        except errors.PyMongoError as e:
+            if not self.is_cancelled():
+                self._fail(f"Error loading '{self.collection}': {e}")
+        except Exception as e:
+            if not self.is_cancelled():
+                self._fail(f"An unexpected error occurred while loading '{self.collection}': {e}")
+        finally:
+            self._cursor = None
+
+    def _fail(self, message: str) -> None:
+        print(message)
+        if self._from_snapshot:
+            # The snapshot is already on screen; only the catch-up failed
+            self.syncFinished.emit(self.generation, False)
+        else:
+            self.loadFailed.emit(self.generation, message)
@@ -0,0 +1,131 @@
+"""
+Connection management for the RCP Database Editor.
+
+One long-lived MongoClient (and so one connection pool with its monitor
+threads) per connection profile, built from tunable settings that are
+persisted next to the local snapshots. Clients are only rebuilt when a
+profile's settings change; everything else, including Test Connection,
+reuses the existing pool.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+from pymongo import MongoClient
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from db.snapshot_store import DATA_DIR
+
+SETTINGS_PATH = os.path.join(DATA_DIR, 'connection_settings.json')
+READ_PREFERENCES = ['primary', 'primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest']
+COMPRESSORS = ['zstd', 'snappy', 'zlib']
+
+class ConnectionSettings(BaseModel):
+    """Client tuning for one profile; credentials and URI come from the environment."""
+    max_pool_size: int = Field(default=10, ge=1)
+    min_pool_size: int = Field(default=0, ge=0)
+    server_selection_timeout_ms: int = Field(default=5000, ge=100)
+    connect_timeout_ms: int = Field(default=5000, ge=100)
+    socket_timeout_ms: int = Field(default=0, ge=0)  # 0 means no timeout
+    # Negotiated with the server in order; zstd and snappy need the zstandard/python-snappy packages
+    compressors: List[str] = Field(default_factory=lambda: ['zlib'])
+    read_preference: Literal['primary', 'primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest'] = 'primary'
+
+    def client_options(self) -> dict:
+        options = {
+            'maxPoolSize': self.max_pool_size,
+            'minPoolSize': self.min_pool_size,
+            'serverSelectionTimeoutMS': self.server_selection_timeout_ms,
+            'connectTimeoutMS': self.connect_timeout_ms,
+            'socketTimeoutMS': self.socket_timeout_ms or None,
+            'readPreference': self.read_preference,
+        }
+        if self.compressors:
+            options['compressors'] = [c for c in self.compressors if c in COMPRESSORS]
+        return options
+
+class ConnectionProfile(BaseModel):
+    """Where to connect: a named server, database and optional credentials."""
+    name: str = 'default'
+    uri: str
+    db_name: str
+    username: Optional[str] = None
+    password: Optional[str] = None
+
+class ConnectionManager:
+    """Owns one MongoClient per profile name and the persisted settings they are built from."""
+    def __init__(self, settings_path: str = SETTINGS_PATH) -> None:
+        self.settings_path = settings_path
+        self._clients: Dict[str, MongoClient] = {}
+        self._lock = threading.Lock()
+        self._settings: Dict[str, ConnectionSettings] = self._load_settings()
+
+    def _load_settings(self) -> Dict[str, ConnectionSettings]:
+        try:
+            with open(self.settings_path, encoding='utf-8') as f:
+                raw = json.load(f)
+            return {name: ConnectionSettings.model_validate(values) for name, values in raw.items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable connection settings: {e}")
+            return {}
+
+    def settings(self, profile_name: str) -> ConnectionSettings:
+        return self._settings.get(profile_name) or ConnectionSettings()
+
+    def save_settings(self, profile_name: str, settings: ConnectionSettings) -> bool:
+        """Persist a profile's settings; True if they changed.
+
+        The profile's client keeps its old settings until the caller closes it
+        (once nothing is using it); the next use then builds one with these.
+        """
+        if self.settings(profile_name) == settings:
+            return False
+        self._settings[profile_name] = settings
+        os.makedirs(os.path.dirname(self.settings_path), exist_ok=True)
+        with open(self.settings_path, 'w', encoding='utf-8') as f:
+            json.dump({name: s.model_dump() for name, s in self._settings.items()}, f, indent=2)
+        return True
+
+    def client(self, profile: ConnectionProfile) -> MongoClient:
+        """The profile's long-lived client, created on first use.
+
+        Creating a MongoClient does not block; server discovery runs on its
+        monitor threads, bounded by the profile's server selection timeout.
+        """
+        with self._lock:
+            client = self._clients.get(profile.name)
+            if client is None:
+                options = self.settings(profile.name).client_options()
+                if profile.username and profile.password:
+                    options.update(username=profile.username, password=profile.password)
+                client = MongoClient(profile.uri, appname='RCP Database Editor', **options)
+                self._clients[profile.name] = client
+            return client
+
+    def close(self, profile_name: str) -> None:
+        with self._lock:
+            client = self._clients.pop(profile_name, None)
+        if client is not None:
+            client.close()
+
+    def close_all(self) -> None:
+        for name in list(self._clients):
+            self.close(name)
+
+class ConnectWorker(QThread):
+    """Connects (or, when already connected, just pings) off the GUI thread so a down host never freezes the window.
+
+    Both paths reuse the profile's existing client; no new pool is created.
+    """
+    connectFinished = pyqtSignal(bool, object)  # (server reachable, ping round trip in ms or None)
+
+    def __init__(self, db_handler, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+
+    def run(self) -> None:
+        connected = self.db_handler.db is not None or self.db_handler.connect()
+        ping_ms = self.db_handler.ping() if connected else None
+        self.connectFinished.emit(ping_ms is not None, ping_ms)
@@ -0,0 +1,213 @@
+"""
+Unreal Engine DataTable exporter for the RCP Database Editor.
+
+Walks a collection with a server-side cursor and writes one DataTable row
+per document as it arrives, in the CSV or JSON layout the UE5 DataTable
+importer reads. Only the current cursor batch is ever in memory, so a
+200k-document export costs the same memory as a 2k one (except with
+effective values, which first load the collection's grants into an
+EffectiveStats engine). Used by File > Export DataTable... and by
+`python src/cli.py export`.
+"""
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, TextIO
+from pymongo import errors
+from pymongo.database import Database
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from db.effective_stats_loader import load_effective_stats
+from models.effective_stats import Effective
+
+EXPORT_FORMATS = ['csv', 'json']
+DEFAULT_BATCH_SIZE = 1000
+# Fields read from MongoDB; everything else stays on the server
+EXPORT_PROJECTION = {
+    'tag': 1, 'full_tag': 1, 'displayName': 1, 'description': 1, 'iconPath': 1, 'meshPath': 1,
+    'grantedTags': 1, 'grantStats': 1, 'grantAbilities': 1,
+}
+PROGRESS_EVERY = 1000
+
+def row_columns(collection: str) -> List[str]:
+    """DataTable columns (struct properties) for a collection; the first column is the row name."""
+    columns = ['Name', 'DisplayName', 'Description', 'Tag', 'Icon']
+    if collection == "Race":
+        columns.append('Mesh')
+    return columns + ['GrantedTags', 'GrantStats', 'GrantAbilities']
+
+def asset_path(path: Optional[str]) -> str:
+    """A Content-relative file path (as picked in the dialogs) as a UE soft object path: Icons/Elf.uasset -> /Game/Icons/Elf.Elf."""
+    if not path:
+        return ''
+    path = path.replace('\\', '/').strip()
+    if path.startswith('/'):
+        return path
+    path = os.path.splitext(path)[0]
+    return f"/Game/{path}.{path.rsplit('/', 1)[-1]}"
+
+def _number(value: Any) -> Any:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _level(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 1
+
+def datatable_row(collection: str, doc: Dict[str, Any], effective: Optional[Effective] = None) -> Dict[str, Any]:
+    """One document as a DataTable row of plain JSON values.
+
+    With effective, the grant columns hold the document's effective
+    (inherited) values instead of its own.
+    """
+    row = {
+        'Name': doc.get('tag') or doc.get('full_tag', ''),
+        'DisplayName': doc.get('displayName', ''),
+        'Description': doc.get('description') or '',
+        'Tag': doc.get('full_tag', ''),
+        'Icon': asset_path(doc.get('iconPath')),
+    }
+    if collection == "Race":
+        row['Mesh'] = asset_path(doc.get('meshPath'))
+    if effective is not None:
+        row['GrantedTags'] = list(effective.tags)
+        row['GrantStats'] = dict(effective.stats)
+        row['GrantAbilities'] = dict(effective.abilities)
+        return row
+    row['GrantedTags'] = list(doc.get('grantedTags') or [])
+    row['GrantStats'] = {str(k): _number(v) for k, v in (doc.get('grantStats') or {}).items()}
+    row['GrantAbilities'] = {str(k): _level(v) for k, v in (doc.get('grantAbilities') or {}).items()}
+    return row
+
+def _ue_string(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _ue_tag_container(tags: Iterable[str]) -> str:
+    return '(GameplayTags=(' + ','.join(f'(TagName={_ue_string(t)})' for t in tags) + '))'
+
+def _ue_map(values: Dict[str, Any]) -> str:
+    return '(' + ','.join(f'({_ue_string(k)}, {v})' for k, v in values.items()) + ')'
+
+def csv_cells(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A DataTable row in UE's CSV text-import syntax (tags, tag containers and maps as struct literals)."""
+    cells = dict(row)
+    cells['Tag'] = f'(TagName={_ue_string(row["Tag"])})'
+    cells['GrantedTags'] = _ue_tag_container(row['GrantedTags'])
+    cells['GrantStats'] = _ue_map(row['GrantStats'])
+    cells['GrantAbilities'] = _ue_map(row['GrantAbilities'])
+    return cells
+
+def json_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A DataTable row in UE's JSON import layout."""
+    row = dict(row)
+    row['Tag'] = {'TagName': row['Tag']}
+    row['GrantedTags'] = {'GameplayTags': [{'TagName': t} for t in row['GrantedTags']]}
+    return row
+
+class DataTableWriter:
+    """Writes DataTable rows to a text stream one at a time."""
+    def __init__(self, stream: TextIO, collection: str, fmt: str) -> None:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'; expected one of {', '.join(EXPORT_FORMATS)}")
+        self.stream = stream
+        self.collection = collection
+        self.fmt = fmt
+        self.count = 0
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=row_columns(collection), extrasaction='ignore', lineterminator='\n')
+            # UE's DataTable CSV importer expects the row name column header to be "---"
+            self._csv.writerow({name: name for name in row_columns(collection)} | {'Name': '---'})
+        else:
+            stream.write('[')
+
+    def write(self, doc: Dict[str, Any], effective: Optional[Effective] = None) -> None:
+        row = datatable_row(self.collection, doc, effective)
+        if self.fmt == 'csv':
+            self._csv.writerow(csv_cells(row))
+        else:
+            self.stream.write((',\n\t' if self.count else '\n\t') + json.dumps(json_row(row), ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        if self.fmt == 'json':
+            self.stream.write('\n]\n')
+
+def export_collection(
+    db: Database,
+    collection: str,
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Callable[[], bool] = lambda: False,
+    effective: bool = False,
+) -> int:
+    """Stream a collection into a DataTable file; returns the number of rows written.
+
+    Rows are ordered by full_tag so exports diff cleanly between runs.
+    progress receives (rows written, estimated total). The file is written
+    to a temporary name and only replaces path once the export completes.
+    effective exports each row's grants including everything inherited
+    from the documents above it.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    stats = load_effective_stats(db, collection, cancelled=cancelled) if effective else None
+    if effective and stats is None:
+        raise InterruptedError("Export cancelled")
+    total = db[collection].estimated_document_count()
+    cursor = db[collection].find({}, EXPORT_PROJECTION, batch_size=max(1, batch_size)).sort('full_tag', 1)
+    tmp_path = path + '.part'
+    try:
+        # utf-8-sig: UE reads the BOM and keeps non-ASCII display names intact
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f, cursor:
+            writer = DataTableWriter(f, collection, fmt)
+            for doc in cursor:
+                writer.write(doc, stats.effective(doc.get('full_tag', '')) if stats is not None else None)
+                if writer.count % PROGRESS_EVERY == 0:
+                    if progress:
+                        progress(writer.count, total)
+                    if cancelled():
+                        raise InterruptedError("Export cancelled")
+            writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress:
+        progress(writer.count, max(total, writer.count))
+    return writer.count
+
+class ExportWorker(QThread):
+    """Runs export_collection off the GUI thread."""
+    exportProgress = pyqtSignal(int, int)  # (rows written, estimated total)
+    exportFinished = pyqtSignal(int)  # rows written
+    exportFailed = pyqtSignal(str)
+
+    def __init__(self, db: Database, collection: str, path: str, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 effective: bool = False, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.collection = collection
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.effective = effective
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        try:
+            count = export_collection(
+                self.db, self.collection, self.path, self.fmt, self.batch_size,
+                progress=self.exportProgress.emit, cancelled=lambda: self._cancelled, effective=self.effective,
+            )
+        except (OSError, ValueError, InterruptedError, errors.PyMongoError) as e:
+            self.exportFailed.emit(str(e))
+            return
+        self.exportFinished.emit(count)
@@ -0,0 +1,53 @@
+"""
+Loading the effective (inherited) grants of a collection, for the edit dialogs and exporters.
+"""
+from typing import Callable, Optional
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from pymongo import errors
+from pymongo.database import Database
+from models.effective_stats import EffectiveStats, GRANT_FIELDS
+
+# Only the fields inheritance needs are fetched
+EFFECTIVE_PROJECTION = {'full_tag': 1, **{field: 1 for field in GRANT_FIELDS}}
+BATCH_SIZE = 5000
+
+def load_effective_stats(
+    db: Database,
+    collection: str,
+    batch_size: int = BATCH_SIZE,
+    cancelled: Callable[[], bool] = lambda: False,
+) -> Optional[EffectiveStats]:
+    """Read a collection's grants and compute every document's effective values; None if cancelled."""
+    docs = []
+    with db[collection].find({}, EFFECTIVE_PROJECTION, batch_size=batch_size) as cursor:
+        for i, doc in enumerate(cursor):
+            docs.append(doc)
+            if i % batch_size == 0 and cancelled():
+                return None
+    stats = EffectiveStats(collection, docs)
+    stats.matrix()  # compute now rather than on the first query
+    return stats
+
+class EffectiveStatsWorker(QThread):
+    """Runs load_effective_stats off the GUI thread."""
+    statsReady = pyqtSignal(str, object)  # (collection, EffectiveStats)
+    statsFailed = pyqtSignal(str, str)  # (collection, error message)
+
+    def __init__(self, db: Database, collection: str, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.collection = collection
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        try:
+            stats = load_effective_stats(self.db, self.collection, cancelled=lambda: self._cancelled)
+        except errors.PyMongoError as e:
+            print(f"Error loading effective stats for '{self.collection}': {e}")
+            self.statsFailed.emit(self.collection, str(e))
+            return
+        if stats is not None and not self._cancelled:
+            self.statsReady.emit(self.collection, stats)
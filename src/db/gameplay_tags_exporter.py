@@ -0,0 +1,183 @@
+"""
+Gameplay Tags .ini generation for the RCP Database Editor.
+
+Every full_tag and grantedTags entry in Race, Class and Profession becomes a
+Gameplay Tag, together with the parent tags implied by its dotted path
+(Race.Elf.Wood also declares Race and Race.Elf). A per-document content hash
+is cached between runs so only documents whose tag fields changed are
+expanded again, and the .ini is rewritten only when its content differs, so
+an unchanged database never makes the editor reload its tags.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import errors
+from pymongo.database import Database
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from forms.form_data import COLLECTION_TYPES
+from db.snapshot_store import DATA_DIR
+
+CACHE_VERSION = 1
+TAG_PROJECTION = {'full_tag': 1, 'grantedTags': 1, 'displayName': 1}
+INI_SECTION = '[/Script/GameplayTags.GameplayTagsSettings]'
+# Characters UE refuses in tag names
+INVALID_TAG_CHARACTERS = set('",\r\n\t ')
+DEFAULT_BATCH_SIZE = 5000
+
+def cache_path_for(db_name: str) -> str:
+    """Default hash cache for a database's tag export."""
+    return os.path.join(DATA_DIR, f'{db_name}.gameplay_tags.json')
+
+def tag_with_parents(tag: str) -> List[str]:
+    """A tag and every parent implied by its dotted path; [] for tags UE would reject."""
+    tag = (tag or '').strip()
+    segments = tag.split('.')
+    if not tag or any(not s for s in segments) or INVALID_TAG_CHARACTERS & set(tag):
+        return []
+    return ['.'.join(segments[:i]) for i in range(1, len(segments) + 1)]
+
+def document_tags(doc: Dict[str, Any]) -> List[str]:
+    tags = set(tag_with_parents(doc.get('full_tag', '')))
+    for granted in doc.get('grantedTags') or []:
+        tags.update(tag_with_parents(str(granted)))
+    return sorted(tags)
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Hash of the fields that decide a document's tags and comment."""
+    key = [doc.get('full_tag', ''), doc.get('displayName', ''), list(doc.get('grantedTags') or [])]
+    return hashlib.blake2b(json.dumps(key, default=str).encode('utf-8'), digest_size=16).hexdigest()
+
+def _comment(text: Any) -> str:
+    return ' '.join(str(text or '').split()).replace('"', "'")
+
+class GameplayTagIndex:
+    """Per-document tag sets keyed by content hash, plus a reference count per tag.
+
+    entries maps "<collection>:<_id>" to (hash, full_tag, comment, tags). A
+    tag stays in the output while any document still references it.
+    """
+    def __init__(self, cache_path: str) -> None:
+        self.cache_path = cache_path
+        self.entries: Dict[str, Tuple[str, str, str, List[str]]] = {}
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                raw = json.load(f)
+            if raw.get('version') == CACHE_VERSION:
+                self.entries = {key: tuple(entry) for key, entry in raw['entries'].items()}  # type: ignore
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable gameplay tag cache: {e}")
+        self.refs: Counter = Counter(tag for entry in self.entries.values() for tag in entry[3])
+
+    def _set(self, key: str, entry: Optional[Tuple[str, str, str, List[str]]]) -> None:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.refs.subtract(old[3])
+        if entry is not None:
+            self.entries[key] = entry
+            self.refs.update(entry[3])
+
+    def update(self, collection: str, docs: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        """Fold a complete listing of a collection into the index; returns (documents changed, documents removed)."""
+        prefix = collection + ':'
+        stale = {key for key in self.entries if key.startswith(prefix)}
+        changed = 0
+        for doc in docs:
+            key = prefix + str(doc.get('_id'))
+            stale.discard(key)
+            digest = content_hash(doc)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == digest:
+                continue
+            changed += 1
+            self._set(key, (digest, doc.get('full_tag', ''), _comment(doc.get('displayName')), document_tags(doc)))
+        for key in stale:
+            self._set(key, None)
+        self.refs = +self.refs  # drop tags no document references any more
+        return changed, len(stale)
+
+    def tags(self) -> List[str]:
+        return sorted(self.refs)
+
+    def render(self) -> str:
+        """The DefaultGameplayTags.ini content, tags sorted, each document's own tag commented with its display name."""
+        comments: Dict[str, str] = {}
+        for _, full_tag, comment, _ in self.entries.values():
+            if comment and (full_tag not in comments or comment < comments[full_tag]):
+                comments[full_tag] = comment
+        lines = [INI_SECTION, 'ImportTagsFromConfig=True', 'WarnOnInvalidTags=True']
+        for tag in self.tags():
+            lines.append(f'+GameplayTagList=(Tag="{tag}",DevComment="{comments.get(tag, "")}")')
+        return '\r\n'.join(lines) + '\r\n'
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+def write_if_changed(path: str, content: str) -> bool:
+    """Write content to path unless the file already holds exactly that; returns True when written."""
+    data = content.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.part'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def export_gameplay_tags(
+    db: Database,
+    path: str,
+    cache_path: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Bring the .ini at path up to date with all three collections.
+
+    Returns a summary: tags written, documents changed/removed since the
+    last run and whether the file was rewritten.
+    """
+    index = GameplayTagIndex(cache_path or cache_path_for(db.name))
+    changed = removed = 0
+    for collection in COLLECTION_TYPES:
+        if progress:
+            progress(collection)
+        cursor = db[collection].find({}, TAG_PROJECTION, batch_size=max(1, batch_size))
+        with cursor:
+            c, r = index.update(collection, cursor)
+        changed += c
+        removed += r
+    written = write_if_changed(path, index.render())
+    if changed or removed:
+        index.save()
+    return {'tags': len(index.refs), 'changed': changed, 'removed': removed, 'written': written}
+
+class GameplayTagsWorker(QThread):
+    """Runs export_gameplay_tags off the GUI thread."""
+    tagsProgress = pyqtSignal(str)  # collection being read
+    tagsFinished = pyqtSignal(object)  # summary dict
+    tagsFailed = pyqtSignal(str)
+
+    def __init__(self, db: Database, path: str, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.path = path
+
+    def run(self) -> None:
+        try:
+            summary = export_gameplay_tags(self.db, self.path, progress=self.tagsProgress.emit)
+        except (OSError, errors.PyMongoError) as e:
+            self.tagsFailed.emit(str(e))
+            return
+        self.tagsFinished.emit(summary)
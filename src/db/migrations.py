@@ -0,0 +1,247 @@
+"""
+Schema migrations for the RCP Database Editor.
+
+Each migration is a versioned step that rewrites documents in place. The
+runner walks every collection in _id order, one batch at a time, sends each
+batch's changes as a single unordered bulk_write and checkpoints the last
+_id it finished in the `_migrations` metadata collection, so an interrupted
+run resumes where it stopped instead of starting over. A dry run reports how
+many documents each pending step would change (and how fast it scanned)
+without writing anything.
+
+    python src/cli.py migrate --dry-run
+    python src/cli.py migrate
+
+Batches are paged with {_id: {$gt: last_id}}, which assumes one _id type per
+collection (ObjectIds, as inserted by the editor and the importer).
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from pymongo import ASCENDING, UpdateOne
+from pymongo.database import Database
+from forms.form_data import COLLECTION_TYPES
+from db.mongo_handler import hierarchy_fields
+
+METADATA_COLLECTION = '_migrations'
+DEFAULT_BATCH_SIZE = 1000
+
+class Migration:
+    """One versioned step. Subclasses set version/name and implement migrate().
+
+    query narrows the documents scanned (it should match every document the
+    step may change); migrate returns the update for one document, or None
+    when it needs no change, so steps are safe to re-run.
+    """
+    version: int = 0
+    name: str = ''
+    collections: List[str] = COLLECTION_TYPES
+    query: Dict[str, Any] = {}
+    projection: Optional[Dict[str, Any]] = None
+
+    def migrate(self, collection: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+class MaterializeHierarchy(Migration):
+    """Backfill parent_tag/depth/ancestors on documents written before they were maintained."""
+    version = 1
+    name = 'materialize_hierarchy'
+    query = {'full_tag': {'$exists': True}}
+    projection = {'full_tag': 1, 'parent_tag': 1, 'depth': 1, 'ancestors': 1}
+
+    def migrate(self, collection: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = hierarchy_fields(doc['full_tag'])
+        changed = {key: value for key, value in fields.items() if doc.get(key, ...) != value}
+        return {'$set': changed} if changed else None
+
+# Per-collection stat maps from the old form definitions, now all grantStats
+LEGACY_STAT_FIELDS = {"Race": 'racialStats', "Class": 'classStats', "Profession": 'professionStats'}
+
+class RenameLegacyFields(Migration):
+    """Move the old form field names onto the model's: name -> displayName, <collection>Stats -> grantStats.
+
+    Existing displayName/grantStats values win; legacy stat keys are only
+    added where grantStats lacks them.
+    """
+    version = 2
+    name = 'rename_legacy_fields'
+    query = {'$or': [{'name': {'$exists': True}}, *({field: {'$exists': True}} for field in LEGACY_STAT_FIELDS.values())]}
+    projection = {'name': 1, 'displayName': 1, 'grantStats': 1, **{field: 1 for field in LEGACY_STAT_FIELDS.values()}}
+
+    def migrate(self, collection: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        sets: Dict[str, Any] = {}
+        unsets: Dict[str, Any] = {}
+        if 'name' in doc:
+            if not doc.get('displayName'):
+                sets['displayName'] = doc['name']
+            unsets['name'] = ''
+        legacy = LEGACY_STAT_FIELDS.get(collection)
+        if legacy and legacy in doc:
+            if isinstance(doc[legacy], dict) and doc[legacy]:
+                sets['grantStats'] = {**doc[legacy], **(doc.get('grantStats') or {})}
+            unsets[legacy] = ''
+        update = {}
+        if sets:
+            update['$set'] = sets
+        if unsets:
+            update['$unset'] = unsets
+        return update or None
+
+def _as_float(value: Any) -> Any:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def _as_int(value: Any) -> Any:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return value
+
+class NormalizeStatTypes(Migration):
+    """Store grantStats values as floats and grantAbilities levels as ints, as the dialogs do.
+
+    Values that are not numbers at all are left for a person to fix.
+    """
+    version = 3
+    name = 'normalize_stat_types'
+    query = {'$or': [{'grantStats': {'$type': 'object'}}, {'grantAbilities': {'$type': 'object'}}]}
+    projection = {'grantStats': 1, 'grantAbilities': 1}
+
+    def migrate(self, collection: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        sets: Dict[str, Any] = {}
+        for field, convert, kind in (('grantStats', _as_float, float), ('grantAbilities', _as_int, int)):
+            values = doc.get(field)
+            if not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                # bool is an int subclass; type() keeps True from passing as a level
+                if type(value) is not kind and '.' not in key and not key.startswith('$'):
+                    converted = convert(value)
+                    if converted is not value:
+                        sets[f'{field}.{key}'] = converted
+        return {'$set': sets} if sets else None
+
+MIGRATIONS: List[Migration] = [MaterializeHierarchy(), RenameLegacyFields(), NormalizeStatTypes()]
+
+class MigrationReport(BaseModel):
+    version: int
+    name: str
+    dry_run: bool
+    scanned: int = 0
+    modified: int = 0  # documents changed (dry run: documents that would change)
+    seconds: float = 0.0
+    resumed: bool = False
+    completed: bool = False
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.scanned / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        verb = "would modify" if self.dry_run else "modified"
+        text = f"{self.version:04d} {self.name}: scanned {self.scanned}, {verb} {self.modified} ({self.docs_per_second:,.0f} docs/s)"
+        if self.resumed:
+            text += ", resumed from checkpoint"
+        return text if self.completed or self.dry_run else text + ", interrupted"
+
+class MigrationRunner:
+    """Applies pending MIGRATIONS in version order, checkpointing after every batch."""
+    def __init__(self, db: Database, migrations: Optional[List[Migration]] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.db = db
+        self.migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+        self.batch_size = max(1, batch_size)
+        self.metadata = db[METADATA_COLLECTION]
+
+    def state(self, migration: Migration) -> Dict[str, Any]:
+        return self.metadata.find_one({'_id': migration.version}) or {}
+
+    def pending(self) -> List[Migration]:
+        done = {doc['_id'] for doc in self.metadata.find({'state': 'done'}, {'_id': 1})}
+        return [m for m in self.migrations if m.version not in done]
+
+    def run(
+        self,
+        dry_run: bool = False,
+        progress: Optional[Callable[[MigrationReport], None]] = None,
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> List[MigrationReport]:
+        """Run (or, with dry_run, measure) every pending migration; stops at the first interrupted one."""
+        reports = []
+        for migration in self.pending():
+            report = self.run_one(migration, dry_run, progress, cancelled)
+            reports.append(report)
+            if not report.completed and not dry_run:
+                break
+        return reports
+
+    def run_one(
+        self,
+        migration: Migration,
+        dry_run: bool = False,
+        progress: Optional[Callable[[MigrationReport], None]] = None,
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> MigrationReport:
+        report = MigrationReport(version=migration.version, name=migration.name, dry_run=dry_run)
+        checkpoints = self.state(migration).get('checkpoints', {})
+        report.resumed = bool(checkpoints)
+        if not dry_run:
+            self.metadata.update_one(
+                {'_id': migration.version},
+                {'$set': {'name': migration.name, 'state': 'running'}, '$setOnInsert': {'startedAt': time.time()}},
+                upsert=True,
+            )
+        started = time.perf_counter()
+        for collection in migration.collections:
+            checkpoint = checkpoints.get(collection, {})
+            if checkpoint.get('done'):
+                continue
+            last_id = checkpoint.get('last_id')
+            while True:
+                query = dict(migration.query)
+                if last_id is not None:
+                    query = {'$and': [query, {'_id': {'$gt': last_id}}]} if query else {'_id': {'$gt': last_id}}
+                batch = list(self.db[collection].find(query, migration.projection).sort('_id', ASCENDING).limit(self.batch_size))
+                if not batch:
+                    break
+                requests = []
+                for doc in batch:
+                    update = migration.migrate(collection, doc)
+                    if update:
+                        # Stamped like editor writes, so snapshots pick migrated documents up on reconcile
+                        # and edits opened before the migration are refused instead of undoing it
+                        requests.append(UpdateOne({'_id': doc['_id']}, {**update, '$inc': {'version': 1}, '$currentDate': {'updatedAt': True}}))
+                report.scanned += len(batch)
+                last_id = batch[-1]['_id']
+                if dry_run:
+                    report.modified += len(requests)
+                else:
+                    if requests:
+                        report.modified += self.db[collection].bulk_write(requests, ordered=False).modified_count
+                    self._checkpoint(migration, collection, last_id, len(batch), len(requests))
+                report.seconds = time.perf_counter() - started
+                if progress:
+                    progress(report)
+                if cancelled():
+                    return report
+            if not dry_run:
+                self.metadata.update_one({'_id': migration.version}, {'$set': {f'checkpoints.{collection}.done': True}})
+        report.seconds = time.perf_counter() - started
+        report.completed = True
+        if not dry_run:
+            self.metadata.update_one(
+                {'_id': migration.version},
+                {'$set': {'state': 'done', 'finishedAt': time.time(), 'seconds': report.seconds}},
+            )
+        return report
+
+    def _checkpoint(self, migration: Migration, collection: str, last_id: Any, scanned: int, modified: int) -> None:
+        # Written after the batch's bulk_write, so a crash re-runs at most one batch (migrations are idempotent)
+        self.metadata.update_one(
+            {'_id': migration.version},
+            {
+                '$set': {f'checkpoints.{collection}.last_id': last_id},
+                '$inc': {f'checkpoints.{collection}.scanned': scanned, f'checkpoints.{collection}.modified': modified},
+            },
+        )
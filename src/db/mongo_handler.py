@@ -1,32 +1,194 @@
 """
 MongoDB handler for RCP Database Editor.
 """
-from pymongo import MongoClient, errors
+import getpass
+import os
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from pymongo import ASCENDING, TEXT, IndexModel, MongoClient, ReturnDocument, UpdateOne, errors
+from pymongo.cursor import Cursor
 from typing import Optional, Any
+from db.connection_manager import ConnectionManager, ConnectionProfile
+from forms.form_data import COLLECTION_TYPES
+
+# Fields needed to draw the org chart and nav tree; everything else is fetched on edit
+SKELETON_PROJECTION = {'displayName': 1, 'full_tag': 1, 'description': 1}
+DOCUMENT_CACHE_SIZE = 128
+
+# Indexes every collection needs: unique tags, and the materialized hierarchy fields
+# so children (parent_tag) and subtree (ancestors) questions are answered server-side
+INDEXES = [
+    IndexModel([('full_tag', ASCENDING)], name='full_tag_unique', unique=True),
+    IndexModel([('parent_tag', ASCENDING)], name='parent_tag'),
+    IndexModel([('ancestors', ASCENDING)], name='ancestors'),
+    # Lets move_subtree find the references to a moved tag without scanning every collection
+    IndexModel([('grantedTags', ASCENDING)], name='grantedTags'),
+    # Snapshot reconciles and the polling ChangeWatcher ask for documents edited since a marker
+    IndexModel([('updatedAt', ASCENDING)], name='updatedAt'),
+]
+# What move_subtree reads of each moved document, and hands back with its new tags
+MOVE_PROJECTION = {**SKELETON_PROJECTION, 'tag': 1, 'grantedTags': 1, 'version': 1}
+
+# Optional server-side search (see text_search): words only, no prefixes, and map keys such as
+# grantStats/grantAbilities cannot be text-indexed, so the in-memory SearchIndex remains the default
+TEXT_INDEX = IndexModel(
+    [('displayName', TEXT), ('full_tag', TEXT), ('description', TEXT), ('grantedTags', TEXT)],
+    name='search_text',
+    weights={'displayName': 6, 'full_tag': 4, 'grantedTags': 3, 'description': 2},
+    default_language='none',  # tag words are names, not English; no stemming or stop words
+)
+TEXT_SEARCH_PROJECTION = {'displayName': 1, 'full_tag': 1, 'score': {'$meta': 'textScore'}}
+
+# update_document's message when the form matched the stored document and nothing was sent
+NO_CHANGES = "No changes to save."
+# update_document's message when another editor saved the document after the edit started;
+# the payload is then the document as stored now, for merging
+CONFLICT = "This document was changed by another editor since you opened it."
+
+def _is_path_key(key: Any) -> bool:
+    # Map keys that can appear in a dotted update path
+    return isinstance(key, str) and bool(key) and '.' not in key and not key.startswith('$')
+
+def _diff_into(original: dict, new_data: dict, prefix: str, sets: dict, unsets: dict) -> None:
+    for key, value in new_data.items():
+        path = prefix + key
+        if key not in original:
+            # A field the form reports as None is the same as one the document never had
+            if value is not None or prefix:
+                sets[path] = value
+            continue
+        old = original[key]
+        if isinstance(old, dict) and isinstance(value, dict) and all(_is_path_key(k) for k in (*old, *value)):
+            _diff_into(old, value, path + '.', sets, unsets)
+            # Nested maps are replaced as a whole by the form, so keys it dropped are removed
+            for removed in old.keys() - value.keys():
+                unsets[path + '.' + removed] = ''
+        elif old != value:
+            sets[path] = value
+
+def diff_update(original: dict, new_data: dict) -> dict:
+    """Build the $set/$unset update that applies new_data to original, down to individual map keys.
+
+    Top-level fields missing from new_data are left alone. An empty result
+    means nothing changed.
+    """
+    sets: dict = {}
+    unsets: dict = {}
+    _diff_into(original, new_data, '', sets, unsets)
+    update: dict = {}
+    if sets:
+        update['$set'] = sets
+    if unsets:
+        update['$unset'] = unsets
+    return update
+
+def hierarchy_fields(full_tag: str) -> dict:
+    """Materialized hierarchy fields for a full_tag, derived from its dotted path alone.
+
+    Race.Elf.Wood -> parent_tag 'Race.Elf', depth 2, ancestors ['Race', 'Race.Elf'].
+    Every path prefix counts, whether or not a document exists for it, so the
+    fields never need updating when other documents come and go.
+    """
+    segments = full_tag.split('.')
+    ancestors = ['.'.join(segments[:i]) for i in range(1, len(segments))]
+    return {'parent_tag': ancestors[-1] if ancestors else None, 'depth': len(ancestors), 'ancestors': ancestors}
+
+def with_hierarchy_fields(document: dict) -> dict:
+    """The document with parent_tag/depth/ancestors set from its full_tag (unchanged when it has none)."""
+    if not document.get('full_tag'):
+        return document
+    return {**document, **hierarchy_fields(document['full_tag'])}
+
+def retag(full_tag: str, old_root: str, new_root: str) -> str:
+    """full_tag with the old_root prefix replaced by new_root; tags outside old_root's subtree are returned unchanged."""
+    if full_tag == old_root:
+        return new_root
+    if full_tag.startswith(old_root + '.'):
+        return new_root + full_tag[len(old_root):]
+    return full_tag
+
+def move_problem(collection_name: str, full_tag: str, new_full_tag: str) -> Optional[str]:
+    """Why full_tag cannot be moved to new_full_tag, or None if the move is well-formed."""
+    prefix = collection_name + '.'
+    if not new_full_tag.startswith(prefix) or any(not segment.strip() for segment in new_full_tag[len(prefix):].split('.')):
+        return f"{new_full_tag} is not a valid full tag in {collection_name}."
+    if new_full_tag.startswith(full_tag + '.'):
+        return f"Cannot move {full_tag} into its own subtree."
+    if full_tag.startswith(new_full_tag + '.'):
+        # Its descendants would take over tags the subtree still holds mid-move
+        return f"Cannot move {full_tag} onto {new_full_tag}, which already contains it."
+    return None
+
+def editor_name() -> str:
+    """How this editor is shown to others: RCP_EDITOR_NAME from the environment, else user@host."""
+    name = os.environ.get('RCP_EDITOR_NAME', '').strip()
+    if name:
+        return name
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = 'unknown'
+    return f"{user}@{socket.gethostname()}"
+
+def version_of(document: dict) -> int:
+    """A document's edit version; documents not edited since versioning began count as 0."""
+    try:
+        return int(document.get('version') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def versioned_filter(document_id: Any, version: int) -> dict:
+    """Matches the document only while it is still at version, which makes an update conditional on it."""
+    if version:
+        return {'_id': document_id, 'version': version}
+    return {'_id': document_id, 'version': {'$in': [None, 0]}}  # None also matches a missing field
+
+def skeleton_of(document: dict) -> dict:
+    """Reduce a full document to the fields a skeleton load would have fetched."""
+    return {key: document[key] for key in ('_id', *SKELETON_PROJECTION) if key in document}
 
 class MongoDBHandler:
     """Handles MongoDB connections and operations."""
-    def __init__(self, uri: str, db_name: str, username: Optional[str] = None, password: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        uri: str,
+        db_name: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        manager: Optional[ConnectionManager] = None,
+        profile_name: str = 'default',
+    ) -> None:
         self.uri = uri
         self.db_name = db_name
         self.username = username
         self.password = password
+        # The manager owns the client; the handler only borrows it
+        self.manager = manager or ConnectionManager()
+        self.profile = ConnectionProfile(name=profile_name, uri=uri, db_name=db_name, username=username, password=password)
         self.client: Optional[MongoClient] = None
         self.db = None
+        # Stamped as updatedBy on this editor's writes and shown to other editors
+        self.editor = editor_name()
+        # (collection, _id) -> full document, least recently used first
+        self._document_cache: OrderedDict[tuple[str, Any], dict] = OrderedDict()
+        # Subtree moves run on a worker thread and invalidate entries there
+        self._cache_lock = threading.Lock()
+        self._supports_transactions: Optional[bool] = None
+        self._indexes_ensured = False
 
     def connect(self) -> bool:
+        """Ping the server through the profile's shared client; safe to call repeatedly (no new pool)."""
         try:
-            if self.username and self.password:
-                self.client = MongoClient(
-                    self.uri,
-                    username=self.username,
-                    password=self.password
-                )
-            else:
-                self.client = MongoClient(self.uri)
+            self.client = self.manager.client(self.profile)
+            self._supports_transactions = None
             self.client.admin.command('ping')
             self.db = self.client[self.db_name]
             print(f"Successfully connected to MongoDB: {self.db_name}")
+            if not self._indexes_ensured:
+                self.ensure_indexes()
             return True
         except errors.ConnectionFailure as e:
             print(f"MongoDB connection failed: {e}")
@@ -35,57 +197,405 @@ class MongoDBHandler:
             print(f"An unexpected error occurred during MongoDB connection: {e}")
             return False
 
+    def ping(self) -> Optional[int]:
+        """Round-trip time in ms of a ping over the existing pool, or None if not connected or unreachable."""
+        if self.client is None:
+            return None
+        try:
+            start = time.perf_counter()
+            self.client.admin.command('ping')
+            return int((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"MongoDB ping failed: {e}")
+            return None
+
+    def reconnect(self) -> bool:
+        """Drop the profile's client (e.g. after its settings changed) and connect with a fresh one."""
+        self.manager.close(self.profile.name)
+        self.client = None
+        self.db = None
+        return self.connect()
+
     def close(self) -> None:
         if self.client:
-            self.client.close()
+            self.manager.close(self.profile.name)
+            self.client = None
+            self.db = None
             print("MongoDB connection closed.")
 
-    def insert_documents(self, collection_name: str, documents: list[dict]) -> tuple[bool, str]:
+    def ensure_indexes(self) -> list[str]:
+        """Create INDEXES on every collection (a no-op for indexes that already exist).
+
+        Returns one message per collection whose indexes could not be built,
+        e.g. because existing documents share a full_tag; the other
+        collections are still indexed.
+        """
+        if self.db is None:
+            return ["Not connected to MongoDB."]
+        problems = []
+        for collection_name in COLLECTION_TYPES:
+            try:
+                self.db[collection_name].create_indexes(INDEXES)
+            except errors.DuplicateKeyError as e:
+                problems.append(f"Duplicate full_tag values in '{collection_name}'; full_tag is not unique yet: {e}")
+            except errors.PyMongoError as e:
+                problems.append(f"Could not create indexes on '{collection_name}': {e}")
+        for problem in problems:
+            print(problem)
+        self._indexes_ensured = not problems
+        return problems
+
+    def ensure_text_index(self) -> list[str]:
+        """Create TEXT_INDEX on every collection for text_search; returns one message per failed collection.
+
+        Not part of ensure_indexes(): a text index is large and slow to build,
+        and only pays off on datasets too big to index in memory.
+        """
+        if self.db is None:
+            return ["Not connected to MongoDB."]
+        problems = []
+        for collection_name in COLLECTION_TYPES:
+            try:
+                self.db[collection_name].create_indexes([TEXT_INDEX])
+            except errors.PyMongoError as e:
+                problems.append(f"Could not create the text index on '{collection_name}': {e}")
+        for problem in problems:
+            print(problem)
+        return problems
+
+    def text_search(self, collection_name: str, query: str, limit: int = 50) -> tuple[bool, str, list[dict]]:
+        """Run query against TEXT_INDEX; returns (success, message, documents best first, each with its score)."""
+        if self.db is None:
+            if not self.connect():
+                return False, "Not connected to MongoDB.", []
+        try:
+            cursor = self.db[collection_name].find({'$text': {'$search': query}}, TEXT_SEARCH_PROJECTION)
+            docs = list(cursor.sort([('score', {'$meta': 'textScore'})]).limit(limit))
+            return True, f"Found {len(docs)} documents.", docs
+        except errors.OperationFailure as e:
+            # Most likely no text index yet
+            print(f"Text search failed on '{collection_name}': {e}")
+            return False, f"Text search failed on '{collection_name}' (create the text index first): {e}", []
+        except errors.PyMongoError as e:
+            print(f"Text search failed on '{collection_name}': {e}")
+            return False, str(e), []
+
+    def find_children(self, collection_name: str, full_tag: str, projection: Optional[dict] = None) -> Cursor:
+        """Documents whose tag path is directly below full_tag (parent_tag index)."""
+        if self.db is None:
+            raise errors.ConnectionFailure("Not connected to MongoDB.")
+        return self.db[collection_name].find({'parent_tag': full_tag}, projection)
+
+    def find_subtree(self, collection_name: str, full_tag: str, projection: Optional[dict] = None) -> Cursor:
+        """The document at full_tag and every document below it (full_tag and ancestors indexes)."""
+        if self.db is None:
+            raise errors.ConnectionFailure("Not connected to MongoDB.")
+        return self.db[collection_name].find({'$or': [{'full_tag': full_tag}, {'ancestors': full_tag}]}, projection)
+
+    def find_documents(self, collection_name: str, skeleton: bool = False, batch_size: Optional[int] = None) -> Cursor:
+        """Return a cursor over a collection; skeleton=True fetches only SKELETON_PROJECTION."""
+        if self.db is None:
+            raise errors.ConnectionFailure("Not connected to MongoDB.")
+        cursor = self.db[collection_name].find({}, SKELETON_PROJECTION if skeleton else None)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def get_document(self, collection_name: str, document_id: Any) -> Optional[dict]:
+        """Fetch a full document by _id, served from a small LRU cache when possible."""
+        key = (collection_name, document_id)
+        with self._cache_lock:
+            if key in self._document_cache:
+                self._document_cache.move_to_end(key)
+                return self._document_cache[key]
+        if self.db is None:
+            if not self.connect():
+                return None
+        try:
+            doc = self.db[collection_name].find_one({'_id': document_id})
+        except Exception as e:
+            print(f"Error fetching document: {e}")
+            return None
+        if doc is not None:
+            self.cache_document(collection_name, doc)
+        return doc
+
+    def cache_document(self, collection_name: str, document: dict) -> None:
+        """Remember the latest full version of a document (e.g. one written by the write queue)."""
+        with self._cache_lock:
+            self._document_cache[(collection_name, document.get('_id'))] = document
+            self._document_cache.move_to_end((collection_name, document.get('_id')))
+            if len(self._document_cache) > DOCUMENT_CACHE_SIZE:
+                self._document_cache.popitem(last=False)
+
+    def invalidate_cached(self, collection_name: str, document_id: Any) -> None:
+        with self._cache_lock:
+            self._document_cache.pop((collection_name, document_id), None)
+
+    def invalidate_cached_subtree(self, collection_name: str, full_tag: str) -> None:
+        prefix = full_tag + '.'
+        with self._cache_lock:
+            for key, doc in list(self._document_cache.items()):
+                if key[0] == collection_name and (doc.get('full_tag') == full_tag or doc.get('full_tag', '').startswith(prefix)):
+                    del self._document_cache[key]
+
+    def supports_transactions(self) -> bool:
+        """True when connected to a replica set or sharded cluster (standalone servers have no transactions)."""
+        if self._supports_transactions is None:
+            try:
+                hello = self.client.admin.command('hello') if self.client else {}
+                self._supports_transactions = bool(hello.get('setName') or hello.get('msg') == 'isdbgrid')
+            except Exception:
+                self._supports_transactions = False
+        return self._supports_transactions
+
+    @staticmethod
+    def subtree_filter(full_tag: str) -> dict:
+        """Query matching a document and all of its descendants.
+
+        The descendant branch is an anchored prefix regex, answered from the
+        unique full_tag index. Unlike find_subtree it does not rely on the
+        ancestors field, so it also matches documents written before the
+        hierarchy fields were materialized.
+        """
+        return {'$or': [{'full_tag': full_tag}, {'full_tag': {'$regex': f'^{re.escape(full_tag)}\\.'}}]}
+
+    def delete_subtree(self, collection_name: str, full_tag: str, use_transaction: bool = True) -> tuple[bool, str, int]:
+        """Delete a document and all of its descendants with a single delete_many.
+
+        Runs inside a transaction when the server supports it (and use_transaction
+        is set), so a dropped connection cannot leave the subtree half-deleted.
+        Returns (success, message, deleted count).
+        """
+        if self.db is None:
+            if not self.connect():
+                return False, "Not connected to MongoDB.", 0
+        query = self.subtree_filter(full_tag)
+        self.invalidate_cached_subtree(collection_name, full_tag)
+        try:
+            collection = self.db[collection_name]
+            if use_transaction and self.supports_transactions():
+                with self.client.start_session() as session:
+                    with session.start_transaction():
+                        result = collection.delete_many(query, session=session)
+            else:
+                result = collection.delete_many(query)
+            count = result.deleted_count
+            if count > 0:
+                print(f"Deleted {count} documents under '{full_tag}' from '{collection_name}' collection.")
+                return True, f"Deleted {count} documents.", count
+            return False, f"Document {full_tag} not found.", 0
+        except Exception as e:
+            print(f"Error deleting documents: {e}")
+            return False, str(e), 0
+
+    def move_subtree(self, collection_name: str, full_tag: str, new_full_tag: str, use_transaction: bool = True) -> tuple[bool, str, list[tuple[str, str, dict]]]:
+        """Rename or re-parent a document together with all of its descendants.
+
+        full_tag, tag and the hierarchy fields of the whole subtree are
+        rewritten with one ordered bulk_write, and grantedTags entries naming
+        a moved tag are rewritten in every collection (one bulk_write each).
+        Runs inside a transaction when the server supports it; otherwise the
+        writes that went through before a failure are reverted. Refused when
+        a moved document would land on a full_tag that is already taken.
+
+        Returns (success, message, [(collection, old full_tag, document)]) for
+        every rewritten document; documents hold MOVE_PROJECTION with their
+        new values and hierarchy fields.
+        """
         if self.db is None:
             if not self.connect():
-                return False, "Not connected to MongoDB."
+                return False, "Not connected to MongoDB.", []
+        if new_full_tag == full_tag:
+            return True, NO_CHANGES, []
+        problem = move_problem(collection_name, full_tag, new_full_tag)
+        if problem:
+            return False, problem, []
+        try:
+            if use_transaction and self.supports_transactions():
+                with self.client.start_session() as session:
+                    # with_transaction retries the whole move on transient errors
+                    result = session.with_transaction(lambda s: self._move_subtree(collection_name, full_tag, new_full_tag, s))
+            else:
+                result = self._move_subtree(collection_name, full_tag, new_full_tag, None)
+        except errors.BulkWriteError as e:
+            if any(error.get('code') == 11000 for error in e.details.get('writeErrors', [])):
+                print(f"Duplicate full_tag moving {full_tag} to {new_full_tag}: {e}")
+                return False, f"A document under {new_full_tag} already exists.", []
+            print(f"Error moving {full_tag}: {e}")
+            return False, f"Error moving {full_tag}: {e}", []
+        except errors.PyMongoError as e:
+            print(f"Error moving {full_tag}: {e}")
+            return False, f"Error moving {full_tag}: {e}", []
+        success, message, rewritten = result
+        if success:
+            self.invalidate_cached_subtree(collection_name, full_tag)
+            for collection, _, doc in rewritten:
+                self.invalidate_cached(collection, doc.get('_id'))
+            print(f"Moved {full_tag} to {new_full_tag} in '{collection_name}': {message}")
+        return result
+
+    def _move_subtree(self, collection_name: str, full_tag: str, new_full_tag: str, session: Any) -> tuple[bool, str, list[tuple[str, str, dict]]]:
+        collection = self.db[collection_name]
+        docs = list(collection.find(self.subtree_filter(full_tag), MOVE_PROJECTION, session=session))
+        if not docs:
+            return False, f"Document {full_tag} not found.", []
+        new_tags = [retag(doc.get('full_tag', ''), full_tag, new_full_tag) for doc in docs]
+        taken = collection.find_one({'full_tag': {'$in': new_tags}}, {'full_tag': 1}, session=session)
+        if taken is not None:
+            return False, f"A document with full tag {taken['full_tag']} already exists.", []
+        # Per collection: (_id, fields to set, their previous values), then the documents handed back
+        writes: dict[str, list[tuple[Any, dict, dict]]] = {name: [] for name in COLLECTION_TYPES}
+        rewritten: list[tuple[str, str, dict]] = []
+        moved_ids = set()
+        prefix = collection_name + '.'
+        reference = {'$regex': f'^{re.escape(full_tag)}(\\.|$)'}
+        for doc, new_tag in zip(docs, new_tags):
+            sets = {'full_tag': new_tag, 'tag': new_tag[len(prefix):], **hierarchy_fields(new_tag)}
+            granted = doc.get('grantedTags')
+            if isinstance(granted, list) and any(isinstance(t, str) and retag(t, full_tag, new_full_tag) != t for t in granted):
+                sets['grantedTags'] = [retag(t, full_tag, new_full_tag) if isinstance(t, str) else t for t in granted]
+            previous = {**hierarchy_fields(doc.get('full_tag', '')), **{key: doc.get(key) for key in sets if key in doc}}
+            writes[collection_name].append((doc['_id'], sets, previous))
+            rewritten.append((collection_name, doc.get('full_tag', ''), {**doc, **sets, **self._next_version(doc)}))
+            moved_ids.add(doc['_id'])
+        for name in COLLECTION_TYPES:
+            for doc in self.db[name].find({'grantedTags': reference}, {'full_tag': 1, 'grantedTags': 1, 'version': 1}, session=session):
+                if name == collection_name and doc['_id'] in moved_ids:
+                    continue
+                granted = [retag(t, full_tag, new_full_tag) if isinstance(t, str) else t for t in doc['grantedTags']]
+                writes[name].append((doc['_id'], {'grantedTags': granted}, {'grantedTags': doc['grantedTags']}))
+                rewritten.append((name, doc.get('full_tag', ''), {**doc, 'grantedTags': granted, **self._next_version(doc)}))
+        # The moved subtree goes first so a clash stops the move before any reference is touched
+        order = [collection_name] + [name for name in COLLECTION_TYPES if name != collection_name and writes[name]]
+        applied: list[tuple[str, list[tuple[Any, dict, dict]]]] = []
+        try:
+            for name in order:
+                requests = [
+                    UpdateOne({'_id': _id}, {'$set': {**sets, 'updatedBy': self.editor}, '$inc': {'version': 1}, '$currentDate': {'updatedAt': True}})
+                    for _id, sets, _ in writes[name]
+                ]
+                self.db[name].bulk_write(requests, ordered=True, session=session)
+                applied.append((name, writes[name]))
+        except errors.BulkWriteError as e:
+            if session is None:
+                # No transaction to abort: put back what the ordered writes got through
+                failed_at = (e.details.get('writeErrors') or [{}])[0].get('index', 0)
+                self._revert_writes(applied + [(name, writes[name][:failed_at])])
+            raise
+        except errors.PyMongoError:
+            if session is None:
+                self._revert_writes(applied)
+            raise
+        references = len(rewritten) - len(docs)
+        return True, f"Moved {len(docs)} documents" + (f" and updated {references} references." if references else "."), rewritten
+
+    def _next_version(self, doc: dict) -> dict:
+        # The version and editor a move leaves a document at, so edits saved on top of it are not refused
+        return {'version': version_of(doc) + 1, 'updatedBy': self.editor}
+
+    def _revert_writes(self, applied: list[tuple[str, list[tuple[Any, dict, dict]]]]) -> None:
+        for name, writes in applied:
+            if not writes:
+                continue
+            try:
+                # Versions move forward even here, so edits opened on the moved tags are refused rather than applied
+                self.db[name].bulk_write([UpdateOne({'_id': _id}, {'$set': previous, '$inc': {'version': 1}}) for _id, _, previous in writes], ordered=False)
+            except errors.PyMongoError as e:
+                print(f"Could not revert a partial move in '{name}': {e}")
+
+    def insert_documents(self, collection_name: str, documents: list[dict]) -> tuple[bool, str, list[dict]]:
+        """Insert documents; returns (success, message, the inserted documents with their new _id)."""
+        if self.db is None:
+            if not self.connect():
+                return False, "Not connected to MongoDB.", []
         try:
             collection = self.db[collection_name]
             if not documents:
-                return False, "No documents to insert."
+                return False, "No documents to insert.", []
+            documents = [with_hierarchy_fields(doc) for doc in documents]
+            # insert_many fills in _id on the passed dicts
             result = collection.insert_many(documents)
             print(f"Inserted {len(result.inserted_ids)} documents into '{collection_name}' collection.")
-            return True, f"Successfully inserted {len(result.inserted_ids)} documents."
+            return True, f"Successfully inserted {len(result.inserted_ids)} documents.", documents
+        except errors.BulkWriteError as e:
+            if any(error.get('code') == 11000 for error in e.details.get('writeErrors', [])):
+                print(f"Duplicate full_tag inserting into '{collection_name}': {e}")
+                return False, "A document with this full tag already exists.", []
+            print(f"Error inserting documents: {e}")
+            return False, f"Error inserting documents: {e}", []
         except errors.PyMongoError as e:
             print(f"Error inserting documents: {e}")
-            return False, f"Error inserting documents: {e}"
+            return False, f"Error inserting documents: {e}", []
         except Exception as e:
             print(f"An unexpected error occurred during document insertion: {e}")
-            return False, f"An unexpected error occurred: {e}"
+            return False, f"An unexpected error occurred: {e}", []
 
-    def delete_document(self, collection_name: str, document_id: Any) -> tuple[bool, str]:
-        """Delete a document by _id from the specified collection."""
+    def delete_document(self, collection_name: str, document_id: Any) -> tuple[bool, str, Optional[dict]]:
+        """Delete a document by _id from the specified collection; returns (success, message, the deleted document)."""
         if self.db is None:
             if not self.connect():
-                return False, "Not connected to MongoDB."
+                return False, "Not connected to MongoDB.", None
+        self.invalidate_cached(collection_name, document_id)
         try:
-            result = self.db[collection_name].delete_one({'_id': document_id})
-            if result.deleted_count > 0:
+            doc = self.db[collection_name].find_one_and_delete({'_id': document_id})
+            if doc is not None:
                 print(f"Deleted document {document_id} from '{collection_name}' collection.")
-                return True, f"Deleted document {document_id}."
+                return True, f"Deleted document {document_id}.", doc
             else:
-                return False, f"Document {document_id} not found."
+                return False, f"Document {document_id} not found.", None
         except Exception as e:
             print(f"Error deleting document: {e}")
-            return False, str(e)
+            return False, str(e), None
+
+    def update_document(self, collection_name: str, document_id: Any, new_data: dict, original: Optional[dict] = None) -> tuple[bool, str, Optional[dict]]:
+        """Update a document by _id, sending only the fields (and map keys) that differ from the original.
 
-    def update_document(self, collection_name: str, document_id: Any, new_data: dict) -> tuple[bool, str]:
-        """Update a document by _id in the specified collection."""
+        original is the document the edit started from; if omitted, the cached
+        or freshly fetched copy is used. Returns (success, message, the updated
+        document); when nothing differs no request is sent and the message is
+        NO_CHANGES.
+
+        The update only applies while the stored document is still at
+        original's version (the check is part of the update's filter, so it
+        costs no extra round trip) and moves it to the next version. If
+        another editor saved it first, the message is CONFLICT and the payload
+        the document as it is now.
+        """
         if self.db is None:
             if not self.connect():
-                return False, "Not connected to MongoDB."
+                return False, "Not connected to MongoDB.", None
+        if original is None:
+            original = self.get_document(collection_name, document_id)
+            if original is None:
+                return False, f"Document {document_id} not found.", None
+        # A changed full_tag moves the document, so its hierarchy fields follow
+        update = diff_update(original, with_hierarchy_fields(new_data))
+        if not update:
+            return True, NO_CHANGES, original
+        version = version_of(original)
+        update.setdefault('$set', {}).update({'version': version + 1, 'updatedBy': self.editor})
+        # Server-side timestamp, so snapshot reconciles can find edits made since their sync marker
+        update['$currentDate'] = {'updatedAt': True}
+        self.invalidate_cached(collection_name, document_id)
         try:
-            result = self.db[collection_name].update_one({'_id': document_id}, {'$set': new_data})
-            if result.modified_count > 0:
+            # Same round trip as update_one, but hands back the post-update document
+            doc = self.db[collection_name].find_one_and_update(
+                versioned_filter(document_id, version), update, return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                self.cache_document(collection_name, doc)
                 print(f"Updated document {document_id} in '{collection_name}' collection.")
-                return True, f"Updated document {document_id}."
-            else:
-                return False, f"Document {document_id} not found or no changes made."
+                return True, f"Updated document {document_id}.", doc
+            # Changed or deleted since original was read; only this path reads the document again
+            current = self.db[collection_name].find_one({'_id': document_id})
+            if current is None:
+                return False, f"{original.get('full_tag', document_id)} was deleted by another editor.", None
+            self.cache_document(collection_name, current)
+            print(f"Version conflict updating {document_id} in '{collection_name}' (version {version}, now {version_of(current)}).")
+            return False, CONFLICT, current
+        except errors.DuplicateKeyError:
+            return False, f"A document with full tag {new_data.get('full_tag')} already exists.", None
         except Exception as e:
             print(f"Error updating document: {e}")
-            return False, str(e)
\ No newline at end of file
+            return False, str(e), None
@@ -0,0 +1,54 @@
+"""
+Presence of the other editors working on the same database.
+
+Each running editor keeps one document in the editors collection: its
+name, the collection it shows and the document it has open for editing,
+with a server timestamp refreshed by a periodic heartbeat. Entries not
+refreshed for STALE_SECONDS are ignored, and a TTL index removes editors
+that went away without leaving.
+"""
+from typing import Any, Dict, List, Optional
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from pymongo import ASCENDING, IndexModel, errors
+from pymongo.database import Database
+
+EDITORS_COLLECTION = 'editors'
+HEARTBEAT_MS = 15000
+# Entries older than this (by the server's clock) belong to editors that stopped
+STALE_SECONDS = 60
+TTL_INDEX = IndexModel([('seenAt', ASCENDING)], name='seenAt_ttl', expireAfterSeconds=10 * STALE_SECONDS)
+PRESENCE_PROJECTION = {'editor': 1, 'collection': 1, 'editing': 1}
+
+def heartbeat(db: Database, session_id: Any, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Record this editor's entry and return the other editors seen recently."""
+    editors = db[EDITORS_COLLECTION]
+    editors.update_one({'_id': session_id}, {'$set': entry, '$currentDate': {'seenAt': True}}, upsert=True)
+    recent = {'$expr': {'$gte': ['$seenAt', {'$subtract': ['$$NOW', STALE_SECONDS * 1000]}]}}
+    return list(editors.find({'_id': {'$ne': session_id}, **recent}, PRESENCE_PROJECTION))
+
+def leave(db: Database, session_id: Any) -> None:
+    """Remove this editor's entry (on close), so others stop listing it straight away."""
+    try:
+        db[EDITORS_COLLECTION].delete_one({'_id': session_id})
+    except errors.PyMongoError as e:
+        print(f"Could not remove the editor presence entry: {e}")
+
+class PresenceWorker(QThread):
+    """Sends one heartbeat off the GUI thread and reports the other editors."""
+    editorsSeen = pyqtSignal(object)  # list of {'editor', 'collection', 'editing'} entries
+    _index_ensured = False
+
+    def __init__(self, db: Database, session_id: Any, entry: Dict[str, Any], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.session_id = session_id
+        self.entry = entry
+
+    def run(self) -> None:
+        try:
+            if not PresenceWorker._index_ensured:
+                self.db[EDITORS_COLLECTION].create_indexes([TTL_INDEX])
+                PresenceWorker._index_ensured = True
+            self.editorsSeen.emit(heartbeat(self.db, self.session_id, self.entry))
+        except errors.PyMongoError as e:
+            print(f"Editor presence heartbeat failed: {e}")
@@ -0,0 +1,117 @@
+"""
+Background work for global search: building the in-memory index and server-side text queries.
+"""
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from pymongo import errors
+from pymongo.database import Database
+from forms.form_data import COLLECTION_TYPES
+from db.mongo_handler import MongoDBHandler
+from db.snapshot_store import SnapshotStore
+from models.search_index import SearchIndex, SearchHit, FIELD_WEIGHTS, KEY_FIELDS, DEFAULT_LIMIT
+
+BATCH_SIZE = 2000
+
+def search_projection(prefix: str = '') -> Dict[str, Any]:
+    """$project fields for what the index reads; map fields are reduced server-side to their keys.
+
+    prefix is the path the document sits under ('fullDocument.' in change events).
+    """
+    projection: Dict[str, Any] = {}
+    for field in FIELD_WEIGHTS:
+        path = f'{prefix}{field}'
+        if field in KEY_FIELDS:
+            projection[path] = {'$cond': [
+                {'$eq': [{'$type': f'${path}'}, 'object']},
+                {'$map': {'input': {'$objectToArray': f'${path}'}, 'as': 'entry', 'in': '$$entry.k'}},
+                '$$REMOVE',
+            ]}
+        else:
+            projection[path] = 1
+    return projection
+
+# Only the fields the index reads are fetched, and of the grant maps only their keys
+SEARCH_PROJECTION = search_projection()
+
+def build_search_index(
+    db: Optional[Database],
+    snapshot: Optional[SnapshotStore] = None,
+    batch_size: int = BATCH_SIZE,
+    cancelled: Callable[[], bool] = lambda: False,
+) -> SearchIndex:
+    """Index every collection, read from the server with SEARCH_PROJECTION.
+
+    Without a server the snapshot's skeleton documents are indexed instead
+    (names, tags and descriptions, but no granted tags, stats or abilities).
+    Returns what was indexed so far if cancelled.
+    """
+    index = SearchIndex()
+    for collection in COLLECTION_TYPES:
+        if db is not None:
+            with db[collection].aggregate([{'$project': SEARCH_PROJECTION}], batchSize=batch_size) as cursor:
+                while True:
+                    batch = list(islice(cursor, batch_size))
+                    if not batch:
+                        break
+                    index.add_many(collection, batch)
+                    if cancelled():
+                        return index
+        elif snapshot is not None and snapshot.sync_info(collection) is not None:
+            for batch in snapshot.iter_batches(collection, batch_size):
+                index.add_many(collection, batch)
+                if cancelled():
+                    return index
+    return index
+
+class SearchIndexWorker(QThread):
+    """Runs build_search_index off the GUI thread."""
+    indexReady = pyqtSignal(object)  # SearchIndex
+    indexFailed = pyqtSignal(str)
+
+    def __init__(self, db: Optional[Database], snapshot: Optional[SnapshotStore] = None, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.snapshot = snapshot
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        try:
+            index = build_search_index(self.db, self.snapshot, cancelled=lambda: self._cancelled)
+        except errors.PyMongoError as e:
+            print(f"Error building the search index: {e}")
+            self.indexFailed.emit(str(e))
+            return
+        if not self._cancelled:
+            self.indexReady.emit(index)
+
+class TextSearchWorker(QThread):
+    """Runs one query against the MongoDB text index of every collection."""
+    searchFinished = pyqtSignal(int, object)  # (generation, list of SearchHit, best first)
+    searchFailed = pyqtSignal(int, str)  # (generation, error message)
+
+    def __init__(self, db_handler: MongoDBHandler, query: str, generation: int, limit: int = DEFAULT_LIMIT,
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.query = query
+        self.generation = generation
+        self.limit = limit
+
+    def run(self) -> None:
+        hits: List[SearchHit] = []
+        for collection in COLLECTION_TYPES:
+            success, message, docs = self.db_handler.text_search(collection, self.query, self.limit)
+            if not success:
+                self.searchFailed.emit(self.generation, message)
+                return
+            hits.extend(
+                SearchHit(collection=collection, full_tag=doc.get('full_tag', ''), display_name=doc.get('displayName') or '', score=doc.get('score', 0.0))
+                for doc in docs
+            )
+        # Text scores of different collections are comparable: same index definition and weights
+        hits.sort(key=lambda hit: (-hit.score, len(hit.full_tag), hit.full_tag))
+        self.searchFinished.emit(self.generation, hits[:self.limit])
@@ -0,0 +1,100 @@
+"""
+Local snapshot store for the RCP Database Editor.
+
+Keeps the documents last loaded for each collection (the skeleton projection)
+in a SQLite file next to the logs, BSON-encoded so ObjectIds and dates
+round-trip, together with a sync marker: the server's clock when that load
+started. The window renders from the snapshot before the server answers and
+falls back to it, read-only, when the server cannot be reached.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import bson
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+def snapshot_path(db_name: str) -> str:
+    """Default snapshot file for a database."""
+    return os.path.join(DATA_DIR, f'{db_name}.snapshot.sqlite3')
+
+def _encode_id(document_id: Any) -> bytes:
+    # BSON keeps the _id's type, so ObjectId and string ids never collide
+    return bson.encode({'_id': document_id})
+
+class SnapshotStore:
+    """SQLite-backed snapshot of each collection's documents plus its sync marker.
+
+    Every call opens its own connection, so the store can be shared between the
+    GUI thread and collection loaders.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            'collection TEXT NOT NULL, doc_id BLOB NOT NULL, doc BLOB NOT NULL, '
+            'PRIMARY KEY (collection, doc_id))'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sync_markers ('
+            'collection TEXT PRIMARY KEY, marker BLOB, synced_at REAL NOT NULL)'
+        )
+        return conn
+
+    def sync_info(self, collection: str) -> Optional[Tuple[Any, float]]:
+        """(server time the snapshot was synced from, local time.time() of the sync), or None without a snapshot."""
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute('SELECT marker, synced_at FROM sync_markers WHERE collection = ?', (collection,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading snapshot: {e}")
+            return None
+        if row is None:
+            return None
+        marker = bson.decode(row[0]).get('marker') if row[0] is not None else None
+        return marker, row[1]
+
+    def iter_batches(self, collection: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the snapshot's documents for a collection in batches."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute('SELECT doc FROM documents WHERE collection = ?', (collection,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [bson.decode(row[0]) for row in rows]
+
+    def replace_collection(self, collection: str, documents: Iterable[Dict[str, Any]], marker: Any) -> None:
+        """Overwrite a collection's snapshot with a complete load."""
+        rows = ((collection, _encode_id(doc.get('_id')), bson.encode(doc)) for doc in documents)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM documents WHERE collection = ?', (collection,))
+            conn.executemany('INSERT OR REPLACE INTO documents VALUES (?, ?, ?)', rows)
+            self._set_marker(conn, collection, marker)
+
+    def apply_changes(self, collection: str, changed: Iterable[Dict[str, Any]], removed_ids: Iterable[Any], marker: Any) -> None:
+        """Fold a reconcile delta into a collection's snapshot and advance its marker."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'DELETE FROM documents WHERE collection = ? AND doc_id = ?',
+                ((collection, _encode_id(document_id)) for document_id in removed_ids),
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO documents VALUES (?, ?, ?)',
+                ((collection, _encode_id(doc.get('_id')), bson.encode(doc)) for doc in changed),
+            )
+            self._set_marker(conn, collection, marker)
+
+    @staticmethod
+    def _set_marker(conn: sqlite3.Connection, collection: str, marker: Any) -> None:
+        conn.execute(
+            'INSERT OR REPLACE INTO sync_markers VALUES (?, ?, ?)',
+            (collection, bson.encode({'marker': marker}), time.time()),
+        )
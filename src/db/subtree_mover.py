@@ -0,0 +1,35 @@
+"""
+Moving a subtree (with the granted tags referring to it) off the GUI thread.
+"""
+from typing import Optional
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from db.mongo_handler import MongoDBHandler
+
+# What save_edit reports for an edit whose tag change is still being moved; the rest follows the move
+MOVE_STARTED = "Moving the document to its new tag; the other changes are saved once the move is done."
+
+class SubtreeMoveWorker(QThread):
+    """Runs MongoDBHandler.move_subtree on a worker thread.
+
+    Carries a generation like the other workers, so the window can tell
+    the move it is waiting for from one it has given up on.
+    """
+    moveFinished = pyqtSignal(int, bool, str, object)  # (generation, success, message, [(collection, old full_tag, document)])
+
+    def __init__(self, db_handler: MongoDBHandler, collection: str, full_tag: str, new_full_tag: str, generation: int,
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.collection = collection
+        self.full_tag = full_tag
+        self.new_full_tag = new_full_tag
+        self.generation = generation
+        self.result = (False, f"The move of {full_tag} did not finish.", [])
+
+    def run(self) -> None:
+        try:
+            self.result = self.db_handler.move_subtree(self.collection, self.full_tag, self.new_full_tag)
+        except Exception as e:
+            print(f"An unexpected error occurred while moving {self.full_tag}: {e}")
+            self.result = (False, f"Error moving {self.full_tag}: {e}", [])
+        self.moveFinished.emit(self.generation, *self.result)
@@ -0,0 +1,340 @@
+"""
+Write-behind queue for the editor's database writes.
+
+Dialogs hand their writes to WriteQueue instead of calling MongoDBHandler
+directly. The queue answers at once with the document as it will be once
+saved, so the caller patches the views straight away (optimistically), and
+sends the pending writes a moment later from a worker thread, one ordered
+bulk_write per collection. Repeated edits of the same document before a
+flush are coalesced into one update, diffed against the document the first
+edit started from. A write the server rejects is reported through
+writeFailed together with the changes that undo it in the views.
+
+Updates are conditional on the version of the document they started from
+(see MongoDBHandler.update_document). An update that matched nothing was
+beaten by another editor; it is reported through writeConflict with the
+three copies needed to merge it.
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+from pymongo import DeleteMany, InsertOne, UpdateOne, errors
+from db.mongo_handler import MongoDBHandler, CONFLICT, NO_CHANGES, diff_update, skeleton_of, version_of, versioned_filter, with_hierarchy_fields
+
+# Quiet time after the last queued write before the queue is flushed (edits made meanwhile coalesce)
+FLUSH_DELAY_MS = 400
+
+class PendingWrite:
+    """One queued write. kind is 'insert', 'update' or 'delete'.
+
+    insert: document is the new document (with its pre-assigned _id).
+    update: original is the document the first coalesced edit started
+            from, document the result of applying every edit to it (at the
+            next version). current is the stored document when the update
+            lost a version conflict.
+    delete: full_tag is the subtree root; documents are what it removed
+            from the views, for rollback.
+    """
+    __slots__ = ('kind', 'collection', 'document_id', 'full_tag', 'document', 'original', 'documents', 'current')
+
+    def __init__(self, kind: str, collection: str, document_id: Any = None, full_tag: str = '', document: Optional[dict] = None,
+                 original: Optional[dict] = None, documents: Optional[List[dict]] = None) -> None:
+        self.kind = kind
+        self.collection = collection
+        self.document_id = document_id
+        self.full_tag = full_tag
+        self.document = document
+        self.original = original
+        self.documents = documents or []
+        self.current: Optional[dict] = None
+
+    def request(self) -> Any:
+        """The bulk_write request for this write, or None when it no longer changes anything."""
+        if self.kind == 'insert':
+            return InsertOne(self.document)
+        if self.kind == 'update':
+            update = diff_update(self.original or {}, self.document or {})
+            if not update:
+                return None
+            update['$currentDate'] = {'updatedAt': True}
+            return UpdateOne(versioned_filter(self.document_id, version_of(self.original or {})), update)
+        return DeleteMany(MongoDBHandler.subtree_filter(self.full_tag))
+
+    def rollback(self) -> Dict[str, list]:
+        """apply_changes() arguments that undo this write's optimistic patch."""
+        if self.kind == 'insert':
+            return {'removed': [self.full_tag]}
+        if self.kind == 'update':
+            # After a conflict the views show what the other editor saved
+            return {'updated': [((self.document or {}).get('full_tag', ''), self.current or self.original)]}
+        return {'inserted': self.documents}
+
+    def describe(self) -> str:
+        name = self.full_tag or (self.document or {}).get('full_tag', '')
+        return {'insert': f"create {name}", 'update': f"update {name}", 'delete': f"delete {name}"}[self.kind]
+
+def _check_versions(db: Any, collection: str, writes: List[PendingWrite], matched: int) -> List[Tuple[PendingWrite, Optional[str]]]:
+    """Which of the sent writes were saved, given how many updates the server matched.
+
+    When every update matched (the usual case) nothing is read. Otherwise
+    the updated documents are read back: an update was applied when its
+    document is at the version and editor it wrote, and lost a conflict
+    (PendingWrite.current then holds the stored document) or found its
+    document deleted when not.
+    """
+    updates = [write for write in writes if write.kind == 'update']
+    if matched >= len(updates):
+        return [(write, None) for write in writes]
+    try:
+        stored = {doc['_id']: doc for doc in db[collection].find({'_id': {'$in': [write.document_id for write in updates]}})}
+    except errors.PyMongoError as e:
+        print(f"Error reading back conflicting writes in '{collection}': {e}")
+        stored = {}
+    results: List[Tuple[PendingWrite, Optional[str]]] = []
+    for write in writes:
+        current = stored.get(write.document_id) if write.kind == 'update' else None
+        document = write.document or {}
+        if write.kind != 'update' or (current is not None and version_of(current) == version_of(document)
+                                       and current.get('updatedBy') == document.get('updatedBy')):
+            results.append((write, None))
+        elif current is None:
+            results.append((write, f"{document.get('full_tag', write.document_id)} was deleted by another editor."))
+        else:
+            write.current = current
+            results.append((write, CONFLICT))
+    return results
+
+def flush_writes(db: Any, writes: List[PendingWrite]) -> List[Tuple[PendingWrite, Optional[str]]]:
+    """Send writes as one ordered bulk_write per collection; returns each write with its error (None if saved).
+
+    Ordered, so a write never overtakes one queued before it; when one
+    fails, the writes after it in its collection are not attempted and are
+    reported as failed too. An update whose version check fails is not an
+    error to the server (it just matches nothing) and does not stop the
+    others; it is reported with the error CONFLICT.
+    """
+    results: List[Tuple[PendingWrite, Optional[str]]] = []
+    by_collection: Dict[str, List[PendingWrite]] = {}
+    for write in writes:
+        by_collection.setdefault(write.collection, []).append(write)
+    for collection, group in by_collection.items():
+        sent = [(write, write.request()) for write in group]
+        requests = [request for _, request in sent if request is not None]
+        sent_writes = [write for write, request in sent if request is not None]
+        results.extend((write, None) for write, request in sent if request is None)
+        if not requests:
+            continue
+        try:
+            result = db[collection].bulk_write(requests, ordered=True)
+            results.extend(_check_versions(db, collection, sent_writes, result.matched_count))
+        except errors.BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            failed_at = write_errors[0].get('index', 0) if write_errors else 0
+            error = write_errors[0] if write_errors else {}
+            if error.get('code') == 11000:
+                message = f"A document with this full tag already exists ({sent_writes[failed_at].describe()})."
+            else:
+                message = f"Could not {sent_writes[failed_at].describe()}: {error.get('errmsg', e)}"
+            print(message)
+            results.extend(_check_versions(db, collection, sent_writes[:failed_at], e.details.get('nMatched', 0)))
+            results.append((sent_writes[failed_at], message))
+            results.extend((write, f"Not saved because an earlier write failed ({write.describe()}).") for write in sent_writes[failed_at + 1:])
+        except errors.PyMongoError as e:
+            print(f"Error writing to '{collection}': {e}")
+            results.extend((write, f"Could not {write.describe()}: {e}") for write in sent_writes)
+    return results
+
+class WriteFlushWorker(QThread):
+    """Runs flush_writes off the GUI thread; results holds each write with its error once finished."""
+    def __init__(self, db: Any, writes: List[PendingWrite], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db = db
+        self.writes = writes
+        self.results: List[Tuple[PendingWrite, Optional[str]]] = []
+
+    def run(self) -> None:
+        if self.db is None:
+            self.results = [(write, "Not connected to MongoDB.") for write in self.writes]
+            return
+        self.results = flush_writes(self.db, self.writes)
+
+class WriteQueue(QObject):
+    """Queues inserts, updates and subtree deletes and flushes them in the background.
+
+    The write methods mirror MongoDBHandler's and return the same
+    (success, message, payload) tuples, describing the write as if it had
+    been saved. Only one flush is in flight at a time; writes queued during
+    it go out with the next one. exists(collection, full_tag) lets inserts
+    be refused up front when the tag is already taken in the loaded model.
+    """
+    pendingChanged = pyqtSignal(int)  # writes queued or in flight
+    writesSaved = pyqtSignal(int)  # writes confirmed by the last flush
+    writeFailed = pyqtSignal(str, str, object)  # (collection, message, apply_changes() arguments undoing the write)
+    writeConflict = pyqtSignal(str, object, object, object)  # (collection, base, mine, theirs) of an update another editor beat
+
+    def __init__(self, db_handler: MongoDBHandler, exists: Optional[Callable[[str, str], bool]] = None,
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.db_handler = db_handler
+        self.exists = exists or (lambda collection, full_tag: False)
+        self._queued: List[PendingWrite] = []
+        self._by_id: Dict[Tuple[str, Any], PendingWrite] = {}  # unsent insert/update per document, for coalescing
+        self._in_flight: List[PendingWrite] = []
+        self._worker: Optional[WriteFlushWorker] = None
+        self._held = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def pending(self) -> int:
+        return len(self._queued) + len(self._in_flight)
+
+    def is_pending(self, collection_name: str, document_id: Any, full_tag: str = '') -> bool:
+        """True while a write of this document (or the deletion of a subtree holding full_tag) is queued or in flight.
+
+        The views already show such a document as the write leaves it, so
+        changes read from the server meanwhile are older and are skipped.
+        """
+        for write in self._queued + self._in_flight:
+            if write.collection != collection_name:
+                continue
+            if write.kind == 'delete':
+                if full_tag and (full_tag == write.full_tag or full_tag.startswith(write.full_tag + '.')):
+                    return True
+            elif write.document_id == document_id:
+                return True
+        return False
+
+    def hold(self) -> None:
+        """Keep further writes queued (while a subtree move rewrites tags) until release()."""
+        self._held = True
+        self._timer.stop()
+
+    def release(self) -> None:
+        self._held = False
+        if self._queued:
+            self._timer.start()
+
+    def _enqueue(self, write: PendingWrite) -> None:
+        self._queued.append(write)
+        self._changed()
+
+    def _changed(self) -> None:
+        self.pendingChanged.emit(self.pending)
+        self._timer.start()
+
+    # --- Writes (same signatures and results as MongoDBHandler's) ---
+    def insert_documents(self, collection_name: str, documents: List[dict]) -> Tuple[bool, str, List[dict]]:
+        if not documents:
+            return False, "No documents to insert.", []
+        inserted = []
+        for document in documents:
+            if self.exists(collection_name, document.get('full_tag', '')):
+                return False, "A document with this full tag already exists.", []
+        for document in documents:
+            # The _id is assigned here so later edits can refer to the document before it is saved
+            document = with_hierarchy_fields({'_id': ObjectId(), **document})
+            write = PendingWrite('insert', collection_name, document['_id'], document.get('full_tag', ''), document=document)
+            self._by_id[(collection_name, write.document_id)] = write
+            self.db_handler.cache_document(collection_name, document)
+            self._enqueue(write)
+            inserted.append(document)
+        return True, f"Queued {len(inserted)} documents.", inserted
+
+    def update_document(self, collection_name: str, document_id: Any, new_data: dict, original: Optional[dict] = None) -> Tuple[bool, str, Optional[dict]]:
+        key = (collection_name, document_id)
+        write = self._by_id.get(key)
+        base = write.document if write is not None else original
+        if base is None:
+            base = self.get_document(collection_name, document_id)
+            if base is None:
+                return False, f"Document {document_id} not found.", None
+        changes = with_hierarchy_fields(new_data)
+        full_tag = changes.get('full_tag', base.get('full_tag', ''))
+        if full_tag != base.get('full_tag') and self.exists(collection_name, full_tag):
+            return False, f"A document with full tag {full_tag} already exists.", None
+        if not diff_update(base, changes):
+            return True, NO_CHANGES, base
+        document = {**base, **changes}
+        if write is not None:
+            # Coalesce with the unsent write for this document
+            write.document = document
+            write.full_tag = document.get('full_tag', '')
+            self._changed()
+        else:
+            # The document as it will be stored: one version on, written by this editor
+            document.update({'version': version_of(base) + 1, 'updatedBy': self.db_handler.editor})
+            write = PendingWrite('update', collection_name, document_id, document.get('full_tag', ''), document=document, original=base)
+            self._by_id[key] = write
+            self._enqueue(write)
+        self.db_handler.cache_document(collection_name, document)
+        return True, f"Updated document {document_id}.", document
+
+    def delete_subtree(self, collection_name: str, full_tag: str, documents: Optional[List[dict]] = None) -> Tuple[bool, str, int]:
+        """Queue the deletion of a document and its descendants; documents are the ones it removes from the views."""
+        documents = [skeleton_of(doc) for doc in documents or []]
+        self.db_handler.invalidate_cached_subtree(collection_name, full_tag)
+        self._enqueue(PendingWrite('delete', collection_name, full_tag=full_tag, documents=documents))
+        count = len(documents) or 1
+        return True, f"Deleted {count} documents.", count
+
+    def get_document(self, collection_name: str, document_id: Any) -> Optional[dict]:
+        """The document as the queued writes leave it, else as MongoDBHandler.get_document has it."""
+        write = self._by_id.get((collection_name, document_id))
+        if write is None:
+            write = next((w for w in self._in_flight if w.collection == collection_name and w.document_id == document_id and w.kind != 'delete'), None)
+        if write is not None:
+            return write.document
+        return self.db_handler.get_document(collection_name, document_id)
+
+    # --- Flushing ---
+    def flush(self) -> None:
+        """Send everything queued now (no-op while held, or while a flush is in flight; it follows when that one finishes)."""
+        self._timer.stop()
+        if self._held or self._worker is not None or not self._queued:
+            return
+        self._in_flight, self._queued = self._queued, []
+        self._by_id = {}
+        worker = WriteFlushWorker(self.db_handler.db, self._in_flight, self)
+        worker.finished.connect(lambda: self._flush_finished(worker))
+        worker.finished.connect(worker.deleteLater)
+        self._worker = worker
+        worker.start()
+
+    def _flush_finished(self, worker: WriteFlushWorker) -> None:
+        if worker is not self._worker:
+            return  # already handled by wait()
+        self._worker = None
+        self._in_flight = []
+        saved = 0
+        for write, error in worker.results:
+            if error is None:
+                saved += 1
+                continue
+            if write.current is not None:
+                self.db_handler.cache_document(write.collection, write.current)
+            elif write.kind != 'delete':
+                self.db_handler.invalidate_cached(write.collection, write.document_id)
+            self.writeFailed.emit(write.collection, error, write.rollback())
+            if write.current is not None:
+                self.writeConflict.emit(write.collection, write.original, write.document, write.current)
+        self.pendingChanged.emit(self.pending)
+        if saved:
+            self.writesSaved.emit(saved)
+        if self._queued:
+            self.flush()
+
+    def wait(self, msecs: int = 10000) -> bool:
+        """Flush what is queued and block until it is written, for at most msecs in all; False if writes remain."""
+        deadline = time.monotonic() + msecs / 1000
+        self.flush()
+        while self._worker is not None:
+            worker = self._worker
+            if not worker.wait(max(0, int((deadline - time.monotonic()) * 1000))):
+                return False
+            # Handle it now rather than when the finished signal arrives; this also sends the next batch
+            self._flush_finished(worker)
+        return not self.pending
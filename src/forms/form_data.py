@@ -41,21 +41,21 @@ class FormData:
 class RaceFormData(FormData):
     def __init__(self):
         super().__init__("Race")
-        self.add_field("name", "")
+        self.add_field("displayName", "")
         self.add_field("description", "")
         self.add_field("iconPath", "")
-        self.add_field("racialStats", {})
+        self.add_field("grantStats", {})
 
 class ClassFormData(FormData):
     def __init__(self):
         super().__init__("Class")
-        self.add_field("name", "")
+        self.add_field("displayName", "")
         self.add_field("description", "")
-        self.add_field("classStats", {})
+        self.add_field("grantStats", {})
 
 class ProfessionFormData(FormData):
     def __init__(self):
         super().__init__("Profession")
-        self.add_field("name", "")
+        self.add_field("displayName", "")
         self.add_field("description", "")
-        self.add_field("professionStats", {})
\ No newline at end of file
+        self.add_field("grantStats", {})
\ No newline at end of file
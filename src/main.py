@@ -7,17 +7,16 @@ import sys
 def main() -> None:
     app = QApplication(sys.argv)
     
-    # Initialize MongoDB handler
+    # Initialize MongoDB handler; the window connects in the background and
+    # browses the local snapshot read-only until (or unless) the server answers
     db_handler = MongoDBHandler(MONGO_URI, MONGO_DB_NAME)
-    if not db_handler.connect():
-        sys.exit("Failed to connect to the database.")
     
     # Create the main application window
     main_window = ApplicationWindow(db_handler)
     main_window.show()
     
     # Set up the application exit behavior
-    app.aboutToQuit.connect(db_handler.close) # type: ignore
+    app.aboutToQuit.connect(db_handler.manager.close_all) # type: ignore
     
     sys.exit(app.exec())
 
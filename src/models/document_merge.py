@@ -0,0 +1,107 @@
+"""
+Field-level three-way merge of concurrently edited documents.
+
+When an edit is refused because another editor saved the document first,
+three copies exist: base (what the edit started from), mine (the edit)
+and theirs (the document as saved by the other editor). Fields and map
+keys changed on one side only take that side's value; those changed on
+both sides differently are conflicts, which default to mine until the
+user picks a side. grantStats and grantAbilities are merged per key, so
+two designers tuning different stats of one document both keep theirs.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+# Kept from theirs: identity, bookkeeping, and hierarchy fields derived from full_tag
+IGNORED_FIELDS = ('_id', 'version', 'updatedAt', 'updatedBy', 'parent_tag', 'depth', 'ancestors')
+# Map fields merged key by key ('grantStats.Strength')
+KEYED_FIELDS = ('grantStats', 'grantAbilities')
+MINE = 'mine'
+THEIRS = 'theirs'
+
+class _Missing:
+    """Value of a field or key a copy does not have."""
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+MISSING: Any = _Missing()
+
+class FieldChange:
+    """One field (or map key) that differs between base and at least one side."""
+    __slots__ = ('path', 'base', 'mine', 'theirs')
+
+    def __init__(self, path: str, base: Any, mine: Any, theirs: Any) -> None:
+        self.path = path
+        self.base = base
+        self.mine = mine
+        self.theirs = theirs
+
+    @property
+    def conflict(self) -> bool:
+        """Both sides changed it, to different values."""
+        return self.mine != self.base and self.theirs != self.base and self.mine != self.theirs
+
+    @property
+    def default(self) -> str:
+        """The side taken unless the user chooses: the one that changed it (mine when both did)."""
+        return THEIRS if self.mine == self.base else MINE
+
+def flatten(document: Dict[str, Any]) -> Dict[str, Any]:
+    """path -> value for every mergeable field; KEYED_FIELDS contribute one path per key.
+
+    A KEYED_FIELDS value that is not a map (None, as models and imports
+    store an unset one) counts as an empty map, so those fields never get a
+    whole-field path.
+    """
+    flat: Dict[str, Any] = {}
+    for key, value in document.items():
+        if key in IGNORED_FIELDS:
+            continue
+        if key in KEYED_FIELDS:
+            for name, item in (value if isinstance(value, dict) else {}).items():
+                flat[f'{key}.{name}'] = item
+        else:
+            flat[key] = value
+    return flat
+
+def unflatten(flat: Dict[str, Any]) -> Dict[str, Any]:
+    document: Dict[str, Any] = {field: {} for field in KEYED_FIELDS if any(path.startswith(field + '.') for path in flat)}
+    for path, value in flat.items():
+        field, dot, name = path.partition('.')
+        if dot and field in KEYED_FIELDS:
+            document.setdefault(field, {})[name] = value
+        else:
+            document[path] = value
+    return document
+
+def changes(base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any]) -> List[FieldChange]:
+    """Every path either side changed relative to base, in path order."""
+    flat_base, flat_mine, flat_theirs = flatten(base), flatten(mine), flatten(theirs)
+    found = []
+    for path in sorted(set(flat_base) | set(flat_mine) | set(flat_theirs)):
+        values = [flat.get(path, MISSING) for flat in (flat_base, flat_mine, flat_theirs)]
+        if values[1] != values[0] or values[2] != values[0]:
+            found.append(FieldChange(path, *values))
+    return found
+
+def merge(base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any],
+          choices: Optional[Dict[str, str]] = None, found: Optional[Iterable[FieldChange]] = None) -> Dict[str, Any]:
+    """theirs with each changed path taken from the side chosen for it (FieldChange.default when not chosen).
+
+    The result keeps theirs' _id and version, so saving it is conditional
+    on the document the other editor saved. Empty grant maps are kept as
+    empty maps rather than dropped.
+    """
+    choices = choices or {}
+    flat = flatten(theirs)
+    for change in (found if found is not None else changes(base, mine, theirs)):
+        value = change.mine if choices.get(change.path, change.default) == MINE else change.theirs
+        if value is MISSING:
+            flat.pop(change.path, None)
+        else:
+            flat[change.path] = value
+    merged = {key: value for key, value in theirs.items() if key in IGNORED_FIELDS}
+    merged.update(unflatten(flat))
+    for field in KEYED_FIELDS:
+        if field in theirs or field in mine:
+            merged.setdefault(field, {})
+    return merged
@@ -0,0 +1,302 @@
+"""
+Effective (inherited) grants for every document of a collection.
+
+A document inherits the grantStats, grantAbilities and grantedTags of every
+document above it: Class.Warrior.Berserker gets Class.Warrior's grants on
+top of its own. Stats add up, an ability's required level is the lowest
+one granting it along the way, and tags are the union.
+
+Stats are held as a node x stat matrix with one row per document, rows in
+full_tag order (so a subtree is the node's row plus one contiguous range)
+and each row's parent being the nearest document above it. The effective
+matrix is computed top-down one depth level at a time, each level being a
+single vectorized add of the parents' rows. An edit recomputes only the
+edited document's subtree; inserts, removals and new stat names rebuild the
+matrix on the next query. Abilities and tags are merged per document when
+first asked for and cached until their subtree changes.
+"""
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel, Field
+
+# The document fields that are inherited
+GRANT_FIELDS = ('grantStats', 'grantAbilities', 'grantedTags')
+
+class Effective(BaseModel):
+    """Grants of one document including everything it inherits."""
+    stats: Dict[str, float] = Field(default_factory=dict)
+    abilities: Dict[str, int] = Field(default_factory=dict)
+    tags: List[str] = Field(default_factory=list)
+
+def _stats_of(doc: Dict[str, Any]) -> Dict[str, float]:
+    stats = {}
+    for key, value in (doc.get('grantStats') or {}).items():
+        try:
+            stats[str(key)] = float(value)
+        except (TypeError, ValueError):
+            continue  # left for the normalize_stat_types migration to report
+    return stats
+
+def _abilities_of(doc: Dict[str, Any]) -> Dict[str, int]:
+    abilities = {}
+    for key, value in (doc.get('grantAbilities') or {}).items():
+        try:
+            abilities[str(key)] = int(value)
+        except (TypeError, ValueError):
+            abilities[str(key)] = 1
+    return abilities
+
+def _tags_of(doc: Dict[str, Any]) -> List[str]:
+    return [tag for tag in doc.get('grantedTags') or [] if isinstance(tag, str)]
+
+def merge_abilities(inherited: Dict[str, int], own: Dict[str, int]) -> Dict[str, int]:
+    """Abilities granted at either level; one granted at both needs the lower level."""
+    merged = dict(inherited)
+    for ability, level in own.items():
+        merged[ability] = min(level, merged.get(ability, level))
+    return merged
+
+def merge_tags(inherited: List[str], own: List[str]) -> List[str]:
+    """Union of the tags, inherited ones first, each once."""
+    seen = set(inherited)
+    return list(inherited) + [tag for tag in own if not (tag in seen or seen.add(tag))]
+
+class EffectiveStats:
+    """Own and effective grants of one collection's documents, kept up to date as documents change.
+
+    Documents only need full_tag and the GRANT_FIELDS; update() merges the
+    fields a document carries, so partial documents (e.g. after a move)
+    keep their other grants.
+    """
+    def __init__(self, collection: str, documents: Iterable[Dict[str, Any]] = ()) -> None:
+        self.collection = collection
+        # full_tag -> own grants, and its grantStats as numbers (parsed once, not per rebuild)
+        self._own: Dict[str, Dict[str, Any]] = {}
+        self._own_stats: Dict[str, Dict[str, float]] = {}
+        self._tags: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._parents = np.empty(0, dtype=np.int64)  # row of the nearest document above, -1 for none
+        self._levels = np.empty(0, dtype=np.int64)  # documents above each row
+        self.columns: List[str] = []
+        self._column_index: Dict[str, int] = {}
+        self._own_matrix = np.zeros((0, 0))
+        self._matrix = np.zeros((0, 0))
+        # Which stats a document (or anything above it) grants at all, so an explicit 0 is kept
+        self._own_mask = np.zeros((0, 0), dtype=bool)
+        self._mask = np.zeros((0, 0), dtype=bool)
+        self._stale = True
+        self._ability_cache: Dict[str, Dict[str, int]] = {}
+        self._tag_cache: Dict[str, List[str]] = {}
+        self.add_many(documents)
+
+    def __len__(self) -> int:
+        return len(self._own)
+
+    def __contains__(self, full_tag: str) -> bool:
+        return full_tag in self._own
+
+    # --- Changes ---
+    def add_many(self, documents: Iterable[Dict[str, Any]]) -> None:
+        for doc in documents:
+            full_tag = doc.get('full_tag')
+            if full_tag:
+                self._set_own(full_tag, {field: doc.get(field) for field in GRANT_FIELDS})
+        self._invalidate_all()
+
+    def update(self, doc: Dict[str, Any], old_tag: Optional[str] = None) -> None:
+        """Add or change a document; old_tag is its previous full_tag if it was retagged."""
+        full_tag = doc.get('full_tag')
+        if not full_tag:
+            return
+        fields = {field: doc[field] for field in GRANT_FIELDS if field in doc}
+        if old_tag and old_tag != full_tag:
+            # Moved: the grants go with it, and both places change shape
+            self._own_stats.pop(old_tag, None)
+            self._set_own(full_tag, {**self._own.pop(old_tag, {}), **fields})
+            self._invalidate_all()
+            return
+        entry = self._own.get(full_tag)
+        if entry is None:
+            self._set_own(full_tag, {field: doc.get(field) for field in GRANT_FIELDS})
+            self._invalidate_all()
+            return
+        if all(entry.get(field) == value for field, value in fields.items()):
+            return
+        entry.update(fields)
+        self._set_own(full_tag, entry)
+        self._invalidate_subtree(full_tag)
+        if self._stale:
+            return
+        stats = self._own_stats[full_tag]
+        if any(stat not in self._column_index for stat in stats):
+            self._stale = True
+            return
+        row = self._rows[full_tag]
+        self._own_matrix[row] = 0.0
+        self._own_mask[row] = False
+        for stat, value in stats.items():
+            self._own_matrix[row, self._column_index[stat]] = value
+            self._own_mask[row, self._column_index[stat]] = True
+        self._propagate(self._subtree_rows(full_tag))
+
+    def remove_subtree(self, full_tag: str) -> None:
+        """Forget a document and everything below it."""
+        for tag in self._subtree_tags(full_tag, self._own):
+            del self._own[tag]
+            del self._own_stats[tag]
+        self._invalidate_all()
+
+    def _set_own(self, full_tag: str, entry: Dict[str, Any]) -> None:
+        self._own[full_tag] = entry
+        self._own_stats[full_tag] = _stats_of(entry)
+
+    def _invalidate_all(self) -> None:
+        self._stale = True
+        self._ability_cache.clear()
+        self._tag_cache.clear()
+
+    def _invalidate_subtree(self, full_tag: str) -> None:
+        for cache in (self._ability_cache, self._tag_cache):
+            for tag in self._subtree_tags(full_tag, cache):
+                del cache[tag]
+
+    def _subtree_tags(self, full_tag: str, tags: Iterable[str]) -> List[str]:
+        prefix = full_tag + '.'
+        return [tag for tag in tags if tag == full_tag or tag.startswith(prefix)]
+
+    # --- Matrix ---
+    def _rebuild(self) -> None:
+        tags = sorted(self._own)
+        rows = {tag: row for row, tag in enumerate(tags)}
+        parent_list = [-1] * len(tags)
+        level_list = [0] * len(tags)
+        for row, tag in enumerate(tags):
+            parent = self._parent_tag(tag)
+            if parent is not None:
+                # Sorted by full_tag, so the parent's row (and level) came first
+                parent_list[row] = rows[parent]
+                level_list[row] = level_list[rows[parent]] + 1
+        parents = np.array(parent_list, dtype=np.int64)
+        levels = np.array(level_list, dtype=np.int64)
+        columns = sorted({stat for stats in self._own_stats.values() for stat in stats})
+        column_index = {stat: i for i, stat in enumerate(columns)}
+        own = np.zeros((len(tags), len(columns)))
+        cell_rows: List[int] = []
+        cell_columns: List[int] = []
+        values: List[float] = []
+        for tag, stats in self._own_stats.items():
+            row = rows[tag]
+            for stat, value in stats.items():
+                cell_rows.append(row)
+                cell_columns.append(column_index[stat])
+                values.append(value)
+        own[cell_rows, cell_columns] = values
+        own_mask = np.zeros(own.shape, dtype=bool)
+        own_mask[cell_rows, cell_columns] = True
+        self._tags, self._rows, self._parents, self._levels = tags, rows, parents, levels
+        self.columns, self._column_index = columns, column_index
+        self._own_matrix, self._own_mask = own, own_mask
+        self._matrix = np.empty_like(own)
+        self._mask = np.empty_like(own_mask)
+        self._stale = False
+        self._propagate(np.arange(len(tags)))
+
+    def _propagate(self, rows: np.ndarray) -> None:
+        """Recompute the effective rows given, which must include every row below each of them."""
+        if not len(rows):
+            return
+        rows = rows[np.argsort(self._levels[rows], kind='stable')]
+        levels = self._levels[rows]
+        bounds = np.flatnonzero(np.diff(levels)) + 1
+        for group in np.split(rows, bounds):
+            parents = self._parents[group]
+            self._matrix[group] = self._own_matrix[group]
+            self._mask[group] = self._own_mask[group]
+            inherits = parents >= 0
+            if inherits.any():
+                # Parents sit on a lower level, so their effective rows are final
+                self._matrix[group[inherits]] += self._matrix[parents[inherits]]
+                self._mask[group[inherits]] |= self._mask[parents[inherits]]
+
+    def _subtree_rows(self, full_tag: str) -> np.ndarray:
+        """Rows of full_tag and everything below it: its own row plus the contiguous 'full_tag.' range."""
+        start = bisect.bisect_left(self._tags, full_tag + '.')
+        end = bisect.bisect_left(self._tags, full_tag + '/', lo=start)  # '/' sorts right after '.'
+        rows = np.arange(start, end, dtype=np.int64)
+        row = self._rows.get(full_tag)
+        return rows if row is None else np.concatenate(([row], rows))
+
+    def _parent_tag(self, full_tag: str) -> Optional[str]:
+        """The nearest document above full_tag (paths without a document are skipped)."""
+        tag = full_tag
+        while '.' in tag:
+            tag = tag.rpartition('.')[0]
+            if tag in self._own:
+                return tag
+        return None
+
+    def matrix(self, effective: bool = True) -> Tuple[List[str], List[str], np.ndarray]:
+        """(full_tags, stat names, node x stat matrix) for every document; effective or own values.
+
+        The arrays are the engine's own; copy them before changing anything.
+        """
+        if self._stale:
+            self._rebuild()
+        return self._tags, self.columns, self._matrix if effective else self._own_matrix
+
+    def granted(self, effective: bool = True) -> np.ndarray:
+        """Boolean mask over matrix(): whether the document (effective: or anything above it) grants the stat at all."""
+        if self._stale:
+            self._rebuild()
+        return self._mask if effective else self._own_mask
+
+    def levels(self) -> np.ndarray:
+        """Per row of matrix(), the number of documents above it."""
+        if self._stale:
+            self._rebuild()
+        return self._levels
+
+    # --- Queries ---
+    def effective(self, full_tag: str) -> Effective:
+        """Grants of the document at full_tag including inherited ones (for a path without a document, what it would inherit)."""
+        if full_tag not in self._own:
+            return self.inherited(full_tag)
+        return Effective(stats=self._effective_stats(full_tag), abilities=self._effective_abilities(full_tag), tags=self._effective_tags(full_tag))
+
+    def inherited(self, full_tag: str) -> Effective:
+        """What a document at full_tag inherits: the effective grants of the nearest document above it."""
+        parent = self._parent_tag(full_tag)
+        return self.effective(parent) if parent is not None else Effective()
+
+    def _effective_stats(self, full_tag: str) -> Dict[str, float]:
+        if self._stale:
+            self._rebuild()
+        row = self._rows[full_tag]
+        values = self._matrix[row]
+        return {self.columns[i]: float(values[i]) for i in np.flatnonzero(self._mask[row])}
+
+    def _chain(self, full_tag: str, cache: Dict[str, Any]) -> List[str]:
+        # full_tag and the documents above it, up to (not including) the first one already cached
+        chain = [full_tag]
+        parent = self._parent_tag(full_tag)
+        while parent is not None and parent not in cache:
+            chain.append(parent)
+            parent = self._parent_tag(parent)
+        return chain
+
+    def _effective_abilities(self, full_tag: str) -> Dict[str, int]:
+        cache = self._ability_cache
+        if full_tag not in cache:
+            for tag in reversed(self._chain(full_tag, cache)):
+                parent = self._parent_tag(tag)
+                cache[tag] = merge_abilities(cache[parent] if parent is not None else {}, _abilities_of(self._own[tag]))
+        return dict(cache[full_tag])
+
+    def _effective_tags(self, full_tag: str) -> List[str]:
+        cache = self._tag_cache
+        if full_tag not in cache:
+            for tag in reversed(self._chain(full_tag, cache)):
+                parent = self._parent_tag(tag)
+                cache[tag] = merge_tags(cache[parent] if parent is not None else [], _tags_of(self._own[tag]))
+        return list(cache[full_tag])
@@ -0,0 +1,319 @@
+"""
+In-memory hierarchy model for a loaded collection.
+
+Documents are indexed by `_id` and by `full_tag`, and every dotted tag path is a
+node in a trie over tag segments. Path nodes without a document of their own
+(e.g. the collection name itself, or a gap such as `Class.Warrior` when only
+`Class.Warrior.Berserker` exists) are kept as "virtual" nodes. Document
+children are resolved through them, so a document always hangs under its
+nearest document ancestor regardless of the order documents were loaded in.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+class TagNode:
+    """One segment of the tag trie."""
+    __slots__ = ('segment', 'path', 'parent', 'children', 'doc')
+
+    def __init__(self, segment: str, path: str, parent: Optional['TagNode']) -> None:
+        self.segment = segment
+        self.path = path
+        self.parent = parent
+        self.children: Dict[str, 'TagNode'] = {}
+        self.doc: Optional[Dict[str, Any]] = None
+
+class HierarchyModel:
+    """Hash indexes plus a tag trie over the documents of one collection.
+
+    get/get_by_id/contains are O(1); adding, removing and ancestors are O(k) in
+    the number of tag segments; children and subtree are proportional to their
+    result size.
+    """
+    def __init__(self, collection: str, documents: Iterable[Dict[str, Any]] = ()) -> None:
+        self.collection = collection
+        self.root = TagNode('', '', None)
+        self._nodes: Dict[str, TagNode] = {}  # path -> trie node (documents and virtual nodes)
+        self._by_id: Dict[Any, Dict[str, Any]] = {}
+        self._count = 0
+        self.add_many(documents)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, full_tag: str) -> bool:
+        node = self._nodes.get(full_tag)
+        return node is not None and node.doc is not None
+
+    # --- Mutation ---
+    def _ensure_path(self, full_tag: str) -> TagNode:
+        node = self._nodes.get(full_tag)
+        if node is not None:
+            return node
+        parent_path, _, segment = full_tag.rpartition('.')
+        parent = self._ensure_path(parent_path) if parent_path else self.root
+        node = TagNode(segment, full_tag, parent)
+        parent.children[segment] = node
+        self._nodes[full_tag] = node
+        return node
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        """Insert or replace a document (keyed by its full_tag)."""
+        full_tag = doc.get('full_tag', '')
+        if not full_tag:
+            return
+        node = self._ensure_path(full_tag)
+        if node.doc is None:
+            self._count += 1
+        elif node.doc.get('_id') in self._by_id:
+            del self._by_id[node.doc.get('_id')]
+        node.doc = doc
+        if '_id' in doc:
+            self._by_id[doc['_id']] = doc
+
+    def add_many(self, documents: Iterable[Dict[str, Any]]) -> None:
+        for doc in documents:
+            self.add(doc)
+
+    def remove(self, full_tag: str) -> Optional[Dict[str, Any]]:
+        """Remove one document; its descendants stay (re-attached to the nearest ancestor)."""
+        node = self._nodes.get(full_tag)
+        if node is None or node.doc is None:
+            return None
+        doc = node.doc
+        node.doc = None
+        self._count -= 1
+        self._by_id.pop(doc.get('_id'), None)
+        self._prune(node)
+        return doc
+
+    def remove_subtree(self, full_tag: str) -> List[Dict[str, Any]]:
+        """Remove a document and every document below it; returns the removed documents."""
+        node = self._nodes.get(full_tag)
+        if node is None:
+            return []
+        removed = [n.doc for n in self._walk(node) if n.doc is not None]
+        for n in self._walk(node):
+            del self._nodes[n.path]
+        for doc in removed:
+            self._by_id.pop(doc.get('_id'), None)
+        self._count -= len(removed)
+        parent = node.parent
+        if parent is not None:
+            del parent.children[node.segment]
+            self._prune(parent)
+        return removed
+
+    def _prune(self, node: TagNode) -> None:
+        # Drop virtual nodes that no longer lead to any document
+        while node is not self.root and node.doc is None and not node.children:
+            parent = node.parent
+            del self._nodes[node.path]
+            if parent is not None:
+                del parent.children[node.segment]
+                node = parent
+            else:
+                break
+
+    # --- Queries ---
+    def get(self, full_tag: str) -> Optional[Dict[str, Any]]:
+        node = self._nodes.get(full_tag)
+        return node.doc if node is not None else None
+
+    def get_by_id(self, document_id: Any) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(document_id)
+
+    def node(self, path: str) -> Optional[TagNode]:
+        """Return the trie node for a tag path (document or virtual)."""
+        return self._nodes.get(path) if path else self.root
+
+    def documents(self) -> Iterator[Dict[str, Any]]:
+        """All documents in trie pre-order (parents before children)."""
+        for node in self._walk(self.root):
+            if node.doc is not None:
+                yield node.doc
+
+    def _walk(self, start: TagNode) -> Iterator[TagNode]:
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(list(node.children.values())))
+
+    def _document_children(self, node: TagNode) -> List[str]:
+        # Nearest document descendants, looking through virtual nodes
+        result: List[str] = []
+        stack = list(reversed(list(node.children.values())))
+        while stack:
+            child = stack.pop()
+            if child.doc is not None:
+                result.append(child.path)
+            else:
+                stack.extend(reversed(list(child.children.values())))
+        return result
+
+    def children(self, full_tag: str) -> List[str]:
+        """Full tags of the documents directly below full_tag."""
+        node = self._nodes.get(full_tag)
+        return self._document_children(node) if node is not None else []
+
+    def roots(self) -> List[str]:
+        """Full tags of documents with no document ancestor."""
+        return self._document_children(self.root)
+
+    def subtree(self, full_tag: str) -> List[Dict[str, Any]]:
+        """The document at full_tag (if any) and all documents below it, parents first."""
+        node = self._nodes.get(full_tag)
+        if node is None:
+            return []
+        return [n.doc for n in self._walk(node) if n.doc is not None]
+
+    def ancestors(self, full_tag: str) -> List[str]:
+        """Full tags of the document ancestors of full_tag, root first."""
+        node = self._nodes.get(full_tag)
+        result: List[str] = []
+        parent = node.parent if node is not None else None
+        while parent is not None and parent is not self.root:
+            if parent.doc is not None:
+                result.append(parent.path)
+            parent = parent.parent
+        result.reverse()
+        return result
+
+    def parent(self, full_tag: str) -> Optional[str]:
+        """Full tag of the nearest document ancestor, or None for a root.
+
+        full_tag itself need not be in the model, so this also answers where a
+        document was (or would be) attached.
+        """
+        path = full_tag
+        while path:
+            path = path.rpartition('.')[0]
+            if path in self:
+                return path
+        return None
+
+    def children_map(self) -> Dict[str, List[str]]:
+        """Document parent -> document children for every document with children, in one pass."""
+        children_map: Dict[str, List[str]] = {}
+        # (node, nearest document ancestor path)
+        stack: List[tuple[TagNode, Optional[str]]] = [(child, None) for child in reversed(list(self.root.children.values()))]
+        while stack:
+            node, owner = stack.pop()
+            if node.doc is not None:
+                if owner is not None:
+                    children_map.setdefault(owner, []).append(node.path)
+                owner = node.path
+            stack.extend((child, owner) for child in reversed(list(node.children.values())))
+        return children_map
+
+# Documents (and nav tree paths) this many levels below the top start expanded; None expands everything
+DEFAULT_EXPAND_DEPTH: Optional[int] = 2
+
+class ExpansionState:
+    """Which nodes of a tree show their children.
+
+    Nodes shallower than depth are expanded by default; expanded/collapsed
+    hold the nodes the user toggled away from that default, so the state
+    survives reloads of the collection.
+    """
+    def __init__(self, depth: Optional[int] = DEFAULT_EXPAND_DEPTH, expanded: Iterable[str] = (), collapsed: Iterable[str] = ()) -> None:
+        self.depth = depth
+        self.expanded = set(expanded)
+        self.collapsed = set(collapsed)
+        self.version = 0  # bumped on every change, so a layout can tell whether it is stale
+
+    def default(self, depth: int) -> bool:
+        return self.depth is None or depth < self.depth
+
+    def is_expanded(self, path: str, depth: int) -> bool:
+        if path in self.expanded:
+            return True
+        if path in self.collapsed:
+            return False
+        return self.default(depth)
+
+    def set_expanded(self, path: str, depth: int, expanded: bool) -> None:
+        if expanded == self.is_expanded(path, depth):
+            return
+        self.version += 1
+        if expanded == self.default(depth):
+            self.expanded.discard(path)
+            self.collapsed.discard(path)
+        elif expanded:
+            self.expanded.add(path)
+        else:
+            self.collapsed.add(path)
+
+    def reset(self, depth: Optional[int]) -> None:
+        """Change the default depth and drop every per-node override."""
+        self.depth = depth
+        self.expanded.clear()
+        self.collapsed.clear()
+        self.version += 1
+
+    def copy(self) -> 'ExpansionState':
+        state = ExpansionState(self.depth, self.expanded, self.collapsed)
+        state.version = self.version
+        return state
+
+class VisibleHierarchy:
+    """The documents of a HierarchyModel that are shown under an ExpansionState.
+
+    Answers the queries the layout engine makes (roots, children, parent,
+    children_map) for the visible part of the tree only, so laying out a
+    mostly collapsed 40k-document collection costs what is on screen.
+    Depth is counted in document ancestors (roots are depth 0).
+    """
+    def __init__(self, hierarchy: HierarchyModel, state: ExpansionState) -> None:
+        self.hierarchy = hierarchy
+        self.state = state
+
+    def __len__(self) -> int:
+        return len(self.hierarchy)
+
+    def __contains__(self, full_tag: str) -> bool:
+        return full_tag in self.hierarchy
+
+    def get(self, full_tag: str) -> Optional[Dict[str, Any]]:
+        return self.hierarchy.get(full_tag)
+
+    def depth(self, full_tag: str) -> int:
+        return len(self.hierarchy.ancestors(full_tag))
+
+    def is_expanded(self, full_tag: str) -> bool:
+        return self.state.is_expanded(full_tag, self.depth(full_tag))
+
+    def set_expanded(self, full_tag: str, expanded: bool) -> None:
+        self.state.set_expanded(full_tag, self.depth(full_tag), expanded)
+
+    def roots(self) -> List[str]:
+        return self.hierarchy.roots()
+
+    def parent(self, full_tag: str) -> Optional[str]:
+        return self.hierarchy.parent(full_tag)
+
+    def children(self, full_tag: str) -> List[str]:
+        """Document children of full_tag if it is expanded, otherwise none."""
+        return self.hierarchy.children(full_tag) if self.is_expanded(full_tag) else []
+
+    def child_count(self, full_tag: str) -> int:
+        """Number of document children, shown or not."""
+        return len(self.hierarchy.children(full_tag))
+
+    def is_visible(self, full_tag: str) -> bool:
+        """True when every document ancestor of full_tag is expanded."""
+        ancestors = self.hierarchy.ancestors(full_tag)
+        return all(self.state.is_expanded(tag, depth) for depth, tag in enumerate(ancestors))
+
+    def children_map(self) -> Dict[str, List[str]]:
+        """Parent -> children for the expanded documents, walking only the visible part of the tree."""
+        children_map: Dict[str, List[str]] = {}
+        stack = [(root, 0) for root in self.hierarchy.roots()]
+        while stack:
+            tag, depth = stack.pop()
+            if not self.state.is_expanded(tag, depth):
+                continue
+            children = self.hierarchy.children(tag)
+            if children:
+                children_map[tag] = children
+                stack.extend((child, depth + 1) for child in children)
+        return children_map
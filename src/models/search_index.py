@@ -0,0 +1,244 @@
+"""
+In-memory inverted search index over all three collections.
+
+Every document is broken into lowercase tokens from its display name, full
+tag, description, granted tags and the keys of its grantStats and
+grantAbilities maps (CamelCase and dotted names are split, so "FireBolt"
+is found by "fire" and "bolt" as well as "firebolt"). Postings map each
+token to the documents containing it with a field weight; a sorted
+vocabulary answers prefix lookups by bisection. Documents are added,
+replaced and removed one at a time, so writes keep the index current
+without a rebuild.
+"""
+import bisect
+import heapq
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from pydantic import BaseModel
+
+# Field -> weight of a token found there; a term scores its best field per document
+FIELD_WEIGHTS = {
+    'displayName': 3.0,
+    'full_tag': 2.0,
+    'grantStats': 2.0,
+    'grantAbilities': 2.0,
+    'grantedTags': 1.5,
+    'description': 1.0,
+}
+# Map fields whose keys (not values) are searchable
+KEY_FIELDS = ('grantStats', 'grantAbilities')
+# A term matching a token only by prefix scores this fraction of an exact match
+PREFIX_FACTOR = 0.5
+DEFAULT_LIMIT = 50
+# Shorter terms match whole words only (a one-letter prefix matches nearly everything)
+MIN_PREFIX = 2
+
+_WORD = re.compile(r'[A-Za-z0-9]+')
+_CAMEL_PART = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+@lru_cache(maxsize=65536)
+def _word_tokens(word: str) -> Tuple[str, ...]:
+    parts = _CAMEL_PART.findall(word)
+    if len(parts) > 1:
+        return (word.lower(), *(part.lower() for part in parts))
+    return (word.lower(),)
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercase word tokens of a text; CamelCase words also yield their parts."""
+    tokens: List[str] = []
+    for word in _WORD.findall(str(text or '')):
+        # Names and descriptions reuse a small vocabulary, so splitting is cached per word
+        tokens.extend(_word_tokens(word))
+    return tokens
+
+def field_texts(doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    """The searchable strings of a document per field (map fields contribute their keys)."""
+    texts: Dict[str, List[str]] = {}
+    for field in FIELD_WEIGHTS:
+        if field not in doc:
+            continue
+        value = doc[field]
+        if field in KEY_FIELDS:
+            # The map itself, or just its keys as projected for the index
+            texts[field] = [str(key) for key in value] if isinstance(value, (dict, list, tuple)) else []
+        elif isinstance(value, (list, tuple)):
+            texts[field] = [str(item) for item in value]
+        else:
+            texts[field] = [str(value or '')]
+    return texts
+
+class SearchHit(BaseModel):
+    collection: str
+    full_tag: str
+    display_name: str = ''
+    score: float
+    fields: List[str] = []  # fields the query terms were found in, best first
+
+class _Entry:
+    """What the index remembers about one document."""
+    __slots__ = ('collection', 'full_tag', 'display_name', 'texts', 'tokens')
+
+    def __init__(self, collection: str) -> None:
+        self.collection = collection
+        self.full_tag = ''
+        self.display_name = ''
+        self.texts: Dict[str, List[str]] = {}
+        self.tokens: Dict[str, Tuple[float, str]] = {}  # token -> (best weight, field it came from)
+
+class SearchIndex:
+    """Token and prefix inverted index over documents keyed by (collection, _id).
+
+    Each document gets a small integer slot and postings are keyed by slot,
+    which keeps the per-posting work of a broad query to int hashing.
+    add() merges: fields missing from a document (e.g. a display-only
+    projection) keep what was indexed for them before, so skeleton updates
+    do not drop the stat and ability keys of a full load.
+    """
+    def __init__(self) -> None:
+        self._slots: Dict[Tuple[str, Any], int] = {}
+        self._entries: Dict[int, _Entry] = {}
+        self._order: Dict[int, Tuple[int, str]] = {}  # tie order: shorter full tag, then alphabetical
+        self._postings: Dict[str, Dict[int, float]] = {}
+        # Sorted tokens for prefix lookups; None while stale (bulk adds sort once on the next search)
+        self._vocabulary: Optional[List[str]] = []
+        self._next_slot = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, collection: str, doc: Dict[str, Any]) -> None:
+        """Index a document, or re-index it if its _id is already known."""
+        if '_id' not in doc:
+            return
+        slot = self._slots.get((collection, doc['_id']))
+        if slot is None:
+            slot = self._slots[(collection, doc['_id'])] = self._next_slot
+            self._next_slot += 1
+            self._entries[slot] = _Entry(collection)
+        entry = self._entries[slot]
+        entry.texts.update(field_texts(doc))
+        entry.full_tag = doc.get('full_tag', entry.full_tag)
+        entry.display_name = doc.get('displayName', entry.display_name) or ''
+        self._order[slot] = (len(entry.full_tag), entry.full_tag)
+        tokens: Dict[str, Tuple[float, str]] = {}
+        for field, texts in entry.texts.items():
+            weight = FIELD_WEIGHTS[field]
+            for text in texts:
+                for token in tokenize(text):
+                    if token not in tokens or tokens[token][0] < weight:
+                        tokens[token] = (weight, field)
+        self._unlink(slot, entry.tokens.keys() - tokens.keys())
+        for token, (weight, _) in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if self._vocabulary is not None:
+                    bisect.insort(self._vocabulary, token)
+            postings[slot] = weight
+        entry.tokens = tokens
+
+    def add_many(self, collection: str, docs: Iterable[Dict[str, Any]]) -> None:
+        # Inserting new tokens one by one into the sorted vocabulary is quadratic; sort once later instead
+        self._vocabulary = None
+        for doc in docs:
+            self.add(collection, doc)
+
+    def remove(self, collection: str, document_id: Any) -> None:
+        slot = self._slots.pop((collection, document_id), None)
+        if slot is not None:
+            entry = self._entries.pop(slot)
+            del self._order[slot]
+            self._unlink(slot, entry.tokens.keys())
+
+    def remove_collection(self, collection: str) -> None:
+        for key in [key for key in self._slots if key[0] == collection]:
+            self.remove(*key)
+
+    def _unlink(self, slot: int, tokens: Iterable[str]) -> None:
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(slot, None)
+            if not postings:
+                del self._postings[token]
+                if self._vocabulary is not None:
+                    i = bisect.bisect_left(self._vocabulary, token)
+                    if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                        del self._vocabulary[i]
+
+    def _expand(self, term: str) -> List[str]:
+        """Indexed tokens starting with term (term itself first when indexed)."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + '\uffff', start)
+        return self._vocabulary[start:end]
+
+    def _top(self, scores: Dict[int, float], limit: int) -> List[int]:
+        """The limit best slots: highest score, then tie order. Broad queries score
+        most documents the same, so only the last score group needed is ranked."""
+        groups: Dict[float, List[int]] = {}
+        for slot, score in scores.items():
+            groups.setdefault(score, []).append(slot)
+        top: List[int] = []
+        order = self._order.__getitem__
+        for score in sorted(groups, reverse=True):
+            top.extend(heapq.nsmallest(limit - len(top), groups[score], key=order))
+            if len(top) >= limit:
+                break
+        return top
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, collections: Optional[Set[str]] = None) -> List[SearchHit]:
+        """Documents containing every query term (each as a word or a word prefix), best first.
+
+        A document scores, per term, the weight of the best field the term
+        occurs in, halved for prefix-only matches. Ties go to the shorter
+        full tag (higher in the tree), then alphabetical. Terms shorter than
+        MIN_PREFIX only match whole words.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        expansions = []
+        for term in terms:
+            tokens = self._expand(term) if len(term) >= MIN_PREFIX else ([term] if term in self._postings else [])
+            if not tokens:
+                return []
+            expansions.append((term, tokens))
+        # Rarest terms first keeps the candidate set small
+        expansions.sort(key=lambda item: sum(len(self._postings[token]) for token in item[1]))
+        scores: Optional[Dict[int, float]] = None
+        for term, tokens in expansions:
+            term_scores: Dict[int, float] = {}
+            for token in tokens:
+                factor = 1.0 if token == term else PREFIX_FACTOR
+                postings = self._postings[token]
+                if not term_scores and scores is None:
+                    term_scores = {slot: weight * factor for slot, weight in postings.items()}
+                    continue
+                if scores is not None and len(scores) < len(postings):
+                    pairs: Iterable[Tuple[int, float]] = ((slot, postings[slot]) for slot in scores if slot in postings)
+                else:
+                    pairs = postings.items()
+                for slot, weight in pairs:
+                    score = weight * factor
+                    if score > term_scores.get(slot, 0.0):
+                        term_scores[slot] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {slot: scores[slot] + score for slot, score in term_scores.items() if slot in scores}
+            if not scores:
+                return []
+        assert scores is not None
+        if collections is not None:
+            scores = {slot: score for slot, score in scores.items() if self._entries[slot].collection in collections}
+        hits = []
+        for slot in self._top(scores, limit):
+            entry, score = self._entries[slot], scores[slot]
+            fields = sorted({field for token, (_, field) in entry.tokens.items() if any(token.startswith(term) for term in terms)},
+                            key=lambda field: -FIELD_WEIGHTS[field])
+            hits.append(SearchHit(collection=entry.collection, full_tag=entry.full_tag, display_name=entry.display_name, score=score, fields=fields))
+        return hits
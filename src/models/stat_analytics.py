@@ -0,0 +1,219 @@
+"""
+Balance analytics over the grantStats of one or more collections.
+
+StatTable is a columnar view of the node x stat matrices kept by each
+collection's EffectiveStats engine (own or effective values). Every
+collection is a block holding its arrays and, per stat, the count, mean,
+sum of squared deviations, min and max of the documents granting it; the
+whole table's figures are combined from the blocks, so a change to one
+collection recomputes that block only. Histograms, per-depth means and
+z-scores are derived from the combined mean and deviation on request, a
+vectorized pass over one stat's column per block.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from models.effective_stats import EffectiveStats
+
+HISTOGRAM_BINS = 20
+DEFAULT_OUTLIER_Z = 3.0
+# Outliers are ranked by |z|; only this many are returned
+OUTLIER_LIMIT = 500
+# z-score bounds between heat map colours: well below, below, slightly below, near, slightly above, above, well above the mean
+HEAT_BOUNDS = np.array([-2.0, -1.0, -0.5, 0.5, 1.0, 2.0])
+
+class StatSummary(BaseModel):
+    stat: str
+    count: int  # documents granting the stat
+    mean: float
+    std: float
+    min: float
+    max: float
+
+class DepthMean(BaseModel):
+    depth: int  # documents above the node
+    count: int
+    mean: float
+
+class Outlier(BaseModel):
+    collection: str
+    full_tag: str
+    stat: str
+    value: float
+    z: float
+
+def heat_buckets(z: np.ndarray) -> np.ndarray:
+    """Heat map colour index (0 to len(HEAT_BOUNDS)) for each z-score."""
+    return np.digitize(z, HEAT_BOUNDS)
+
+class _Block:
+    """One collection's arrays and per-stat moments."""
+    __slots__ = ('collection', 'tags', 'columns', 'column_index', 'values', 'mask', 'levels', 'count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, engine: EffectiveStats, effective: bool) -> None:
+        self.collection = engine.collection
+        self.tags, columns, self.values = engine.matrix(effective)
+        self.columns = list(columns)
+        self.column_index = {stat: i for i, stat in enumerate(self.columns)}
+        self.mask = engine.granted(effective)
+        self.levels = engine.levels()
+        values = np.where(self.mask, self.values, 0.0)
+        self.count = self.mask.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(self.count > 0, values.sum(axis=0) / np.maximum(self.count, 1), 0.0)
+        deviation = np.where(self.mask, self.values - self.mean, 0.0)
+        self.m2 = (deviation * deviation).sum(axis=0)
+        if len(self.tags):
+            self.min = np.where(self.mask, self.values, np.inf).min(axis=0)
+            self.max = np.where(self.mask, self.values, -np.inf).max(axis=0)
+        else:
+            self.min = np.full(len(self.columns), np.inf)
+            self.max = np.full(len(self.columns), -np.inf)
+
+    def column(self, stat: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(values, granted mask) of one stat; empty mask if the collection never grants it."""
+        i = self.column_index.get(stat)
+        if i is None:
+            return np.zeros(len(self.tags)), np.zeros(len(self.tags), dtype=bool)
+        return self.values[:, i], self.mask[:, i]
+
+class StatTable:
+    """Stat distributions across the collections added to it.
+
+    set_engine() adds or refreshes a collection (call it again after the
+    engine changed); only that collection's block is recomputed. Figures
+    count the documents that grant a stat: with effective values, that
+    includes documents inheriting it.
+    """
+    def __init__(self, effective: bool = True) -> None:
+        self.effective = effective
+        self._blocks: Dict[str, _Block] = {}
+        self._combined: Optional[Dict[str, StatSummary]] = None
+
+    def __len__(self) -> int:
+        return sum(len(block.tags) for block in self._blocks.values())
+
+    @property
+    def collections(self) -> List[str]:
+        return list(self._blocks)
+
+    def set_engine(self, engine: EffectiveStats) -> None:
+        self._blocks[engine.collection] = _Block(engine, self.effective)
+        self._combined = None
+
+    def remove_collection(self, collection: str) -> None:
+        if self._blocks.pop(collection, None) is not None:
+            self._combined = None
+
+    @property
+    def columns(self) -> List[str]:
+        return sorted({stat for block in self._blocks.values() for stat in block.columns})
+
+    # --- Whole-table figures ---
+    def summary(self) -> List[StatSummary]:
+        """Count, mean, standard deviation, min and max of every stat, by stat name."""
+        return list(self._summaries().values())
+
+    def stat_summary(self, stat: str) -> Optional[StatSummary]:
+        return self._summaries().get(stat)
+
+    def _summaries(self) -> Dict[str, StatSummary]:
+        if self._combined is not None:
+            return self._combined
+        columns = self.columns
+        index = {stat: i for i, stat in enumerate(columns)}
+        count = np.zeros(len(columns))
+        mean = np.zeros(len(columns))
+        m2 = np.zeros(len(columns))
+        low = np.full(len(columns), np.inf)
+        high = np.full(len(columns), -np.inf)
+        for block in self._blocks.values():
+            at = np.array([index[stat] for stat in block.columns], dtype=np.int64)
+            if not len(at):
+                continue
+            # Chan et al.'s pairwise update: merge the block's moments into the running ones
+            n_a, n_b = count[at], block.count.astype(float)
+            total = n_a + n_b
+            delta = block.mean - mean[at]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                share = np.where(total > 0, n_b / np.maximum(total, 1), 0.0)
+            mean[at] += delta * share
+            m2[at] += block.m2 + delta * delta * n_a * share
+            count[at] = total
+            low[at] = np.minimum(low[at], block.min)
+            high[at] = np.maximum(high[at], block.max)
+        std = np.sqrt(np.where(count > 0, m2 / np.maximum(count, 1), 0.0))
+        self._combined = {
+            stat: StatSummary(stat=stat, count=int(count[i]), mean=float(mean[i]), std=float(std[i]),
+                              min=float(low[i]) if count[i] else 0.0, max=float(high[i]) if count[i] else 0.0)
+            for i, stat in enumerate(columns)
+        }
+        return self._combined
+
+    # --- One stat ---
+    def values(self, stat: str) -> np.ndarray:
+        """Every granted value of a stat across the table."""
+        parts = [values[mask] for values, mask in (block.column(stat) for block in self._blocks.values())]
+        return np.concatenate(parts) if parts else np.zeros(0)
+
+    def histogram(self, stat: str, bins: int = HISTOGRAM_BINS) -> Tuple[np.ndarray, np.ndarray]:
+        """(counts, bin edges) of a stat's values."""
+        values = self.values(stat)
+        if not len(values):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.histogram(values, bins=bins)
+
+    def depth_means(self, stat: str) -> List[DepthMean]:
+        """Mean of a stat per hierarchy depth (0 for documents with no document above them)."""
+        values = self.values(stat)
+        if not len(values):
+            return []
+        levels = np.concatenate([block.levels[block.column(stat)[1]] for block in self._blocks.values()])
+        counts = np.bincount(levels)
+        sums = np.bincount(levels, weights=values)
+        return [DepthMean(depth=depth, count=int(counts[depth]), mean=float(sums[depth] / counts[depth]))
+                for depth in np.flatnonzero(counts)]
+
+    def z_scores(self, engine: EffectiveStats, stat: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(full_tags, z-scores, granted mask) of an engine's documents for one stat, against this table's figures.
+
+        The engine need not be part of the table (the canvas heat map scores
+        the collection on screen against whatever scope is analysed).
+        """
+        tags, columns, matrix = engine.matrix(self.effective)
+        summary = self.stat_summary(stat)
+        if stat not in columns:
+            return tags, np.zeros(len(tags)), np.zeros(len(tags), dtype=bool)
+        i = columns.index(stat)
+        values, mask = matrix[:, i], engine.granted(self.effective)[:, i]
+        if summary is None or not summary.std:
+            return tags, np.zeros(len(tags)), mask
+        return tags, np.where(mask, (values - summary.mean) / summary.std, 0.0), mask
+
+    def outliers(self, threshold: float = DEFAULT_OUTLIER_Z, stats: Optional[Iterable[str]] = None,
+                 limit: int = OUTLIER_LIMIT) -> List[Outlier]:
+        """Documents whose value of a stat is at least threshold standard deviations from its mean, largest |z| first."""
+        summaries = self._summaries()
+        wanted = set(stats) if stats is not None else None
+        found: List[Outlier] = []
+        for block in self._blocks.values():
+            columns = [i for i, stat in enumerate(block.columns) if wanted is None or stat in wanted]
+            if not columns or not len(block.tags):
+                continue
+            mean = np.array([summaries[block.columns[i]].mean for i in columns])
+            std = np.array([summaries[block.columns[i]].std for i in columns])
+            values = block.values[:, columns]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = np.where(block.mask[:, columns] & (std > 0), (values - mean) / np.where(std > 0, std, 1.0), 0.0)
+            rows, cols = np.nonzero(np.abs(z) >= threshold)
+            if len(rows) > limit:
+                # Only the largest can make the cut; rank the rest without building their records
+                keep = np.argpartition(-np.abs(z[rows, cols]), limit)[:limit]
+                rows, cols = rows[keep], cols[keep]
+            found.extend(
+                Outlier(collection=block.collection, full_tag=block.tags[row], stat=block.columns[columns[col]],
+                        value=float(values[row, col]), z=float(z[row, col]))
+                for row, col in zip(rows.tolist(), cols.tolist())
+            )
+        found.sort(key=lambda outlier: -abs(outlier.z))
+        return found[:limit]
@@ -48,4 +48,34 @@ def refresh_app(main_window):
     if hasattr(main_window, 'current_collection') and hasattr(main_window, 'on_collection_selected'):
         current = getattr(main_window, 'current_collection', None)
         if current:
-            main_window.on_collection_selected(current)
\ No newline at end of file
+            main_window.on_collection_selected(current)
+
+def apply_changes(main_window, inserted=(), updated=(), removed=()):
+    """Patch the main window's views with the documents affected by a write, or fully refresh if it cannot.
+
+    inserted: new documents; updated: (previous full_tag, updated document) pairs;
+    removed: full tags of deleted documents (each with its subtree).
+    """
+    if hasattr(main_window, 'apply_changes'):
+        main_window.apply_changes(inserted, updated, removed)
+    else:
+        refresh_app(main_window)
+
+def writer_of(main_window):
+    """Where the main window's writes go: its write-behind queue if it has one, else the MongoDB handler.
+
+    Both offer insert_documents, update_document and get_document with the
+    same results; queued writes report success straight away.
+    """
+    return getattr(main_window, 'write_queue', None) or main_window.db_handler
+
+def ensure_writable(widget) -> bool:
+    """False (after telling the user) when the app is offline and browsing its local snapshot read-only."""
+    parent = widget
+    while parent is not None and not hasattr(parent, 'db_handler'):
+        parent = parent.parent()
+    if parent is None or parent.db_handler.db is not None:
+        return True
+    from PyQt6.QtWidgets import QMessageBox
+    QMessageBox.information(widget, "Read-Only", "The database is unreachable. The local snapshot can be browsed but not edited.")
+    return False
@@ -0,0 +1,250 @@
+"""
+Org chart layout engine for the RCP Database Editor.
+
+Pure Python (no Qt): computes every subtree width in a single bottom-up pass and
+every box position in a single top-down pass, so layout cost is linear in the
+number of nodes. The Canvas consumes the resulting positions table.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from utils.spatial_index import GridIndex
+from models.hierarchy import HierarchyModel
+
+BOX_SIZE = 120
+H_SPACING = 40
+V_SPACING = 60
+MARGIN = 40
+
+class OrgChartLayout:
+    """Positions table for an org chart plus the tree it was computed from."""
+    def __init__(
+        self,
+        positions: Dict[str, Tuple[int, int]],
+        children_map: Dict[str, List[str]],
+        roots: List[str],
+        subtree_widths: Dict[str, int],
+    ) -> None:
+        self.positions = positions
+        self.children_map = children_map
+        self.roots = roots
+        self.subtree_widths = subtree_widths
+        # Size needed to show every box, including the right/bottom margin
+        self.width = 0
+        self.height = 0
+        self.update_size()
+        # Spatial indexes, filled by build_indexes()
+        self.box_index: Optional[GridIndex] = None
+        self.fan_index: Optional[GridIndex] = None
+        self.fans: Dict[str, Tuple[float, float, List[float], float]] = {}
+
+    def build_indexes(self) -> None:
+        """Index boxes and connector fans for viewport queries.
+
+        A fan is the band between a parent's bottom edge and its children's top
+        edge, stored as (parent x, bottom y, sorted child xs, child top y).
+        Safe to call off the GUI thread.
+        """
+        box_index = GridIndex()
+        for tag, (x, y) in self.positions.items():
+            box_index.insert(tag, x, y, x + BOX_SIZE, y + BOX_SIZE)
+        # Fans are short and wide, so use coarser cells than the box index
+        fan_index = GridIndex(cell_size=2048)
+        fans: Dict[str, Tuple[float, float, List[float], float]] = {}
+        for parent_tag, children in self.children_map.items():
+            fan = self._fan(parent_tag, children)
+            if fan is not None:
+                fans[parent_tag] = fan
+                fan_index.insert(parent_tag, *self._fan_rect(fan))
+        self.box_index, self.fan_index, self.fans = box_index, fan_index, fans
+
+    def _fan(self, parent_tag: str, children: List[str]) -> Optional[Tuple[float, float, List[float], float]]:
+        positions = self.positions
+        parent_pos = positions.get(parent_tag)
+        if not parent_pos:
+            return None
+        half = BOX_SIZE / 2
+        child_xs = sorted(positions[child][0] + half for child in children if child in positions)
+        if not child_xs:
+            return None
+        cy = positions[children[0]][1]
+        return (parent_pos[0] + half, parent_pos[1] + BOX_SIZE, child_xs, cy)
+
+    @staticmethod
+    def _fan_rect(fan: Tuple[float, float, List[float], float]) -> Tuple[float, float, float, float]:
+        px, py, child_xs, cy = fan
+        return min(px, child_xs[0]), py, max(px, child_xs[-1]), cy
+
+    def update_indexes(self, tags: Iterable[str]) -> None:
+        """Re-index the boxes and fans of the given tags in place (no-op before build_indexes)."""
+        if self.box_index is None or self.fan_index is None:
+            return
+        for tag in tags:
+            pos = self.positions.get(tag)
+            if pos is None:
+                self.box_index.remove(tag)
+            else:
+                self.box_index.insert(tag, pos[0], pos[1], pos[0] + BOX_SIZE, pos[1] + BOX_SIZE)
+            fan = self._fan(tag, self.children_map.get(tag, []))
+            if fan is None:
+                self.fans.pop(tag, None)
+                self.fan_index.remove(tag)
+            else:
+                self.fans[tag] = fan
+                self.fan_index.insert(tag, *self._fan_rect(fan))
+
+    def update_size(self) -> None:
+        self.width = max((pos[0] for pos in self.positions.values()), default=0) + BOX_SIZE + MARGIN
+        self.height = max((pos[1] for pos in self.positions.values()), default=0) + BOX_SIZE + MARGIN
+
+def compute_subtree_widths(roots: List[str], children_map: Dict[str, List[str]]) -> Dict[str, int]:
+    """Compute the width of every subtree in one iterative post-order pass."""
+    widths: Dict[str, int] = {}
+    for root in roots:
+        if root in widths:
+            continue
+        stack: List[Tuple[str, bool]] = [(root, False)]
+        while stack:
+            tag, expanded = stack.pop()
+            children = children_map.get(tag, [])
+            if expanded or not children:
+                if children:
+                    width = sum(widths[child] for child in children) + H_SPACING * (len(children) - 1)
+                    widths[tag] = max(width, BOX_SIZE)
+                else:
+                    widths[tag] = BOX_SIZE
+                continue
+            stack.append((tag, True))
+            stack.extend((child, False) for child in children if child not in widths)
+    return widths
+
+def compute_positions(
+    roots: List[str],
+    children_map: Dict[str, List[str]],
+    widths: Dict[str, int],
+    origin: Tuple[int, int] = (MARGIN, MARGIN),
+) -> Dict[str, Tuple[int, int]]:
+    """Place every box (top-left corner) centred above its subtree, top-down."""
+    positions: Dict[str, Tuple[int, int]] = {}
+    x, y = origin
+    for root in roots:
+        stack: List[Tuple[str, int, int]] = [(root, x, y)]
+        while stack:
+            tag, left, top = stack.pop()
+            positions[tag] = (int(left + widths[tag] / 2 - BOX_SIZE / 2), top)
+            children = children_map.get(tag, [])
+            if not children:
+                continue
+            child_top = top + BOX_SIZE + V_SPACING
+            placements: List[Tuple[str, int, int]] = []
+            child_left = left
+            for child in children:
+                placements.append((child, child_left, child_top))
+                child_left += widths[child] + H_SPACING
+            # Reverse so children are placed left-to-right, matching the recursive order.
+            stack.extend(reversed(placements))
+        x += widths[root] + H_SPACING
+    return positions
+
+def compute_layout(roots: List[str], children_map: Dict[str, List[str]]) -> OrgChartLayout:
+    """Lay out an already-built tree."""
+    widths = compute_subtree_widths(roots, children_map)
+    positions = compute_positions(roots, children_map, widths)
+    return OrgChartLayout(positions, children_map, roots, widths)
+
+def layout_hierarchy(hierarchy: HierarchyModel) -> OrgChartLayout:
+    """Lay out the documents of a hierarchy model under their nearest document ancestors.
+
+    A VisibleHierarchy works too, laying out only the expanded part of the tree.
+    """
+    return compute_layout(hierarchy.roots(), hierarchy.children_map())
+
+def layout_documents(documents: Iterable[Dict[str, Any]]) -> OrgChartLayout:
+    """Build a hierarchy from documents and lay it out."""
+    return layout_hierarchy(HierarchyModel('', documents))
+
+def _width_of(children: List[str], widths: Dict[str, int]) -> int:
+    if not children:
+        return BOX_SIZE
+    return max(sum(widths[child] for child in children) + H_SPACING * (len(children) - 1), BOX_SIZE)
+
+def _subtree_left(layout: OrgChartLayout, tag: str) -> int:
+    # Inverts compute_positions' x = int(left + width / 2 - BOX_SIZE / 2) for integer left and even BOX_SIZE
+    return layout.positions[tag][0] + BOX_SIZE // 2 - layout.subtree_widths[tag] // 2
+
+def patch_layout(
+    layout: OrgChartLayout,
+    hierarchy: HierarchyModel,
+    owner: Optional[str],
+    removed: Iterable[str] = (),
+) -> Set[str]:
+    """Update a layout in place after the documents directly below owner changed.
+
+    owner is the nearest document ancestor of the change (None for the top
+    level) and removed lists the full tags that have left the hierarchy. Widths
+    are recomputed only along owner's ancestor chain, up to the first ancestor
+    whose width did not change, and only that ancestor's subtree is placed again
+    (when the change reaches the top level, the roots from the affected one
+    rightwards). Returns the tags that were added or moved.
+    """
+    positions, widths, children_map = layout.positions, layout.subtree_widths, layout.children_map
+    removed = list(removed)
+    for tag in removed:
+        positions.pop(tag, None)
+        widths.pop(tag, None)
+        children_map.pop(tag, None)
+    layout.update_indexes(removed)
+    # Refresh owner's children, descending into documents the layout has not placed yet
+    added: List[str] = []
+    stack: List[Optional[str]] = [owner]
+    while stack:
+        tag = stack.pop()
+        children = hierarchy.children(tag) if tag is not None else hierarchy.roots()
+        if tag is None:
+            layout.roots = children
+        elif children:
+            children_map[tag] = children
+        else:
+            children_map.pop(tag, None)
+        for child in children:
+            if child not in positions and child not in widths:
+                widths[child] = BOX_SIZE  # placeholder so the child is visited once
+                added.append(child)
+                stack.append(child)
+    widths.update(compute_subtree_widths(added, children_map))
+    # Walk up until a subtree keeps its width; everything outside it stays put
+    anchor: Optional[str] = None
+    top = tag = owner
+    while tag is not None:
+        width = _width_of(children_map.get(tag, []), widths)
+        if width == widths.get(tag):
+            anchor = tag
+            break
+        widths[tag] = width
+        top = tag
+        tag = hierarchy.parent(tag)
+    if anchor is not None:
+        placed = compute_positions([anchor], children_map, widths, (_subtree_left(layout, anchor), positions[anchor][1]))
+    else:
+        roots = layout.roots
+        x = MARGIN
+        if top is not None:
+            start = roots.index(top)
+            x += sum(widths[root] + H_SPACING for root in roots[:start])
+        else:
+            # Top-level change: keep the leading roots that are still where they were
+            start = len(roots)
+            for i, root in enumerate(roots):
+                if root not in positions or positions[root][1] != MARGIN or _subtree_left(layout, root) != x:
+                    start = i
+                    break
+                x += widths[root] + H_SPACING
+        placed = compute_positions(roots[start:], children_map, widths, (x, MARGIN))
+    moved = {tag for tag, pos in placed.items() if positions.get(tag) != pos}
+    positions.update(placed)
+    # A fan changes when its parent or any of its children moves
+    refresh = set(moved)
+    refresh.update(hierarchy.parent(tag) for tag in moved)
+    refresh.add(owner)
+    refresh.discard(None)
+    layout.update_indexes(refresh)
+    layout.update_size()
+    return moved
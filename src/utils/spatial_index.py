@@ -0,0 +1,75 @@
+"""
+Uniform-grid spatial index for the RCP Database Editor (pure Python, no Qt).
+
+Used by the org chart to find the boxes and connectors intersecting the visible
+viewport, so drawing cost depends on what is on screen rather than on the size
+of the collection.
+"""
+from typing import Dict, Hashable, List, Set, Tuple
+
+Rect = Tuple[float, float, float, float]  # (x0, y0, x1, y1)
+
+class GridIndex:
+    """Buckets axis-aligned rectangles into fixed-size grid cells."""
+    def __init__(self, cell_size: int = 512) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[Hashable]] = {}
+        self.rects: Dict[Hashable, Rect] = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def _cell_range(self, x0: float, y0: float, x1: float, y1: float) -> Tuple[range, range]:
+        size = self.cell_size
+        return range(int(x0 // size), int(x1 // size) + 1), range(int(y0 // size), int(y1 // size) + 1)
+
+    def insert(self, key: Hashable, x0: float, y0: float, x1: float, y1: float) -> None:
+        """Index key under the rectangle (x0, y0)-(x1, y1); re-inserting a key moves it."""
+        cols, rows = self._cell_range(x0, y0, x1, y1)
+        old = self.rects.get(key)
+        if old is not None:
+            if self._cell_range(*old) == (cols, rows):
+                # Moved within the same cells: only the stored rectangle changes
+                self.rects[key] = (x0, y0, x1, y1)
+                return
+            self.remove(key)
+        self.rects[key] = (x0, y0, x1, y1)
+        for cx in cols:
+            for cy in rows:
+                self.cells.setdefault((cx, cy), []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return
+        cols, rows = self._cell_range(*rect)
+        for cx in cols:
+            for cy in rows:
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.remove(key)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> Set[Hashable]:
+        """Return the keys whose rectangle intersects (x0, y0)-(x1, y1)."""
+        found: Set[Hashable] = set()
+        rects = self.rects
+        cols, rows = self._cell_range(x0, y0, x1, y1)
+        if len(cols) * len(rows) > len(self.cells):
+            # Query covers more cells than are occupied: walk the occupied ones instead
+            buckets = [bucket for (cx, cy), bucket in self.cells.items() if cx in cols and cy in rows]
+        else:
+            buckets = [self.cells[(cx, cy)] for cx in cols for cy in rows if (cx, cy) in self.cells]
+        for bucket in buckets:
+            for key in bucket:
+                if key in found:
+                    continue
+                rx0, ry0, rx1, ry1 = rects[key]
+                if rx0 <= x1 and rx1 >= x0 and ry0 <= y1 and ry1 >= y0:
+                    found.add(key)
+        return found
+
+    def query_point(self, x: float, y: float) -> Set[Hashable]:
+        """Return the keys whose rectangle contains the point (x, y)."""
+        return self.query(x, y, x, y)
@@ -0,0 +1,331 @@
+"""
+Balance analytics dialog (View > Balance Analytics...): stat distributions and outliers across collections.
+"""
+from typing import Any, Dict, List, Optional
+import numpy as np
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QCheckBox, QDoubleSpinBox, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QSplitter, QWidget, QAbstractItemView
+)
+from PyQt6.QtCore import Qt, QRectF, QTimer
+from PyQt6.QtGui import QPainter, QColor, QPaintEvent
+from db.effective_stats_loader import EffectiveStatsWorker
+from forms.form_data import COLLECTION_TYPES
+from models.effective_stats import EffectiveStats
+from models.stat_analytics import StatTable, DEFAULT_OUTLIER_Z, heat_buckets
+
+ALL_COLLECTIONS = "All collections"
+# Quiet time after the last edit before the figures are recomputed
+REFRESH_DELAY_MS = 300
+
+def _number_item(value: float, decimals: int = 2) -> QTableWidgetItem:
+    # Sorts by value, shows rounded
+    item = QTableWidgetItem()
+    item.setData(Qt.ItemDataRole.DisplayRole, round(float(value), decimals) if decimals else int(value))
+    return item
+
+class HistogramWidget(QWidget):
+    """Bar chart of a histogram's counts with the value range underneath."""
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.edges = np.zeros(0)
+        self.setMinimumHeight(160)
+
+    def set_histogram(self, counts: np.ndarray, edges: np.ndarray) -> None:
+        self.counts, self.edges = counts, edges
+        if len(counts):
+            self.setToolTip("\n".join(f"{low:.2f} to {high:.2f}: {count}" for low, high, count in zip(edges[:-1], edges[1:], counts.tolist())))
+        else:
+            self.setToolTip("")
+        self.update()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("white"))
+        label_height = 18
+        plot = QRectF(self.rect()).adjusted(6, label_height, -6, -label_height)
+        painter.setPen(QColor("#555"))
+        if not len(self.counts) or not self.counts.max():
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No values")
+            return
+        peak = int(self.counts.max())
+        width = plot.width() / len(self.counts)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#7a8fd6"))
+        for i, count in enumerate(self.counts.tolist()):
+            height = plot.height() * count / peak
+            painter.drawRect(QRectF(plot.left() + i * width + 1, plot.bottom() - height, max(width - 2, 1), height))
+        painter.setPen(QColor("#555"))
+        painter.drawText(QRectF(plot.left(), 0, plot.width(), label_height), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"max {peak}")
+        bottom = QRectF(plot.left(), plot.bottom(), plot.width(), label_height)
+        painter.drawText(bottom, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"{self.edges[0]:.2f}")
+        painter.drawText(bottom, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, f"{self.edges[-1]:.2f}")
+
+class AnalyticsDialog(QDialog):
+    """Per-stat figures, histogram, per-depth means and z-score outliers, plus a heat map on the canvas.
+
+    The collection on screen is analysed through the main window's own
+    EffectiveStats engine, so edits show up here (after a short pause)
+    without reloading; the other collections are loaded once on worker
+    threads when the dialog opens (Reload fetches them again). Double-click
+    an outlier to open it.
+    """
+    def __init__(self, app: Any) -> None:
+        super().__init__(app)
+        self.app = app
+        self.setWindowTitle("Balance Analytics")
+        self.resize(1000, 700)
+        self.engines: Dict[str, EffectiveStats] = {}
+        self._workers: Dict[str, EffectiveStatsWorker] = {}
+        self._dirty: set = set()  # collections whose engine changed since the table last read it
+        self.table = StatTable()
+        self.stat: Optional[str] = None
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.scope_combo = QComboBox(self)
+        self.scope_combo.addItems([ALL_COLLECTIONS, *COLLECTION_TYPES])
+        controls.addWidget(QLabel("Collections", self))
+        controls.addWidget(self.scope_combo)
+        self.values_combo = QComboBox(self)
+        self.values_combo.addItems(["Effective values", "Own values"])
+        controls.addWidget(self.values_combo)
+        controls.addWidget(QLabel("Outlier |z| ≥", self))
+        self.threshold_edit = QDoubleSpinBox(self)
+        self.threshold_edit.setRange(0.5, 10.0)
+        self.threshold_edit.setSingleStep(0.5)
+        self.threshold_edit.setValue(DEFAULT_OUTLIER_Z)
+        controls.addWidget(self.threshold_edit)
+        self.heat_check = QCheckBox("Heat map on canvas", self)
+        self.heat_check.setToolTip("Colour the chart's boxes by the selected stat: blue below the mean, red above it")
+        controls.addWidget(self.heat_check)
+        controls.addStretch(1)
+        reload_btn = QPushButton("Reload", self)
+        reload_btn.clicked.connect(self.reload)
+        controls.addWidget(reload_btn)
+        layout.addLayout(controls)
+
+        splitter = QSplitter(Qt.Orientation.Vertical, self)
+        top = QSplitter(Qt.Orientation.Horizontal, splitter)
+        self.stats_table = self._make_table(["Stat", "Count", "Mean", "Std", "Min", "Max"], top)
+        self.stats_table.setSortingEnabled(True)
+        detail = QWidget(top)
+        detail_layout = QVBoxLayout(detail)
+        detail_layout.setContentsMargins(0, 0, 0, 0)
+        self.stat_label = QLabel("", detail)
+        detail_layout.addWidget(self.stat_label)
+        self.histogram = HistogramWidget(detail)
+        detail_layout.addWidget(self.histogram, 2)
+        self.depth_table = self._make_table(["Depth", "Count", "Mean"], detail)
+        detail_layout.addWidget(self.depth_table, 1)
+        top.setSizes([450, 550])
+        self.outliers_table = self._make_table(["Collection", "Full Tag", "Stat", "Value", "z"], splitter)
+        self.outliers_table.setSortingEnabled(True)
+        self.outliers_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        splitter.setSizes([420, 280])
+        layout.addWidget(splitter)
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(REFRESH_DELAY_MS)
+        self._timer.timeout.connect(self.refresh)
+        self.scope_combo.currentIndexChanged.connect(self.rebuild_table)
+        self.values_combo.currentIndexChanged.connect(self.rebuild_table)
+        self.threshold_edit.valueChanged.connect(self.show_outliers)
+        self.heat_check.toggled.connect(self.show_heat_map)
+        self.stats_table.itemSelectionChanged.connect(self.on_stat_selected)
+        self.outliers_table.itemDoubleClicked.connect(self.open_outlier)
+        app.effectiveStatsChanged.connect(self.on_engine_changed)
+        self.reload()
+
+    def _make_table(self, headers: List[str], parent: QWidget) -> QTableWidget:
+        table = QTableWidget(0, len(headers), parent)
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        return table
+
+    # --- Engines ---
+    def reload(self) -> None:
+        """Load every collection again; the one on screen comes from the main window."""
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers = {}
+        self.engines = {}
+        live = self.app.effective_stats
+        if live is not None:
+            self.engines[live.collection] = live
+        else:
+            # The collection on screen uses the main window's engine, built on first use (see on_engine_changed)
+            self.app.ensure_effective_stats()
+        db = self.app.db_handler.db
+        for collection in COLLECTION_TYPES:
+            if collection in self.engines or collection == self.app.current_collection or db is None:
+                continue
+            worker = EffectiveStatsWorker(db, collection, self)
+            worker.statsReady.connect(self.on_stats_loaded)
+            worker.statsFailed.connect(lambda collection, message: self._update_status(f"Could not load {collection}: {message}"))
+            worker.finished.connect(worker.deleteLater)
+            self._workers[collection] = worker
+            worker.start()
+        self.rebuild_table()
+
+    def on_stats_loaded(self, collection: str, stats: EffectiveStats) -> None:
+        if self._workers.get(collection) is not self.sender():
+            return  # superseded by a reload
+        del self._workers[collection]
+        if collection not in self.engines:  # the main window's live engine wins
+            self.engines[collection] = stats
+            self._changed(collection)
+
+    def on_engine_changed(self, collection: str) -> None:
+        live = self.app.effective_stats
+        if live is not None and live.collection == collection:
+            self.engines[collection] = live
+            self._changed(collection)
+        else:
+            if self.isVisible() and collection == self.app.current_collection:
+                self.app.ensure_effective_stats()
+            if self.heat_check.isChecked():
+                self._timer.start()  # the collection on screen changed; recolour once its engine is known
+
+    def _changed(self, collection: str) -> None:
+        self._dirty.add(collection)
+        if self.isVisible():
+            self._timer.start()
+
+    def _in_scope(self, collection: str) -> bool:
+        scope = self.scope_combo.currentText()
+        return scope == ALL_COLLECTIONS or scope == collection
+
+    # --- Figures ---
+    def rebuild_table(self) -> None:
+        """Start a new table for the chosen scope and kind of values."""
+        self.table = StatTable(effective=self.values_combo.currentIndex() == 0)
+        self._dirty = set(self.engines)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-read the changed collections and redraw everything."""
+        self._timer.stop()
+        for collection in self._dirty:
+            if self._in_scope(collection):
+                self.table.set_engine(self.engines[collection])
+        self._dirty = set()
+        self.show_summary()
+        self.show_outliers()
+        self.show_heat_map()
+        self._update_status()
+
+    def _update_status(self, text: str = '') -> None:
+        if not text:
+            loading = [collection for collection in self._workers if self._in_scope(collection)]
+            text = f"{len(self.table)} documents"
+            if loading:
+                text += f"; loading {', '.join(loading)}..."
+            elif self.app.db_handler.db is None and not self.engines:
+                text = "Not connected to MongoDB."
+        self.status_label.setText(text)
+
+    def show_summary(self) -> None:
+        self.stats_table.blockSignals(True)
+        self.stats_table.setSortingEnabled(False)
+        summaries = self.table.summary()
+        self.stats_table.setRowCount(len(summaries))
+        selected_row = -1
+        for row, summary in enumerate(summaries):
+            self.stats_table.setItem(row, 0, QTableWidgetItem(summary.stat))
+            self.stats_table.setItem(row, 1, _number_item(summary.count, 0))
+            for column, value in enumerate((summary.mean, summary.std, summary.min, summary.max), start=2):
+                self.stats_table.setItem(row, column, _number_item(value))
+            if summary.stat == self.stat:
+                selected_row = row
+        self.stats_table.setSortingEnabled(True)
+        if selected_row < 0 and summaries:
+            self.stat = summaries[0].stat
+        elif selected_row < 0:
+            self.stat = None
+        for row in range(self.stats_table.rowCount()):
+            if self.stats_table.item(row, 0).text() == self.stat:
+                self.stats_table.selectRow(row)
+                break
+        self.stats_table.blockSignals(False)
+        self.show_stat()
+
+    def on_stat_selected(self) -> None:
+        rows = self.stats_table.selectionModel().selectedRows()
+        if not rows:
+            return
+        self.stat = self.stats_table.item(rows[0].row(), 0).text()
+        self.show_stat()
+        self.show_heat_map()
+
+    def show_stat(self) -> None:
+        """Histogram and per-depth means of the selected stat."""
+        stat = self.stat
+        summary = self.table.stat_summary(stat) if stat else None
+        if summary is None:
+            self.stat_label.setText("")
+            self.histogram.set_histogram(np.zeros(0, dtype=np.int64), np.zeros(0))
+            self.depth_table.setRowCount(0)
+            return
+        self.stat_label.setText(f"{stat}: {summary.count} documents, mean {summary.mean:.2f}, std {summary.std:.2f}")
+        self.histogram.set_histogram(*self.table.histogram(stat))
+        depths = self.table.depth_means(stat)
+        self.depth_table.setRowCount(len(depths))
+        for row, depth in enumerate(depths):
+            self.depth_table.setItem(row, 0, _number_item(depth.depth, 0))
+            self.depth_table.setItem(row, 1, _number_item(depth.count, 0))
+            self.depth_table.setItem(row, 2, _number_item(depth.mean))
+
+    def show_outliers(self) -> None:
+        outliers = self.table.outliers(self.threshold_edit.value())
+        self.outliers_table.setSortingEnabled(False)
+        self.outliers_table.setRowCount(len(outliers))
+        for row, outlier in enumerate(outliers):
+            item = QTableWidgetItem(outlier.collection)
+            item.setData(Qt.ItemDataRole.UserRole, (outlier.collection, outlier.full_tag))
+            self.outliers_table.setItem(row, 0, item)
+            self.outliers_table.setItem(row, 1, QTableWidgetItem(outlier.full_tag))
+            self.outliers_table.setItem(row, 2, QTableWidgetItem(outlier.stat))
+            self.outliers_table.setItem(row, 3, _number_item(outlier.value))
+            self.outliers_table.setItem(row, 4, _number_item(outlier.z))
+        self.outliers_table.setSortingEnabled(True)
+
+    def open_outlier(self, item: QTableWidgetItem) -> None:
+        target = self.outliers_table.item(item.row(), 0).data(Qt.ItemDataRole.UserRole)
+        if target:
+            self.app.jump_to(*target)
+
+    def show_heat_map(self) -> None:
+        """Colour the collection on screen by the selected stat's z-scores against the analysed scope."""
+        view = self.app.canvas.view
+        collection = self.app.current_collection
+        engine = self.engines.get(collection) if collection else None
+        if not self.heat_check.isChecked() or not self.isVisible() or self.stat is None or engine is None:
+            if view.heat is not None:
+                view.set_heat(None)
+            return
+        tags, z, granted = self.table.z_scores(engine, self.stat)
+        buckets = heat_buckets(z).tolist()
+        view.set_heat({tag: bucket for tag, bucket, has in zip(tags, buckets, granted.tolist()) if has})
+
+    def showEvent(self, event: Any) -> None:
+        super().showEvent(event)
+        if self._dirty:
+            self._timer.start()
+        else:
+            self.show_heat_map()
+
+    def hideEvent(self, event: Any) -> None:
+        # Closing only hides the dialog; the heat map goes with it
+        super().hideEvent(event)
+        self._timer.stop()
+        if self.app.canvas.view.heat is not None:
+            self.app.canvas.view.set_heat(None)
@@ -1,19 +1,51 @@
 """
 Main application window widget.
 """
-from PyQt6.QtWidgets import QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QStatusBar, QMenuBar, QListWidgetItem, QLabel, QSplitter, QMessageBox
-from PyQt6.QtGui import QAction, QColor
-from PyQt6.QtCore import Qt
-from typing import Optional, List, Dict, Any
+from PyQt6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QStatusBar, QMenuBar, QListWidgetItem, QLabel, QSplitter, QMessageBox, QProgressBar
+from PyQt6.QtGui import QAction, QActionGroup, QColor, QCloseEvent
+from PyQt6.QtCore import Qt, QElapsedTimer, QThread, QTimer, pyqtSignal
+from PyQt6 import sip
+from typing import Callable, Optional, List, Dict, Any, Iterable, Tuple
+import time
+from bson import ObjectId
 from .canvas import Canvas
 from .nav_panel import NavPanel
 from .form_card import FormCard
-from db.mongo_handler import MongoDBHandler
+from db.mongo_handler import CONFLICT, MongoDBHandler, skeleton_of
+from db.collection_loader import CollectionLoader
+from db.snapshot_store import SnapshotStore, snapshot_path
+from db.connection_manager import ConnectWorker
+from db.gameplay_tags_exporter import GameplayTagsWorker
+from db.search_indexer import SearchIndexWorker
+from db.write_queue import WriteQueue
+from db.subtree_mover import SubtreeMoveWorker
+from db.effective_stats_loader import EffectiveStatsWorker
+from db.presence import HEARTBEAT_MS, PresenceWorker, leave
+from db.change_watcher import ChangeWatcher, LIVE, POLLING, RECONNECTING, STOPPED
+from models.hierarchy import HierarchyModel, DEFAULT_EXPAND_DEPTH
+from models.search_index import SearchIndex, KEY_FIELDS
+from models.effective_stats import EffectiveStats
 from forms.form_data import COLLECTION_TYPES
-from utils.helpers import refresh_app
+from utils.helpers import refresh_app, ensure_writable
+
+PROGRESS_INTERVAL_MS = 200
+# Deltas larger than this redraw the chart and nav tree from the model instead of patching them
+PATCH_LIMIT = 200
+# View > Expand Depth choices; None expands everything
+EXPAND_DEPTHS = [1, 2, 3, 5, None]
+# Longest the window blocks for background work before the client is swapped for one with new
+# settings; after that it checks again every RECONNECT_RETRY_MS without blocking
+RECONNECT_DRAIN_MS = 500
+RECONNECT_RETRY_MS = 1000
+# Longest the window waits on close for queued writes and background work to finish
+CLOSE_WAIT_MS = 10000
+# After closing the client, how long stuck workers get to notice
+CLOSE_ABORT_MS = 2000
 
 class ApplicationWindow(QMainWindow):
     """Main application window for the RCP Database Editor."""
+    effectiveStatsChanged = pyqtSignal(str)  # collection whose effective grants were rebuilt or edited
+
     def __init__(self, db_handler: MongoDBHandler, parent: Optional[QMainWindow] = None) -> None:
         super().__init__(parent)
         self.db_handler = db_handler
@@ -41,12 +73,27 @@ class ApplicationWindow(QMainWindow):
         
         # File menu
         file_menu = self.menu_bar.addMenu("File")
+        import_action = QAction("Import...", self)
+        import_action.triggered.connect(self.open_import_dialog)
+        file_menu.addAction(import_action)
+        export_action = QAction("Export DataTable...", self)
+        export_action.triggered.connect(self.open_export_dialog)
+        file_menu.addAction(export_action)
+        tags_action = QAction("Export Gameplay Tags...", self)
+        tags_action.triggered.connect(self.export_gameplay_tags)
+        file_menu.addAction(tags_action)
+        file_menu.addSeparator()
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
         
         # Edit menu
         edit_menu = self.menu_bar.addMenu("Edit")
+        search_action = QAction("Search...", self)
+        search_action.setShortcut("Ctrl+K")
+        search_action.triggered.connect(self.open_search_dialog)
+        edit_menu.addAction(search_action)
+        edit_menu.addSeparator()
         settings_action = QAction("Settings", self)
         settings_action.triggered.connect(self.open_settings_dialog)
         edit_menu.addAction(settings_action)
@@ -56,6 +103,22 @@ class ApplicationWindow(QMainWindow):
         refresh_action.triggered.connect(lambda: refresh_app(self))
         edit_menu.addAction(refresh_action)
         
+        # View menu
+        view_menu = self.menu_bar.addMenu("View")
+        depth_menu = view_menu.addMenu("Expand Depth")
+        depth_group = QActionGroup(self)
+        for depth in EXPAND_DEPTHS:
+            action = QAction("All" if depth is None else str(depth), self)
+            action.setCheckable(True)
+            action.setChecked(depth == DEFAULT_EXPAND_DEPTH)
+            action.triggered.connect(lambda checked, d=depth: self.set_expand_depth(d))
+            depth_group.addAction(action)
+            depth_menu.addAction(action)
+        view_menu.addSeparator()
+        analytics_action = QAction("Balance Analytics...", self)
+        analytics_action.triggered.connect(self.open_analytics_dialog)
+        view_menu.addAction(analytics_action)
+
         # Collections menu
         collections_menu = self.menu_bar.addMenu("Collections")
         self.collection_actions = {}
@@ -75,28 +138,85 @@ class ApplicationWindow(QMainWindow):
         self.status_bar = QStatusBar(self)
         self.setStatusBar(self.status_bar)
         self.status_left = QLabel(f"Database: {self.db_handler.db_name}")
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(200)
+        self.load_progress.setFormat("%v / %m")
+        self.load_progress.hide()
+        self.pending_label = QLabel()
+        self.pending_label.hide()
+        self.editors_label = QLabel()
+        self.editors_label.hide()
         self.status_right = QLabel()
         self.status_right.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
         self.status_bar_layout = QHBoxLayout()
         self.status_bar_layout.addWidget(self.status_left)
         self.status_bar_layout.addStretch(1)
+        self.status_bar_layout.addWidget(self.load_progress)
+        self.status_bar_layout.addWidget(self.pending_label)
+        self.status_bar_layout.addWidget(self.editors_label)
         self.status_bar_layout.addWidget(self.status_right)
         status_bar_widget = QWidget()
         status_bar_widget.setLayout(self.status_bar_layout)
         self.status_bar.addPermanentWidget(status_bar_widget, 1)
+        self._connecting = False
+        self._reconnect_due = False  # new connection settings wait for background work to finish
+        # The subtree move under way: (generation, collection, full_tag, new full_tag, on_done), and its worker once started
+        self._move: Optional[Tuple[int, str, str, str, Any]] = None
+        self._move_worker: Optional[SubtreeMoveWorker] = None
+        self._move_generation = 0
+        # Live sync of the collection on screen with other editors' writes, once its load has synced
+        self._watcher: Optional[ChangeWatcher] = None
+        self._sync_mode = ''
         self.update_connection_status()
 
         # Connect signals
+        self.nav_panel.pathSelected.connect(self.canvas.reveal)
         # Remove: self.canvas.list_widget.itemClicked.connect(self.on_document_selected)
         # The org chart is now interactive via box widgets, not a list widget.
         # If you want to handle clicks, connect signals from OrgChartBox widgets in Canvas.
 
         # State
         self.current_collection: Optional[str] = None
-        self.documents: List[Dict[str, Any]] = []
+        self.hierarchy = HierarchyModel('')
+        self._loader: Optional[CollectionLoader] = None
+        self._loading = False  # True until the hierarchy holds the whole collection
+        self._load_generation = 0
+        self.snapshot = SnapshotStore(snapshot_path(self.db_handler.db_name))
+        self._progress_clock = QElapsedTimer()
+        # Global search over every collection, built in the background once the connection settles
+        self.search_index: Optional[SearchIndex] = None
+        self._search_worker: Optional[SearchIndexWorker] = None
+        self._search_journal: List[Tuple[str, str, Any]] = []  # writes made while a build runs, replayed onto it
+        # Effective (inherited) grants of the current collection, built on a worker thread per load
+        self.effective_stats: Optional[EffectiveStats] = None
+        self._effective_worker: Optional[EffectiveStatsWorker] = None
+        self._effective_journal: List[Tuple[str, Any, Any]] = []
+        self._search_dialog: Optional[Any] = None
+        self._analytics_dialog: Optional[Any] = None
+        # Dialogs write through this queue: views are patched at once, the server is written in the background
+        self.write_queue = WriteQueue(self.db_handler, exists=self._tag_exists, parent=self)
+        self.write_queue.pendingChanged.connect(self.on_pending_writes)
+        # A requested move starts once the writes queued before it are saved
+        self.write_queue.pendingChanged.connect(self._start_move)
+        self.write_queue.writesSaved.connect(lambda count: self.status_bar.showMessage(f"Saved {count} changes", 3000))
+        self.write_queue.writeFailed.connect(self.on_write_failed)
+        self.write_queue.writeConflict.connect(self.on_write_conflict)
+        self._write_errors: List[str] = []
+        self._conflicts: List[Tuple[str, Dict[str, Any], Dict[str, Any], Dict[str, Any]]] = []
+        # Presence: a heartbeat tells other editors what this one shows and edits, and lists theirs
+        self.presence_session = ObjectId()
+        self._editing: Optional[str] = None
+        self._heartbeat_due = False
+        self._presence_worker: Optional[PresenceWorker] = None
+        self.other_editors: List[Dict[str, Any]] = []
+        self._presence_timer = QTimer(self)
+        self._presence_timer.timeout.connect(self.send_heartbeat)
+        self._presence_timer.start(HEARTBEAT_MS)
+        self._deferred_collection: Optional[str] = None  # load waiting for queued writes to land
 
-        # Set default collection to Race on startup
+        # Set default collection to Race on startup; it renders from the local snapshot while connecting
         self.on_collection_selected("Race")
+        self.connect_async()
 
     def update_connection_status(self) -> None:
         uri = self.db_handler.uri
@@ -108,21 +228,593 @@ class ApplicationWindow(QMainWindow):
                 uri = uri.split('://', 1)[-1]
             uri = 'mongodb://' + uri
         if self.db_handler.client is not None and self.db_handler.db is not None:
-            self.status_right.setText(f'<span style="color:green;">Connected to {uri}</span>')
+            sync = {LIVE: ' (live)', POLLING: ' (polling for changes)'}.get(self._sync_mode, '')
+            if self._sync_mode == RECONNECTING:
+                self.status_right.setText(f'<span style="color:#c07000;">Reconnecting to {uri}...</span>')
+            elif self._sync_mode == STOPPED:
+                self.status_right.setText(f'<span style="color:#c07000;">Connected to {uri} (live sync stopped)</span>')
+            else:
+                self.status_right.setText(f'<span style="color:green;">Connected to {uri}{sync}</span>')
+        elif self._connecting:
+            self.status_right.setText(f'<span style="color:#c07000;">Connecting to {uri}...</span>')
+        else:
+            self.status_right.setText(f'<span style="color:red;">Offline (read-only snapshot)</span>')
+
+    def connect_async(self) -> None:
+        """Connect on a worker thread; the status bar shows progress and the current collection reloads once connected."""
+        worker = ConnectWorker(self.db_handler, self)
+        worker.connectFinished.connect(self.on_connect_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._connecting = True
+        worker.start()
+        self.update_connection_status()
+
+    def on_connect_finished(self, connected: bool, ping_ms: Any) -> None:
+        self._connecting = False
+        self.update_connection_status()
+        self.send_heartbeat()
+        # From the server, or offline from the snapshot
+        self.rebuild_search_index()
+        if connected:
+            # Catch the snapshot that is on screen up with the server
+            self.refresh()
         else:
-            self.status_right.setText(f'<span style="color:red;">Disconnected</span>')
+            self.status_bar.showMessage("Could not reach MongoDB; browsing the local snapshot read-only.")
+
+    def rebuild_search_index(self) -> None:
+        """Index every collection again on a worker thread; the old index answers queries until then."""
+        if self._search_worker is not None:
+            self._search_worker.cancel()
+        worker = SearchIndexWorker(self.db_handler.db, self.snapshot, self)
+        worker.indexReady.connect(self.on_search_index_ready)
+        worker.indexFailed.connect(lambda message: self.status_bar.showMessage(f"Search index unavailable: {message}"))
+        worker.finished.connect(worker.deleteLater)
+        self._search_worker = worker
+        self._search_journal = []
+        worker.start()
+
+    def on_search_index_ready(self, index: SearchIndex) -> None:
+        if self.sender() is not self._search_worker:
+            return  # superseded by a newer build
+        self._search_worker = None
+        for op, collection, value in self._search_journal:
+            if op == 'add':
+                index.add(collection, value)
+            else:
+                index.remove(collection, value)
+        self._search_journal = []
+        self.search_index = index
+        if self._search_dialog is not None:
+            self._search_dialog.set_index(index)
+
+    def _index_document(self, collection: str, doc: Dict[str, Any]) -> None:
+        if self.search_index is not None:
+            self.search_index.add(collection, doc)
+        if self._search_worker is not None:
+            self._search_journal.append(('add', collection, doc))
+
+    def _unindex_document(self, collection: str, document_id: Any) -> None:
+        if self.search_index is not None:
+            self.search_index.remove(collection, document_id)
+        if self._search_worker is not None:
+            self._search_journal.append(('remove', collection, document_id))
+
+    def discard_effective_stats(self) -> None:
+        """Drop the effective grants of the previous collection; they are built again when next needed."""
+        if self._effective_worker is not None:
+            self._effective_worker.cancel()
+            self._effective_worker = None
+        self._effective_journal = []
+        self.effective_stats = None
+        self._watch_grants()
+        self.effectiveStatsChanged.emit(self.current_collection or '')
+
+    def ensure_effective_stats(self) -> None:
+        """Start computing the current collection's effective grants on a worker thread, unless done or under way.
+
+        Only the edit dialog and analytics need them, so a collection load
+        does not download every grant map; effectiveStatsChanged fires when
+        they are ready.
+        """
+        if self.effective_stats is not None or self._effective_worker is not None:
+            return
+        if self.db_handler.db is None or not self.current_collection:
+            return
+        worker = EffectiveStatsWorker(self.db_handler.db, self.current_collection, self)
+        worker.statsReady.connect(self.on_effective_stats_ready)
+        worker.statsFailed.connect(self.on_effective_stats_failed)
+        worker.finished.connect(worker.deleteLater)
+        self._effective_worker = worker
+        self._effective_journal = []
+        # Remote changes from here on arrive with their grants, for the journal
+        self._watch_grants()
+        self.status_bar.showMessage(f"Computing effective grants for {self.current_collection}...")
+        worker.start()
+
+    def on_effective_stats_failed(self, collection: str, message: str) -> None:
+        if self.sender() is not self._effective_worker:
+            return
+        # The next ensure_effective_stats() tries again
+        self._effective_worker = None
+        self._effective_journal = []
+        self._watch_grants()
+        self.status_bar.showMessage(f"Could not compute effective grants for {collection}: {message}")
+
+    def on_effective_stats_ready(self, collection: str, stats: EffectiveStats) -> None:
+        if self.sender() is not self._effective_worker or collection != self.current_collection:
+            return  # superseded by a newer build
+        self._effective_worker = None
+        for op, doc, old_tag in self._effective_journal:
+            if op == 'update':
+                stats.update(doc, old_tag)
+            else:
+                stats.remove_subtree(doc)
+        self._effective_journal = []
+        self.effective_stats = stats
+        self.status_bar.showMessage(f"Effective grants for {collection} are ready", 3000)
+        self.effectiveStatsChanged.emit(collection)
+
+    def _watch_grants(self) -> None:
+        # The ChangeWatcher fetches grant maps only while there are effective stats to keep current
+        if self._watcher is not None:
+            self._watcher.grants = self.effective_stats is not None or self._effective_worker is not None
+
+    def _track_effective(self, op: str, value: Any, old_tag: Optional[str] = None) -> None:
+        # op is 'update' (value a document) or 'remove' (value a full_tag whose subtree goes)
+        if op == 'update':
+            # A remote change collected before grants were requested has only the keys of its maps,
+            # and the load under way read it after that change
+            value = {key: field for key, field in value.items() if not (key in KEY_FIELDS and isinstance(field, list))}
+        if self.effective_stats is not None:
+            if op == 'update':
+                self.effective_stats.update(value, old_tag)
+            else:
+                self.effective_stats.remove_subtree(value)
+            self.effectiveStatsChanged.emit(self.effective_stats.collection)
+        if self._effective_worker is not None:
+            self._effective_journal.append((op, value, old_tag))
+
+    def open_search_dialog(self) -> None:
+        from .search_dialog import SearchDialog
+        if self.search_index is None and self._search_worker is None:
+            self.rebuild_search_index()
+        dlg = SearchDialog(self.search_index, self.db_handler, self)
+        self._search_dialog = dlg
+        try:
+            accepted = dlg.exec() == SearchDialog.DialogCode.Accepted
+        finally:
+            self._search_dialog = None
+        if accepted and dlg.selected:
+            self.jump_to(*dlg.selected)
+
+    def open_analytics_dialog(self) -> None:
+        from .analytics_dialog import AnalyticsDialog
+        # Modeless and kept once opened, so its loaded collections survive closing it
+        if self._analytics_dialog is None:
+            self._analytics_dialog = AnalyticsDialog(self)
+        self._analytics_dialog.show()
+        self._analytics_dialog.raise_()
+        self._analytics_dialog.activateWindow()
+
+    def jump_to(self, collection: str, full_tag: str) -> None:
+        """Show a document in its collection: select it in the nav tree and centre it on the chart."""
+        if collection != self.current_collection:
+            self.on_collection_selected(collection)
+        self.nav_panel.select_path(full_tag)
+
+    def move_subtree(self, collection: str, full_tag: str, new_full_tag: str,
+                     on_done: Optional[Callable[[bool, str, List[Tuple[str, str, Dict[str, Any]]]], None]] = None) -> bool:
+        """Move a document and its descendants to new_full_tag on a worker thread; False while another move is under way.
+
+        Queued writes are saved first and writes made during the move wait in
+        the queue, so none of them lands on a tag after it has moved away.
+        When the move is done the views and the search index are patched and
+        on_done gets MongoDBHandler.move_subtree's result.
+        """
+        if self._move is not None:
+            return False
+        self._move_generation += 1
+        self._move = (self._move_generation, collection, full_tag, new_full_tag, on_done)
+        self.canvas.view.moves_enabled = False
+        QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        self.status_bar.showMessage(f"Moving {full_tag} to {new_full_tag}...")
+        self.write_queue.flush()
+        self._start_move()
+        return True
+
+    def _start_move(self, *_: Any) -> None:
+        if self._move is None or self._move_worker is not None or self.write_queue.pending:
+            return
+        generation, collection, full_tag, new_full_tag, _ = self._move
+        self.write_queue.hold()
+        worker = SubtreeMoveWorker(self.db_handler, collection, full_tag, new_full_tag, generation, self)
+        worker.moveFinished.connect(self.on_move_finished)
+        worker.finished.connect(worker.deleteLater)
+        self._move_worker = worker
+        worker.start()
+
+    def on_move_finished(self, generation: int, success: bool, message: str, rewritten: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        if self._move is None or generation != self._move[0]:
+            return  # already handled by stop_background_work()
+        _, collection, full_tag, new_full_tag, on_done = self._move
+        self._move = None
+        self._move_worker = None
+        self.canvas.view.moves_enabled = True
+        QApplication.restoreOverrideCursor()
+        # Writes made meanwhile go out now, against the moved documents
+        self.write_queue.release()
+        if success and rewritten:
+            # References rewritten in other collections only concern the search index
+            for name, _, doc in rewritten:
+                if name != self.current_collection:
+                    self._index_document(name, doc)
+            if collection == self.current_collection:
+                self.apply_changes(updated=[(old_tag, doc) for name, old_tag, doc in rewritten if name == collection])
+                self.nav_panel.select_path(new_full_tag)
+        self.status_bar.showMessage(message)
+        if on_done is not None:
+            on_done(success, message, rewritten)
+
+    def _tag_exists(self, collection: str, full_tag: str) -> bool:
+        return collection == self.current_collection and full_tag in self.hierarchy
+
+    def on_pending_writes(self, count: int) -> None:
+        self.pending_label.setText(f"{count} unsaved change{'s' if count != 1 else ''}")
+        self.pending_label.setVisible(count > 0)
+        if count == 0 and self._deferred_collection is not None:
+            collection, self._deferred_collection = self._deferred_collection, None
+            self.on_collection_selected(collection)
+
+    def on_write_failed(self, collection: str, message: str, rollback: Dict[str, Any]) -> None:
+        """Undo a refused write's optimistic patch; the messages of one flush are shown together."""
+        if collection == self.current_collection and self._deferred_collection is None:
+            self.apply_changes(**rollback)
+        if message == CONFLICT:
+            # Not an error to report: on_write_conflict offers the merge instead
+            return
+        if not self._write_errors:
+            QTimer.singleShot(0, self._report_write_errors)
+        self._write_errors.append(message)
+
+    def _report_write_errors(self) -> None:
+        errors, self._write_errors = self._write_errors, []
+        if errors:
+            QMessageBox.warning(self, "Changes Not Saved", "\n".join(errors))
+
+    def on_write_conflict(self, collection: str, base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any]) -> None:
+        """A queued edit lost to another editor's save; its merge view opens once the flush has been handled."""
+        if not self._conflicts:
+            QTimer.singleShot(0, self._resolve_conflicts)
+        self._conflicts.append((collection, base, mine, theirs))
+
+    def _resolve_conflicts(self) -> None:
+        conflicts, self._conflicts = self._conflicts, []
+        for collection, base, mine, theirs in conflicts:
+            if collection == self.current_collection and self._deferred_collection is None:
+                self.canvas.resolve_conflict(collection, base, mine, theirs)
+            else:
+                QMessageBox.warning(self, "Changes Not Saved",
+                                    f"{CONFLICT}\nYour edit of {mine.get('full_tag', '')} in {collection} was not saved.")
+
+    # --- Presence of other editors ---
+    def send_heartbeat(self) -> None:
+        """Refresh this editor's presence entry and fetch the others' on a worker thread."""
+        if self.db_handler.db is None:
+            return
+        if self._presence_worker is not None:
+            # One at a time; the newest state is sent when the running one finishes
+            self._heartbeat_due = True
+            return
+        self._heartbeat_due = False
+        entry = {'editor': self.db_handler.editor, 'collection': self.current_collection, 'editing': self._editing}
+        worker = self._presence_worker = PresenceWorker(self.db_handler.db, self.presence_session, entry, self)
+        worker.editorsSeen.connect(self.on_editors_seen)
+        worker.finished.connect(self._heartbeat_finished)
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+
+    def _heartbeat_finished(self) -> None:
+        self._presence_worker = None
+        if self._heartbeat_due and self._presence_timer.isActive():
+            QTimer.singleShot(0, self.send_heartbeat)
+
+    def on_editors_seen(self, editors: List[Dict[str, Any]]) -> None:
+        self.other_editors = editors
+        names = sorted({entry.get('editor') or '?' for entry in editors})
+        if not names:
+            self.editors_label.hide()
+            return
+        self.editors_label.setText(f"Also editing: {', '.join(names)}" if len(names) <= 2 else f"{len(names)} other editors")
+        self.editors_label.setToolTip("\n".join(
+            f"{entry.get('editor') or '?'}: {entry.get('editing') or entry.get('collection') or 'idle'}"
+            for entry in sorted(editors, key=lambda entry: entry.get('editor') or '')
+        ))
+        self.editors_label.show()
+
+    def editors_of(self, collection: str, full_tag: str) -> List[str]:
+        """Other editors who have a document open for editing, as of the last heartbeat."""
+        return sorted({entry.get('editor') or '?' for entry in self.other_editors
+                       if entry.get('collection') == collection and entry.get('editing') == full_tag})
+
+    def set_editing(self, collection: str, full_tag: Optional[str]) -> None:
+        """Publish (or with None, withdraw) the document this editor has open; others see it on their next heartbeat."""
+        self._editing = full_tag
+        self.send_heartbeat()
 
     def on_collection_selected(self, collection: str) -> None:
+        """Start loading a collection on a worker thread, cancelling any load in progress.
+
+        With writes still queued the load waits for them, so it cannot read
+        the server before they land and drop them from the views.
+        """
+        if self.write_queue.pending:
+            self._deferred_collection = collection
+            self.write_queue.flush()
+            self.status_bar.showMessage("Saving changes...")
+            return
         self.current_collection = collection
-        # Fetch documents from DB
-        if self.db_handler.db is not None:
-            docs = list(self.db_handler.db[collection].find())
+        self.cancel_loading()
+        # One hierarchy model per load, shared by the canvas, nav panel and dialogs
+        self.hierarchy = HierarchyModel(collection)
+        self.canvas.begin_load(collection, self.hierarchy)
+        self.nav_panel.begin_load(collection, self.hierarchy)
+        self._load_generation += 1
+        # Renders from the local snapshot first when there is one, then syncs with the server
+        loader = CollectionLoader(
+            self.db_handler, collection, self._load_generation, snapshot=self.snapshot,
+            expansion=self.canvas.expansion_state(collection).copy(), parent=self
+        )
+        loader.batchLoaded.connect(self.on_batch_loaded)
+        loader.layoutReady.connect(self.on_layout_ready)
+        loader.progress.connect(self.on_load_progress)
+        loader.loadFinished.connect(self.on_load_finished)
+        loader.loadFailed.connect(self.on_load_failed)
+        loader.changesLoaded.connect(self.on_changes_loaded)
+        loader.syncFinished.connect(self.on_sync_finished)
+        loader.finished.connect(loader.deleteLater)
+        self._loader = loader
+        self._loading = True
+        self.load_progress.setRange(0, 0)  # busy until the first count arrives
+        self.load_progress.show()
+        self.status_bar.showMessage(f"Loading {collection}...")
+        loader.start()
+        self.discard_effective_stats()
+
+    def set_expand_depth(self, depth: Optional[int]) -> None:
+        """Collapse both views below depth levels (None expands everything) for the rest of the session."""
+        self.canvas.set_expand_depth(depth)
+        self.nav_panel.set_expand_depth(depth)
+
+    def cancel_loading(self) -> None:
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader = None
+        self.stop_watching()
+        self._loading = False
+        self.load_progress.hide()
+
+    def on_batch_loaded(self, generation: int, docs: List[Dict[str, Any]]) -> None:
+        if generation != self._load_generation:
+            return
+        self.hierarchy.add_many(docs)
+        self.canvas.append_documents(docs)
+        self.nav_panel.append_documents(docs)
+        if self._loader is not None:
+            self._loader.acknowledge_batch()
+
+    def on_layout_ready(self, generation: int, layout: Any) -> None:
+        if generation == self._load_generation:
+            self.canvas.show_layout(layout)
+
+    def on_load_progress(self, generation: int, loaded: int, total: int) -> None:
+        if generation != self._load_generation:
+            return
+        # QProgressBar repaints synchronously, so throttle updates to a few per second
+        if loaded and self._progress_clock.isValid() and self._progress_clock.elapsed() < PROGRESS_INTERVAL_MS:
+            return
+        self._progress_clock.restart()
+        self.load_progress.setRange(0, max(total, 1))
+        self.load_progress.setValue(loaded)
+
+    def on_load_finished(self, generation: int, count: int) -> None:
+        if generation != self._load_generation:
+            return
+        # The loader may still be syncing a snapshot with the server; see on_sync_finished
+        self._loading = False
+        self.load_progress.hide()
+        self.canvas.finish_load()
+        self.nav_panel.finish_load()
+        self.status_bar.showMessage(f"Loaded {count} documents from {self.current_collection}")
+
+    def on_changes_loaded(self, generation: int, changed: List[Dict[str, Any]], removed_ids: List[Any]) -> None:
+        """Apply what changed on the server since the snapshot that is on screen."""
+        if generation != self._load_generation:
+            return
+        removed = [doc.get('full_tag', '') for doc in map(self.hierarchy.get_by_id, removed_ids) if doc]
+        inserted: List[Dict[str, Any]] = []
+        updated: List[Tuple[str, Dict[str, Any]]] = []
+        for doc in changed:
+            current = self.hierarchy.get_by_id(doc.get('_id'))
+            if current is None:
+                inserted.append(doc)
+            else:
+                updated.append((current.get('full_tag', ''), doc))
+        # Not this user's inserts, so the nav tree is not opened to them
+        self.apply_changes(inserted, updated, removed, reveal=False)
+
+    def on_sync_finished(self, generation: int, online: bool) -> None:
+        if generation != self._load_generation:
+            return
+        self._loader = None
+        if online:
+            self.start_watching()
+        self.update_connection_status()
+        if not online:
+            synced = self.snapshot.sync_info(self.current_collection or '')
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(synced[1])) if synced else 'unknown'
+            self.status_bar.showMessage(
+                f"Showing {len(self.hierarchy)} {self.current_collection} documents from the local snapshot of {when}"
+                + (" (read-only)" if self.db_handler.db is None else "; could not sync with the server")
+            )
+
+    def start_watching(self) -> None:
+        """Follow the current collection's server-side changes from the marker its load synced to."""
+        self.stop_watching()
+        collection = self.current_collection
+        if not collection or self.db_handler.db is None:
+            return
+        synced = self.snapshot.sync_info(collection)
+        watcher = ChangeWatcher(
+            self.db_handler, collection, self._load_generation, marker=synced[0] if synced else None,
+            known_ids=[doc.get('_id') for doc in self.hierarchy.documents()], snapshot=self.snapshot, parent=self
+        )
+        watcher.changesReceived.connect(self.on_remote_changes)
+        watcher.modeChanged.connect(self.on_watch_mode)
+        watcher.finished.connect(watcher.deleteLater)
+        self._watcher = watcher
+        self._watch_grants()
+        watcher.start()
+
+    def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        self._sync_mode = ''
+
+    def on_watch_mode(self, generation: int, mode: str) -> None:
+        if generation == self._load_generation and self._watcher is not None:
+            self._sync_mode = mode
+            self.update_connection_status()
+            if mode == STOPPED:
+                # The watcher has ended; a refresh starts a new one
+                self._watcher = None
+                self.status_bar.showMessage(f"Stopped following other editors' changes to {self.current_collection}; refresh to resume.")
+
+    def on_remote_changes(self, generation: int, changed: List[Dict[str, Any]], removed_ids: List[Any]) -> None:
+        """Apply writes other editors made to the collection on screen (coalesced by the ChangeWatcher)."""
+        watcher = self.sender()
+        try:
+            if generation != self._load_generation or self._deferred_collection is not None:
+                return
+            collection = self.current_collection or ''
+            # Documents with writes of ours still on their way already show what those writes leave
+            changed = [doc for doc in changed if not self.write_queue.is_pending(collection, doc.get('_id'), doc.get('full_tag', ''))]
+            removed_ids = [document_id for document_id in removed_ids if not self.write_queue.is_pending(collection, document_id)]
+            for document_id in [doc.get('_id') for doc in changed] + removed_ids:
+                # The next edit dialog fetches the new version
+                self.db_handler.invalidate_cached(collection, document_id)
+            if changed or removed_ids:
+                self.on_changes_loaded(generation, changed, removed_ids)
+        finally:
+            if isinstance(watcher, ChangeWatcher):
+                watcher.acknowledge()
+
+    def on_load_failed(self, generation: int, message: str) -> None:
+        if generation != self._load_generation:
+            return
+        self._loader = None
+        self._loading = False
+        self.load_progress.hide()
+        self.canvas.finish_load()
+        self.nav_panel.finish_load()
+        self.status_bar.showMessage(message)
+
+    def apply_changes(
+        self,
+        inserted: Iterable[Dict[str, Any]] = (),
+        updated: Iterable[Tuple[str, Dict[str, Any]]] = (),
+        removed: Iterable[str] = (),
+        reveal: bool = True,
+    ) -> None:
+        """Apply the documents affected by a write to the hierarchy, canvas and nav panel without reloading.
+
+        Large deltas (more than PATCH_LIMIT documents) update the model and then
+        redraw both views once, which is cheaper than patching per document.
+        The search index is updated here too, from the full documents.
+        reveal opens the nav tree down to inserted documents; changes loaded
+        from the server (other editors' writes) pass False.
+        """
+        inserted, updated, removed = list(inserted), list(updated), list(removed)
+        collection = self.current_collection or ''
+        for full_tag in removed:
+            for doc in self.hierarchy.subtree(full_tag):
+                self._unindex_document(collection, doc.get('_id'))
+        for doc in inserted + [doc for _, doc in updated]:
+            self._index_document(collection, doc)
+        for full_tag in removed:
+            self._track_effective('remove', full_tag)
+        for doc in inserted:
+            self._track_effective('update', doc)
+        for old_tag, doc in updated:
+            self._track_effective('update', doc, old_tag)
+        if self._loading:
+            # The model is still filling up; restart the load so it includes the change
+            self.refresh()
+            return
+        patch = len(inserted) + len(updated) + len(removed) <= PATCH_LIMIT
+        for full_tag in removed:
+            docs = self.hierarchy.remove_subtree(full_tag)
+            if docs and patch:
+                self.canvas.remove_documents(full_tag, [d.get('full_tag', '') for d in docs])
+                self.nav_panel.remove_documents(full_tag)
+        new_docs = [skeleton_of(doc) for doc in inserted]
+        refreshed: List[str] = []
+        for old_tag, doc in updated:
+            doc = skeleton_of(doc)
+            if doc.get('full_tag', '') == old_tag and old_tag in self.hierarchy:
+                self.hierarchy.add(doc)
+                refreshed.append(old_tag)
+                continue
+            # Retagged: move just this document; its descendants keep their own tags
+            if self.hierarchy.remove(old_tag) is not None and patch:
+                self.canvas.remove_documents(old_tag, [old_tag])
+                self.nav_panel.remove_documents(old_tag)
+            new_docs.append(doc)
+        for doc in new_docs:
+            if doc.get('full_tag', '') in self.hierarchy:
+                refreshed.append(doc.get('full_tag', ''))
+        self.hierarchy.add_many(new_docs)
+        if not patch:
+            self.canvas.redraw()
+            self.nav_panel.redraw()
         else:
-            docs = []
-        self.documents = docs
-        self.canvas.update_documents(collection, docs)
-        self.nav_panel.update_panel(collection, docs)
-        self.status_bar.showMessage(f"Loaded {len(docs)} documents from {collection}")
+            if new_docs:
+                self.canvas.insert_documents(new_docs)
+                self.nav_panel.insert_documents(new_docs, reveal)
+            if refreshed:
+                self.canvas.refresh_documents(refreshed)
+                self.nav_panel.refresh_documents(refreshed)
+        self.status_bar.showMessage(f"{len(self.hierarchy)} documents in {self.current_collection}")
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        # Queued writes are flushed and background work (including superseded loads) stopped before the window
+        # goes, for at most CLOSE_WAIT_MS; an unreachable server must not keep it open
+        self._presence_timer.stop()
+        if not self.stop_background_work(CLOSE_WAIT_MS):
+            pending = self.write_queue.pending
+            if pending:
+                answer = QMessageBox.question(
+                    self, "Unsaved Changes",
+                    f"{pending} changes have not reached the server yet and will be lost if you close now.\n\nClose anyway?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No,
+                )
+                if answer != QMessageBox.StandardButton.Yes:
+                    event.ignore()
+                    # Carry on as before: the queue keeps retrying, and loading and live sync start again
+                    self._presence_timer.start()
+                    self.refresh()
+                    return
+                print(f"{pending} changes could not be saved before closing.")
+            # Requests still stuck on the network fail once the client is closed
+            self.db_handler.close()
+            for worker in self.findChildren(QThread):
+                if not worker.wait(CLOSE_ABORT_MS):
+                    # Destroying a running thread aborts the process; one blocked on a socket is left to the exit
+                    worker.setParent(None)
+                    sip.transferto(worker, None)
+        elif self.db_handler.db is not None:
+            leave(self.db_handler.db, self.presence_session)
+        super().closeEvent(event)
 
     def on_document_selected(self, item: QListWidgetItem) -> None:
         doc = item.data(256)  # Qt.UserRole = 256
@@ -135,10 +827,98 @@ class ApplicationWindow(QMainWindow):
 
     def open_settings_dialog(self):
         from .settings_dialog import SettingsDialog
-        dlg = SettingsDialog(self)
+        dlg = SettingsDialog(self.db_handler.manager, self.db_handler.profile, self)
+        if dlg.exec() == SettingsDialog.DialogCode.Accepted and dlg.changed and not self._reconnect_due:
+            self.reconnect_with_new_settings()
+
+    def stop_background_work(self, msecs: int) -> bool:
+        """Cancel the worker threads that use the client and wait up to msecs for them; False if some still run.
+
+        Queued writes are not dropped: the write queue is flushed and waited
+        for instead.
+        """
+        deadline = time.monotonic() + msecs / 1000
+        remaining = lambda: max(0, int((deadline - time.monotonic()) * 1000))
+        self.cancel_loading()
+        for worker in self.findChildren(CollectionLoader) + self.findChildren(ChangeWatcher) \
+                + self.findChildren(SearchIndexWorker) + self.findChildren(EffectiveStatsWorker):
+            worker.cancel()
+        if self._search_worker is not None:
+            self._search_worker = None
+            self._search_journal = []
+        if self._effective_worker is not None:
+            self._effective_worker = None
+            self._effective_journal = []
+        drained = self.write_queue.wait(remaining())
+        move_worker = self._move_worker
+        if move_worker is not None:
+            # Finish the move here: its result patches the views, and the writes it held back go out after it
+            if move_worker.wait(remaining()):
+                self.on_move_finished(move_worker.generation, *move_worker.result)
+                drained = self.write_queue.wait(remaining())
+            else:
+                drained = False
+        for worker in self.findChildren(CollectionLoader) + self.findChildren(ChangeWatcher) + self.findChildren(ConnectWorker) \
+                + self.findChildren(GameplayTagsWorker) + self.findChildren(SearchIndexWorker) \
+                + self.findChildren(EffectiveStatsWorker) + self.findChildren(PresenceWorker):
+            if not worker.wait(remaining()):
+                drained = False
+        return drained
+
+    def reconnect_with_new_settings(self, msecs: int = RECONNECT_DRAIN_MS) -> None:
+        """Close the client and connect again with the saved settings, once nothing is using the old one.
+
+        While a write or other server call is still under way the switch is
+        retried shortly; the old client stays open until then.
+        """
+        self._reconnect_due = not self.stop_background_work(msecs)
+        if self._reconnect_due:
+            self.status_bar.showMessage("Waiting for server requests to finish before applying the new connection settings...")
+            QTimer.singleShot(RECONNECT_RETRY_MS, lambda: self.reconnect_with_new_settings(0))
+            return
+        self.db_handler.close()
+        self.connect_async()
+
+    def open_import_dialog(self):
+        from .import_dialog import ImportDialog
+        if not ensure_writable(self):
+            return
+        dlg = ImportDialog(self.db_handler, self.current_collection or "Race", self)
+        dlg.exec()
+        if dlg.imported:
+            # Imports are too large to patch into the search index either
+            self.rebuild_search_index()
+        if dlg.imported and dlg.collection_combo.currentText() == self.current_collection:
+            # Imports are too large to patch; reconcile the snapshot on screen with the server
+            self.refresh()
+
+    def open_export_dialog(self):
+        from .export_dialog import ExportDialog
+        dlg = ExportDialog(self.db_handler, self.current_collection or "Race", self)
         dlg.exec()
 
+    def export_gameplay_tags(self):
+        from PyQt6.QtWidgets import QFileDialog
+        if self.db_handler.db is None:
+            QMessageBox.information(self, "Export Gameplay Tags", "Not connected to MongoDB.")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Gameplay Tags", "DefaultGameplayTags.ini", "INI Files (*.ini)")
+        if not path:
+            return
+        worker = GameplayTagsWorker(self.db_handler.db, path, self)
+        worker.tagsProgress.connect(lambda collection: self.status_bar.showMessage(f"Collecting gameplay tags from {collection}..."))
+        worker.tagsFinished.connect(lambda summary: self.status_bar.showMessage(
+            f"{summary['tags']} gameplay tags, {summary['changed']} documents changed: "
+            + (f"wrote {path}" if summary['written'] else f"{path} already up to date"), 5000
+        ))
+        worker.tagsFailed.connect(lambda message: QMessageBox.warning(self, "Export Gameplay Tags", message))
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+
     def open_db_test_conn_dialog(self):
         from .dbTestConn_dialog import DBTestConnDialog
         dlg = DBTestConnDialog(self.db_handler, self)
+        if self.db_handler.db is None:
+            # A successful test brings an offline session back online
+            dlg.worker.connectFinished.connect(self.on_connect_finished)
         dlg.exec()
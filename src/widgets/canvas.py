@@ -1,113 +1,185 @@
 """
 Canvas widget for displaying form cards.
 """
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea, QFrame, QListWidgetItem, QTableWidgetItem, QPushButton, QMessageBox, QDialog, QMenu
-from PyQt6.QtCore import Qt, QPoint, QRect
-from typing import Optional, List, Dict, Any
-from .org_chart_box import OrgChartBox
-from .org_chart_lines import OrgChartLines
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QListWidgetItem, QTableWidgetItem, QPushButton, QMessageBox, QDialog
+from typing import Optional, List, Dict, Any, Tuple
+from .org_chart_view import OrgChartView
 from models.pydantic_models import DocumentModel_Base, DocumentModel_Race
 from widgets.new_dialog import NewDialog
 from widgets.update_dialog import UpdateDialog
 from widgets.delete_dialog import DeleteDialog
-from utils.helpers import refresh_app
-from PyQt6.QtGui import QContextMenuEvent
+from utils.helpers import apply_changes, ensure_writable, writer_of
+from db.mongo_handler import CONFLICT, NO_CHANGES, retag
+from db.subtree_mover import MOVE_STARTED
+from utils.org_chart_layout import OrgChartLayout, layout_hierarchy, patch_layout
+from models.hierarchy import HierarchyModel, ExpansionState, VisibleHierarchy, DEFAULT_EXPAND_DEPTH
 
 class Canvas(QWidget):
-    """Canvas widget that displays an org chart for the selected collection."""
+    """Canvas widget that displays an org chart for the selected collection.
+
+    Documents below the expand depth start collapsed and are laid out only
+    once their parent is expanded. Expansion state is kept per collection,
+    so it survives refreshes and switching collections.
+    """
     def __init__(self, parent: Optional[QWidget] = None) -> None:
         super().__init__(parent)
         self._layout = QVBoxLayout(self)
         self.label = QLabel("No collection selected", self)
         self._layout.addWidget(self.label)
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.chart_widget = QWidget()
-        self.scroll_area.setWidget(self.chart_widget)
-        self._layout.addWidget(self.scroll_area)
+        self.view = OrgChartView(self)
+        self.view.boxDoubleClicked.connect(self.on_box_double_clicked)
+        self.view.boxActionRequested.connect(self.on_box_action_requested)
+        self.view.createRequested.connect(self.show_create_dialog)
+        self.view.toggleRequested.connect(self.toggle_expanded)
+        self.view.moveRequested.connect(self.on_move_requested)
+        self._layout.addWidget(self.view)
         self.setLayout(self._layout)
-        self.documents: List[Dict[str, Any]] = []
+        self.hierarchy = HierarchyModel('')
         self.collection: Optional[str] = None
-        self.lines_widget: Optional[OrgChartLines] = None
+        self.expand_depth = DEFAULT_EXPAND_DEPTH
+        self._expansion: Dict[str, ExpansionState] = {}
+        self.visible = VisibleHierarchy(self.hierarchy, ExpansionState(self.expand_depth))
+        # Expansion version the loader's layouts were computed with; later toggles make them stale
+        self._load_version = 0
+        self._loading = False
+
+    def expansion_state(self, collection: str) -> ExpansionState:
+        state = self._expansion.get(collection)
+        if state is None:
+            state = self._expansion[collection] = ExpansionState(self.expand_depth)
+        return state
+
+    def _set_hierarchy(self, collection: str, hierarchy: HierarchyModel) -> None:
+        self.hierarchy = hierarchy
+        self.collection = collection
+        self.visible = VisibleHierarchy(hierarchy, self.expansion_state(collection))
 
     def update_documents(self, collection: str, documents: List[Dict[str, Any]]) -> None:
         self.label.setText(f"Documents in {collection}")
-        self.documents = documents
-        self.collection = collection
+        self._set_hierarchy(collection, HierarchyModel(collection, documents))
         self._draw_org_chart()
 
-    def _draw_org_chart(self):
-        # Remove old chart
-        for child in self.chart_widget.children():
-            child.setParent(None)
-        self.chart_widget.deleteLater()
-        self.chart_widget = QWidget()
-        self.scroll_area.setWidget(self.chart_widget)
-        # Build tree structure from full_tag
-        nodes = {}
-        children_map = {}
-        roots = []
-        for doc in self.documents:
+    def begin_load(self, collection: str, hierarchy: HierarchyModel) -> None:
+        """Clear the chart before documents are streamed into the shared hierarchy model."""
+        self.label.setText(f"Loading {collection}...")
+        self._set_hierarchy(collection, hierarchy)
+        self._load_version = self.visible.state.version
+        self._loading = True
+        self._draw_org_chart()
+
+    def append_documents(self, documents: List[Dict[str, Any]]) -> None:
+        self.label.setText(f"Loading {self.collection}... {len(self.hierarchy)} documents")
+
+    def show_layout(self, layout: OrgChartLayout) -> None:
+        """Display a layout prepared off the GUI thread from batches already in the hierarchy."""
+        if self.visible.state.version == self._load_version:
+            self.view.set_chart(layout, self.visible)
+
+    def finish_load(self) -> None:
+        self.label.setText(f"Documents in {self.collection}")
+        self._loading = False
+        if self.visible.state.version != self._load_version:
+            # Expanded or collapsed while loading: the loader's layouts no longer match
+            self._load_version = self.visible.state.version
+            self._draw_org_chart()
+
+    def insert_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Place documents already added to the hierarchy, relaying out only their ancestors' subtrees.
+
+        Documents under a collapsed node are not laid out; the node's pill is
+        redrawn with the new child count instead.
+        """
+        layout = self.view.chart_layout
+        for doc in documents:
             full_tag = doc.get('full_tag', '')
-            nodes[full_tag] = doc
-            parent_tag = '.'.join(full_tag.split('.')[:-1]) if '.' in full_tag else None
-            if parent_tag and parent_tag in nodes:
-                children_map.setdefault(parent_tag, []).append(full_tag)
-            else:
-                roots.append(full_tag)
-        # --- New layout logic ---
-        from typing import Tuple
-        BOX_SIZE = 120
-        H_SPACING = 40
-        V_SPACING = 60
-        box_widgets: dict[str, OrgChartBox] = {}
-        positions: dict[str, Tuple[int, int]] = {}
-        def calc_subtree_width(tag: str) -> int:
-            children: list[str] = children_map.get(tag, [])
-            if not children:
-                return BOX_SIZE
-            width = 0
-            for child in children:
-                width += calc_subtree_width(child)
-            width += H_SPACING * (len(children) - 1) if len(children) > 1 else 0
-            return max(width, BOX_SIZE)
-        def place_boxes(tag: str, x: int, y: int) -> None:
-            children: list[str] = children_map.get(tag, [])
-            subtree_width = calc_subtree_width(tag)
-            box = OrgChartBox(nodes[tag].get('displayName',''), nodes[tag].get('full_tag',''), nodes[tag].get('description',''), self.chart_widget)
-            box.move(int(x + subtree_width/2 - BOX_SIZE/2), y)
-            box.show()
-            box_widgets[tag] = box
-            positions[tag] = (int(x + subtree_width/2 - BOX_SIZE/2), y)
-            # Connect double-click signal
-            box.boxDoubleClicked.connect(self.on_box_double_clicked)
-            # Connect right-click context menu actions
-            box.boxActionRequested.connect(self.on_box_action_requested)
-            if children:
-                total_width = 0
-                for child in children:
-                    child_width = calc_subtree_width(child)
-                    child_x = x + total_width
-                    place_boxes(child, child_x, y + BOX_SIZE + V_SPACING)
-                    total_width += child_width + H_SPACING
-        # Place all roots
-        x = 40
-        y = 40
-        for root in roots:
-            width = calc_subtree_width(root)
-            place_boxes(root, x, y)
-            x += width + H_SPACING
-        # Set minimum size for chart widget
-        max_x = max((pos[0] for pos in positions.values()), default=0) + BOX_SIZE + 40
-        max_y = max((pos[1] for pos in positions.values()), default=0) + BOX_SIZE + 40
-        self.chart_widget.setMinimumSize(max_x, max_y)
-        # Draw lines (parent to children)
-        if self.lines_widget:
-            self.lines_widget.setParent(None)
-        self.lines_widget = OrgChartLines(box_widgets, children_map, self.chart_widget)
-        self.lines_widget.resize(self.chart_widget.size())
-        self.lines_widget.lower()  # Draw lines below boxes
-        self.lines_widget.show()
+            owner = self.hierarchy.parent(full_tag)
+            if layout is not None and owner is not None and not (owner in layout.positions and self.visible.is_expanded(owner)):
+                self.refresh_documents([owner] if owner in layout.positions else [])
+                continue
+            removed: List[str] = []
+            if layout is not None and not self.visible.is_expanded(full_tag):
+                # Inserted between owner and documents already on the chart, which it now hides
+                for child in self.hierarchy.children(full_tag):
+                    if child in layout.positions:
+                        removed.extend(self._laid_out_subtree(child))
+            self._patch_chart(owner, removed)
+
+    def refresh_documents(self, full_tags: List[str]) -> None:
+        """Redraw boxes whose text changed in the hierarchy (same full_tag, so no relayout)."""
+        self.view.refresh_boxes(full_tags)
+        self.view.sync_visible_items()
+
+    def remove_documents(self, full_tag: str, removed_tags: List[str]) -> None:
+        """Drop documents already removed from the hierarchy; full_tag is the top of what was removed."""
+        self._patch_chart(self.hierarchy.parent(full_tag), removed_tags)
+
+    def _patch_chart(self, owner: Optional[str], removed: Optional[List[str]] = None) -> None:
+        removed = removed or []
+        layout = self.view.chart_layout
+        if layout is None:
+            self._draw_org_chart()
+            return
+        if owner is not None and owner not in layout.positions:
+            return  # below a collapsed node, so nothing on the chart changed
+        moved = patch_layout(layout, self.visible, owner, removed)
+        # owner's pill shows its child count
+        self.view.apply_layout_patch(moved, removed + ([owner] if owner is not None else []))
+
+    def _laid_out_subtree(self, full_tag: str) -> List[str]:
+        """full_tag and everything the current layout places below it."""
+        children_map = self.view.chart_layout.children_map if self.view.chart_layout is not None else {}
+        tags: List[str] = []
+        stack = [full_tag]
+        while stack:
+            tag = stack.pop()
+            tags.append(tag)
+            stack.extend(children_map.get(tag, []))
+        return tags
+
+    def toggle_expanded(self, full_tag: str) -> None:
+        self.set_expanded(full_tag, not self.visible.is_expanded(full_tag))
+
+    def set_expanded(self, full_tag: str, expanded: bool) -> None:
+        """Show or hide the documents below full_tag, relaying out only the affected subtrees."""
+        if full_tag not in self.hierarchy or self.visible.is_expanded(full_tag) == expanded:
+            return
+        layout = self.view.chart_layout
+        if self._loading:
+            # The chart is a snapshot of a partial load and cannot be patched against the full model
+            self.visible.set_expanded(full_tag, expanded)
+            self._draw_org_chart()
+            return
+        if layout is None or full_tag not in layout.positions:
+            self.visible.set_expanded(full_tag, expanded)
+            return
+        removed = [] if expanded else self._laid_out_subtree(full_tag)[1:]
+        self.visible.set_expanded(full_tag, expanded)
+        moved = patch_layout(layout, self.visible, full_tag, removed)
+        self.view.apply_layout_patch(moved, removed + [full_tag])
+
+    def reveal(self, path: str) -> None:
+        """Expand the chart down to path (or, for a path without a document, the first document below it) and scroll to it."""
+        full_tag = path if path in self.hierarchy else next(iter(self.hierarchy.children(path)), None)
+        if full_tag is None:
+            return
+        for ancestor in self.hierarchy.ancestors(full_tag):
+            self.set_expanded(ancestor, True)
+        self.view.focus_box(full_tag)
+
+    def set_expand_depth(self, depth: Optional[int]) -> None:
+        """Collapse every collection below depth (None expands everything), dropping per-node toggles."""
+        self.expand_depth = depth
+        for state in self._expansion.values():
+            state.reset(depth)
+        self._draw_org_chart()
+
+    def redraw(self) -> None:
+        """Lay out the whole hierarchy again (used when a delta is too large to patch)."""
+        self._draw_org_chart()
+
+    def _draw_org_chart(self):
+        # Compute the layout in one pass, then hand it to the scene
+        self.view.set_chart(layout_hierarchy(self.visible), self.visible)
 
     def on_item_double_clicked(self, item: QListWidgetItem) -> None:
         doc = item.data(256)
@@ -184,18 +256,16 @@ class Canvas(QWidget):
                 while parent_app and not hasattr(parent_app, 'db_handler'):
                     parent_app = parent_app.parent()
                 if parent_app and hasattr(parent_app, 'db_handler'):
-                    db_handler = parent_app.db_handler # type: ignore
-                    # Find and update the document in the database
-                    result, msg = db_handler.update_document(collection, doc.get('_id'), doc_obj.model_dump()) # type: ignore
-                    if result:
+                    # Find and update the document in the database (queued when the window has a write queue)
+                    result, msg, updated = self.save_edit(parent_app, collection, doc, doc_obj.model_dump())
+                    if result and msg in (NO_CHANGES, MOVE_STARTED):
+                        QMessageBox.information(self, "No Changes" if msg == NO_CHANGES else "Moving", msg)
+                        dialog.accept()
+                    elif result:
                         QMessageBox.information(self, "Success", f"{collection} updated successfully.")
                         dialog.accept()
-                        # Call refresh after update
-                        refresh_parent = self.parent()
-                        while refresh_parent and not hasattr(refresh_parent, 'refresh'):
-                            refresh_parent = refresh_parent.parent()
-                        if refresh_parent and hasattr(refresh_parent, 'refresh'):
-                            refresh_parent.refresh()
+                        # Patch the views with the updated document instead of reloading
+                        apply_changes(parent_app, updated=[(doc.get('full_tag', ''), updated)])
                     else:
                         QMessageBox.warning(self, "Database Error", str(msg)) # type: ignore
                 else:
@@ -214,35 +284,132 @@ class Canvas(QWidget):
         dialog.exec()
 
     def on_box_double_clicked(self, full_tag: str) -> None:
-        # Find the document by full_tag
-        doc = next((d for d in self.documents if d.get('full_tag') == full_tag), None)
-        if not doc:
+        doc = self.hierarchy.get(full_tag)
+        if not doc or not ensure_writable(self):
             return
         collection = doc.get('full_tag', '').split('.')[0]
         if collection == "Race":
             model_cls = DocumentModel_Race
         else:
             model_cls = DocumentModel_Base
+        parent_app = self.parent()
+        while parent_app and not hasattr(parent_app, 'db_handler'):
+            parent_app = parent_app.parent()
+        writer = writer_of(parent_app) if parent_app else None
+        # The chart only holds the display projection; fetch the full document for editing
+        # (as queued writes leave it, if any are still on their way)
+        if writer is not None:
+            full_doc = writer.get_document(collection, doc.get('_id'))
+            if full_doc is None:
+                QMessageBox.warning(self, "Database Error", f"Could not load {full_tag} for editing.")
+                return
+            doc = full_doc
+        self.edit_document(parent_app, collection, model_cls, doc)
+
+    def resolve_conflict(self, collection: str, base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any]) -> None:
+        """Reopen an edit that lost to another editor's save, with the merge view over the document as they saved it."""
+        parent_app = self.parent()
+        while parent_app and not hasattr(parent_app, 'db_handler'):
+            parent_app = parent_app.parent()
+        if parent_app is None:
+            return
+        model_cls = DocumentModel_Race if collection == "Race" else DocumentModel_Base
+        self.edit_document(parent_app, collection, model_cls, dict(theirs), conflict=(base, mine, theirs))
+
+    def edit_document(self, parent_app: Any, collection: str, model_cls: Any, doc: Dict[str, Any],
+                      conflict: Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]] = None) -> None:
+        full_tag = doc.get('full_tag', '')
+        writer = writer_of(parent_app) if parent_app else None
         def on_update(updated_data):
-            parent_app = self.parent()
-            while parent_app and not hasattr(parent_app, 'db_handler'):
-                parent_app = parent_app.parent()
-            if parent_app and hasattr(parent_app, 'db_handler'):
-                db_handler = parent_app.db_handler # type: ignore
-                result, msg = db_handler.update_document(collection, doc.get('_id'), updated_data) # type: ignore
-                return result
-            return False
-        dialog = UpdateDialog(collection, model_cls, document=doc, on_update=on_update, parent=self)
-        dialog.exec()
+            if writer is not None:
+                # Diffed against the document the dialog was opened with (or merged onto, after a conflict)
+                return self.save_edit(parent_app, collection, doc, updated_data)
+            return False, "Database handler not found.", None
+        # What the document inherits; the engine is built on first use, and the dialog shows it once it is ready
+        effective_stats = getattr(parent_app, 'effective_stats', None)
+        inherited = effective_stats.inherited(full_tag) if effective_stats is not None else None
+        if effective_stats is None and hasattr(parent_app, 'ensure_effective_stats'):
+            parent_app.ensure_effective_stats()
+        # Other editors are told this document is open here while the dialog is up
+        also_editing = parent_app.editors_of(collection, full_tag) if hasattr(parent_app, 'editors_of') else []
+        dialog = UpdateDialog(collection, model_cls, document=doc, on_update=on_update, parent=self, inherited=inherited,
+                              conflict=conflict, also_editing=also_editing)
+        def on_effective_changed(changed: str) -> None:
+            engine = getattr(parent_app, 'effective_stats', None)
+            if dialog.inherited is None and engine is not None and engine.collection == collection == changed:
+                dialog.set_inherited(engine.inherited(full_tag))
+        if hasattr(parent_app, 'effectiveStatsChanged'):
+            parent_app.effectiveStatsChanged.connect(on_effective_changed)
+        if hasattr(parent_app, 'set_editing'):
+            parent_app.set_editing(collection, full_tag)
+        try:
+            dialog.exec()
+        finally:
+            if hasattr(parent_app, 'effectiveStatsChanged'):
+                parent_app.effectiveStatsChanged.disconnect(on_effective_changed)
+            if hasattr(parent_app, 'set_editing'):
+                parent_app.set_editing(collection, None)
+
+    def save_edit(self, parent_app: Any, collection: str, doc: Dict[str, Any], data: Dict[str, Any]) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Save an edited document; a changed full_tag first moves the document's whole subtree there.
+
+        The move runs in the background, so MOVE_STARTED is returned at once;
+        the rest of the edit is saved against the moved document (updated in
+        place) and patched into the views when the move is done.
+        """
+        old_tag = doc.get('full_tag', '')
+        new_tag = data.get('full_tag') or old_tag
+        if new_tag == old_tag:
+            return writer_of(parent_app).update_document(collection, doc.get('_id'), data, original=doc) # type: ignore
+        def moved(success: bool, message: str, rewritten: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+            if not success:
+                QMessageBox.warning(self, "Move Failed", message)
+                return
+            doc.update(next((d for name, _, d in rewritten if name == collection and d.get('_id') == doc.get('_id')), {}))
+            # References in the form to the moved tags follow them, as they did in the database
+            rest = {**data, 'grantedTags': [retag(t, old_tag, new_tag) for t in data.get('grantedTags', doc.get('grantedTags', []))]}
+            ok, msg, updated = writer_of(parent_app).update_document(collection, doc.get('_id'), rest, original=doc) # type: ignore
+            if ok and msg != NO_CHANGES:
+                apply_changes(parent_app, updated=[(doc.get('full_tag', ''), updated)])
+            elif not ok and msg == CONFLICT and isinstance(updated, dict):
+                self.resolve_conflict(collection, dict(doc), {**doc, **rest}, updated)
+            elif not ok:
+                QMessageBox.warning(self, "Update Failed", str(msg))
+        if not parent_app.move_subtree(collection, old_tag, new_tag, on_done=moved):
+            return False, "Another move is still being saved; try again once it is done.", None
+        return True, MOVE_STARTED, None
+
+    def on_move_requested(self, full_tag: str, new_parent: str) -> None:
+        """Re-parent a document (dragged onto another box on the chart) together with its descendants."""
+        if not self.collection or not ensure_writable(self):
+            return
+        parent_app = self.parent()
+        while parent_app and not hasattr(parent_app, 'move_subtree'):
+            parent_app = parent_app.parent()
+        if parent_app is None:
+            return
+        new_tag = f"{new_parent}.{full_tag.rpartition('.')[2]}"
+        count = len(self.hierarchy.subtree(full_tag))
+        below = f" and the {count - 1} documents below it" if count > 1 else ""
+        answer = QMessageBox.question(self, "Move", f"Move {full_tag}{below} to {new_tag}?\n\nGranted tags referring to them are updated in every collection.")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        def moved(success: bool, message: str, rewritten: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+            if not success:
+                QMessageBox.warning(self, "Move Failed", message)
+        if not parent_app.move_subtree(self.collection, full_tag, new_tag, on_done=moved):
+            QMessageBox.information(self, "Move", "Another move is still being saved; try again once it is done.")
 
     def on_box_action_requested(self, full_tag: str, action: str) -> None:
-        doc = next((d for d in self.documents if d.get('full_tag') == full_tag), None)
+        doc = self.hierarchy.get(full_tag)
         if not doc:
             return
         collection = doc.get('full_tag', '').split('.')[0]
         if action == 'edit':
             self.on_box_double_clicked(full_tag)
         elif action == 'create_child':
+            if not ensure_writable(self):
+                return
             # Pre-fill tag for child: remove collection and period, add period if needed
             tag_path = doc.get('full_tag', '')
             if tag_path.startswith(collection + "."):
@@ -258,83 +425,35 @@ class Canvas(QWidget):
             dialog.tag_edit.setText(tag_path)
             dialog.full_tag_edit.setText(f"{collection}.{tag_path}")
             dialog.setWindowTitle(f"Create Child for {doc.get('displayName', doc.get('tag', 'Document'))}")
-            if dialog.exec() == QDialog.DialogCode.Accepted:
-                # Refresh after creation
-                parent_app = self.parent()
-                while parent_app and not hasattr(parent_app, 'refresh'):
-                    parent_app = parent_app.parent()
-                if parent_app and hasattr(parent_app, 'refresh'):
-                    parent_app.refresh()
+            # NewDialog patches the views with the inserted document itself
+            dialog.exec()
         elif action == 'delete':
-            doc = next((d for d in self.documents if d.get('full_tag') == full_tag), None)
-            if not doc:
+            if not ensure_writable(self):
                 return
-            # Gather all descendants (including self)
-            to_delete = []
-            def gather_descendants(tag):
-                d = next((d for d in self.documents if d.get('full_tag') == tag), None)
-                if d:
-                    to_delete.append(d)
-                for child_tag in [d2.get('full_tag') for d2 in self.documents if d2.get('full_tag','').startswith(tag + '.')]:
-                    gather_descendants(child_tag)
-            gather_descendants(full_tag)
-            # Remove duplicates
-            to_delete = list({d['full_tag']: d for d in to_delete}.values())
+            # The document and all of its descendants, parents first
+            to_delete = self.hierarchy.subtree(full_tag)
             def on_delete():
                 parent_app = self.parent()
                 while parent_app and not hasattr(parent_app, 'db_handler'):
                     parent_app = parent_app.parent()
+                queue = getattr(parent_app, 'write_queue', None)
+                if queue is not None:
+                    # Queued; to_delete is what the views get back if the server refuses
+                    return queue.delete_subtree(self.collection, full_tag, documents=to_delete)
                 if parent_app and hasattr(parent_app, 'db_handler'):
-                    db_handler = parent_app.db_handler # type: ignore
-                    for d in to_delete:
-                        db_handler.delete_document(self.collection, d.get('_id')) # type: ignore
+                    # One delete_many for the whole subtree instead of a round trip per document
+                    return parent_app.db_handler.delete_subtree(self.collection, full_tag) # type: ignore
+                return False, "Not connected to MongoDB.", 0
             dialog = DeleteDialog(self, on_delete=on_delete, documents=to_delete)
             dialog.exec()
 
-    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
-        # Check if click is on a box
-        pos = event.pos()
-        for child in self.chart_widget.children():
-            if isinstance(child, OrgChartBox):
-                if child.geometry().contains(self.chart_widget.mapFromParent(pos)):
-                    # Let the box handle its own context menu
-                    return
-        # Not on a box: show Create New menu
-        menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background: #fff;
-                color: #111;
-                border: 1px solid #888;
-                border-radius: 6px;
-                padding: 4px;
-                box-shadow: 0px 4px 16px rgba(0,0,0,0.18);
-            }
-            QMenu::item {
-                background: transparent;
-                color: #111;
-                padding: 6px 24px 6px 24px;
-            }
-            QMenu::item:selected {
-                background: #e0e6f8;
-                color: #111;
-            }
-        """)
-        create_action = menu.addAction("Create New")
-        action = menu.exec(event.globalPos())
-        if action == create_action and self.collection:
-            # Open CreateNewDialog for the current collection
-            if self.collection == "Race":
-                model_cls = DocumentModel_Race
-            else:
-                model_cls = DocumentModel_Base
-            dialog = NewDialog(self.collection, model_cls, self)
-            dialog.created.connect(self._handle_created)
-            dialog.exec()
-
-    def _handle_created(self):
-        parent_app = self.parent()
-        while parent_app and not hasattr(parent_app, 'refresh'):
-            parent_app = parent_app.parent()
-        if parent_app and hasattr(parent_app, 'refresh'):
-            parent_app.refresh()
+    def show_create_dialog(self) -> None:
+        """Open the create dialog for the current collection (context menu on empty space)."""
+        if not self.collection or not ensure_writable(self):
+            return
+        if self.collection == "Race":
+            model_cls = DocumentModel_Race
+        else:
+            model_cls = DocumentModel_Base
+        dialog = NewDialog(self.collection, model_cls, self)
+        dialog.exec()
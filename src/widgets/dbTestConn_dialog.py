@@ -3,41 +3,28 @@ Dialog for testing and displaying MongoDB connection info.
 """
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout
 from PyQt6.QtCore import Qt
-import time
+from db.connection_manager import ConnectWorker
 
 class DBTestConnDialog(QDialog):
     def __init__(self, db_handler, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Database Connection Info")
+        self.db_handler = db_handler
         layout = QVBoxLayout(self)
-        start = time.time()
-        connected = db_handler.connect()
-        ping_ms = None
-        if connected:
-            try:
-                ping_start = time.time()
-                db_handler.client.admin.command('ping')
-                ping_ms = int((time.time() - ping_start) * 1000)
-            except Exception:
-                ping_ms = None
         uri = db_handler.uri
         if '@' in uri:
             uri = uri.split('@', 1)[-1]
             if '://' in uri:
                 uri = uri.split('://', 1)[-1]
             uri = 'mongodb://' + uri
-        msg = f"<b>Database URI:</b> {uri}<br>"
-        msg += f"<b>Database Name:</b> {db_handler.db_name}<br>"
-        if connected:
-            msg += f"<b>Status:</b> <span style='color:green;'>Connected</span><br>"
-            if ping_ms is not None:
-                msg += f"<b>Ping:</b> {ping_ms} ms"
-        else:
-            msg += f"<b>Status:</b> <span style='color:red;'>Disconnected</span>"
-        label = QLabel()
-        label.setTextFormat(Qt.TextFormat.RichText)
-        label.setText(msg)
-        layout.addWidget(label)
+        self._header = f"<b>Database URI:</b> {uri}<br>"
+        self._header += f"<b>Database Name:</b> {db_handler.db_name}<br>"
+        settings = db_handler.manager.settings(db_handler.profile.name)
+        self._header += f"<b>Pool:</b> {settings.min_pool_size}-{settings.max_pool_size} connections, read preference {settings.read_preference}<br>"
+        self.label = QLabel()
+        self.label.setTextFormat(Qt.TextFormat.RichText)
+        self.label.setText(self._header + "<b>Status:</b> Pinging...")
+        layout.addWidget(self.label)
         btn_box = QHBoxLayout()
         btn_ok = QPushButton("OK", self)
         btn_ok.setMinimumWidth(100)
@@ -47,9 +34,30 @@ class DBTestConnDialog(QDialog):
         btn_box.addStretch(1)
         layout.addLayout(btn_box)
         self.setLayout(layout)
+        # Ping the existing pool off the GUI thread; the dialog stays responsive while the server is down.
+        # The worker belongs to the main window so closing the dialog early does not wait on it.
+        self.worker = ConnectWorker(db_handler, parent if parent is not None else self)
+        self.worker.connectFinished.connect(self.on_ping_finished)
+        self.worker.start()
+
+    def on_ping_finished(self, connected: bool, ping_ms) -> None:
+        msg = self._header
+        if connected:
+            msg += f"<b>Status:</b> <span style='color:green;'>Connected</span><br>"
+            if ping_ms is not None:
+                msg += f"<b>Ping:</b> {ping_ms} ms"
+        else:
+            msg += f"<b>Status:</b> <span style='color:red;'>Disconnected</span>"
+        self.label.setText(msg)
         # Optionally, show a status message in the parent status bar
+        parent = self.parent()
         if hasattr(parent, 'status_bar'):
             if connected:
                 parent.status_bar.showMessage("Successfully connected to MongoDB.", 3000)
             else:
                 parent.status_bar.showMessage("Failed to connect to MongoDB.", 3000)
+
+    def done(self, result: int) -> None:
+        if self.worker.parent() is self:
+            self.worker.wait()
+        super().done(result)
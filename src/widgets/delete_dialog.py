@@ -3,7 +3,7 @@ Dialog for confirming deletion of a document in the active collection.
 """
 from typing import Callable, Optional, Any
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QWidget, QMessageBox
-from utils.helpers import refresh_app
+from utils.helpers import apply_changes, refresh_app
 
 class DeleteDialog(QDialog):
     def __init__(
@@ -46,26 +46,36 @@ class DeleteDialog(QDialog):
         no_button.clicked.connect(self.reject)
 
     def confirm_delete(self):
+        result = None
         if callable(self.on_delete):
-            self.on_delete()  # No arguments, for compatibility
+            result = self.on_delete()  # No arguments, for compatibility
+        # on_delete may report (success, message, deleted count); older callbacks return nothing
+        if isinstance(result, tuple) and len(result) >= 2 and not result[0]:
+            QMessageBox.warning(self, "Delete Failed", result[1])
+            return
+        deleted = result[2] if isinstance(result, tuple) and len(result) >= 3 else len(self.documents)
         parent = self.parent()
         while parent and not hasattr(parent, 'db_handler'):
             parent = parent.parent()
         if parent:
-            refresh_app(parent)
+            if isinstance(result, tuple):
+                # Documents are listed parents first; removing each drops its subtree
+                apply_changes(parent, removed=[d.get('full_tag', '') for d in self.documents if d])
+            else:
+                refresh_app(parent)
         # Show informational dialog after deletion
         info_box = QMessageBox(self)
         info_box.setIcon(QMessageBox.Icon.Information)
         info_box.setWindowTitle("Deleted")
-        if len(self.documents) == 1:
+        if deleted == 1 and len(self.documents) == 1:
             name = self.documents[0].get('displayName', self.documents[0].get('full_tag', ''))
             info_box.setText(f"Deleted 1 document: {name}")
         else:
             names = [d.get('displayName', d.get('full_tag', '')) for d in self.documents if d]
             if names:
-                info_box.setText(f"Deleted {len(self.documents)} documents:\n\n" + '\n'.join(names))
+                info_box.setText(f"Deleted {deleted} documents:\n\n" + '\n'.join(names))
             else:
-                info_box.setText(f"Deleted {len(self.documents)} documents.\n")
+                info_box.setText(f"Deleted {deleted} documents.\n")
         info_box.setStandardButtons(QMessageBox.StandardButton.Ok)
         info_box.buttonClicked.connect(self.accept)
         info_box.exec()
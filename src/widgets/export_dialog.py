@@ -0,0 +1,124 @@
+"""
+Dialog for exporting a collection as an Unreal Engine DataTable (CSV or JSON).
+"""
+import os
+from PyQt6.QtWidgets import (
+    QDialog, QFormLayout, QHBoxLayout, QVBoxLayout, QLineEdit, QPushButton, QComboBox, QSpinBox,
+    QProgressBar, QLabel, QFileDialog, QWidget, QCheckBox
+)
+from forms.form_data import COLLECTION_TYPES
+from db.datatable_exporter import ExportWorker, EXPORT_FORMATS, DEFAULT_BATCH_SIZE
+
+class ExportDialog(QDialog):
+    """Picks a collection, format and output file, then streams the export on a worker thread."""
+    def __init__(self, db_handler, collection: str = "Race", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export DataTable")
+        self.resize(500, 250)
+        self.db_handler = db_handler
+        self.worker = None
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.collection_combo = QComboBox(self)
+        self.collection_combo.addItems(COLLECTION_TYPES)
+        self.collection_combo.setCurrentText(collection)
+        form.addRow("Collection", self.collection_combo)
+        self.format_combo = QComboBox(self)
+        self.format_combo.addItems([fmt.upper() for fmt in EXPORT_FORMATS])
+        form.addRow("Format", self.format_combo)
+        file_layout = QHBoxLayout()
+        self.path_edit = QLineEdit(self)
+        browse_btn = QPushButton("...", self)
+        browse_btn.clicked.connect(self.browse)
+        file_layout.addWidget(self.path_edit)
+        file_layout.addWidget(browse_btn)
+        file_widget = QWidget(self)
+        file_widget.setLayout(file_layout)
+        form.addRow("File", file_widget)
+        self.batch_size_edit = QSpinBox(self)
+        self.batch_size_edit.setRange(1, 100000)
+        self.batch_size_edit.setValue(DEFAULT_BATCH_SIZE)
+        form.addRow("Cursor Batch Size", self.batch_size_edit)
+        self.effective_check = QCheckBox("Export effective grants (including those inherited from parents)", self)
+        form.addRow("", self.effective_check)
+        layout.addLayout(form)
+        self.progress = QProgressBar(self)
+        self.progress.setFormat("%v / %m")
+        layout.addWidget(self.progress)
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch(1)
+        self.start_btn = QPushButton("Export", self)
+        self.start_btn.setMinimumWidth(100)
+        self.start_btn.clicked.connect(self.start_export)
+        self.close_btn = QPushButton("Close", self)
+        self.close_btn.setMinimumWidth(100)
+        self.close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.start_btn)
+        btn_layout.addSpacing(20)
+        btn_layout.addWidget(self.close_btn)
+        btn_layout.addStretch(1)
+        layout.addLayout(btn_layout)
+
+    def browse(self) -> None:
+        fmt = self.format_combo.currentText().lower()
+        default = os.path.join(os.getcwd(), f"DT_{self.collection_combo.currentText()}.{fmt}")
+        path, _ = QFileDialog.getSaveFileName(self, "Export DataTable", default, f"{fmt.upper()} Files (*.{fmt})")
+        if path:
+            self.path_edit.setText(path)
+
+    def start_export(self) -> None:
+        path = self.path_edit.text().strip()
+        if not path:
+            self.status_label.setText("Choose a file to export to.")
+            return
+        if self.db_handler.db is None:
+            self.status_label.setText("Not connected to MongoDB.")
+            return
+        self.progress.setRange(0, 0)
+        self.status_label.setText("Exporting...")
+        self.start_btn.setEnabled(False)
+        self.close_btn.setText("Cancel")
+        self.worker = ExportWorker(
+            self.db_handler.db, self.collection_combo.currentText(), path,
+            self.format_combo.currentText().lower(), self.batch_size_edit.value(),
+            effective=self.effective_check.isChecked(), parent=self
+        )
+        self.worker.exportProgress.connect(self.on_progress)
+        self.worker.exportFinished.connect(self.on_finished)
+        self.worker.exportFailed.connect(self.on_failed)
+        self.worker.start()
+
+    def on_progress(self, written: int, total: int) -> None:
+        # The total is the collection's estimated count and can lag behind concurrent inserts
+        self.progress.setRange(0, max(total, written))
+        self.progress.setValue(written)
+
+    def on_finished(self, count: int) -> None:
+        self.status_label.setText(f"Exported {count} rows to {self.path_edit.text().strip()}")
+        self._finish()
+
+    def on_failed(self, message: str) -> None:
+        self.progress.setRange(0, 1)
+        self.progress.setValue(0)
+        self.status_label.setText(f"Export failed: {message}")
+        self._finish()
+
+    def _finish(self) -> None:
+        self.worker = None
+        self.start_btn.setEnabled(True)
+        self.close_btn.setText("Close")
+
+    def reject(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            self.status_label.setText("Cancelling...")
+            return
+        super().reject()
+
+    def done(self, result: int) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().done(result)
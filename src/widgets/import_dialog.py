@@ -0,0 +1,151 @@
+"""
+Dialog for bulk importing JSON Lines, BSON or CSV files into a collection.
+"""
+import os
+from PyQt6.QtWidgets import (
+    QDialog, QFormLayout, QHBoxLayout, QVBoxLayout, QLineEdit, QPushButton, QComboBox, QSpinBox, QCheckBox,
+    QProgressBar, QPlainTextEdit, QLabel, QFileDialog, QWidget
+)
+from forms.form_data import COLLECTION_TYPES
+from db.bulk_importer import ImportWorker, ImportReport, DEFAULT_BATCH_SIZE
+
+class ImportDialog(QDialog):
+    """Picks a file and target collection, then streams the import on a worker thread.
+
+    Row errors are listed as they are reported; the import carries on past them.
+    imported is True once any document was written, so the caller can reload.
+    """
+    def __init__(self, db_handler, collection: str = "Race", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Import Documents")
+        self.resize(600, 500)
+        self.db_handler = db_handler
+        self.worker = None
+        self.imported = False
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        file_layout = QHBoxLayout()
+        self.path_edit = QLineEdit(self)
+        browse_btn = QPushButton("...", self)
+        browse_btn.clicked.connect(self.browse)
+        file_layout.addWidget(self.path_edit)
+        file_layout.addWidget(browse_btn)
+        file_widget = QWidget(self)
+        file_widget.setLayout(file_layout)
+        form.addRow("File", file_widget)
+        self.collection_combo = QComboBox(self)
+        self.collection_combo.addItems(COLLECTION_TYPES)
+        self.collection_combo.setCurrentText(collection)
+        form.addRow("Collection", self.collection_combo)
+        self.batch_size_edit = QSpinBox(self)
+        self.batch_size_edit.setRange(1, 100000)
+        self.batch_size_edit.setValue(DEFAULT_BATCH_SIZE)
+        form.addRow("Batch Size", self.batch_size_edit)
+        self.upsert_check = QCheckBox("Update documents with the same full tag", self)
+        form.addRow("Upsert", self.upsert_check)
+        layout.addLayout(form)
+        self.progress = QProgressBar(self)
+        self.progress.setFormat("%p%")
+        layout.addWidget(self.progress)
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+        self.errors_edit = QPlainTextEdit(self)
+        self.errors_edit.setReadOnly(True)
+        self.errors_edit.setPlaceholderText("Rows that fail validation or insertion, or are skipped, are listed here.")
+        layout.addWidget(self.errors_edit)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch(1)
+        self.start_btn = QPushButton("Import", self)
+        self.start_btn.setMinimumWidth(100)
+        self.start_btn.clicked.connect(self.start_import)
+        self.close_btn = QPushButton("Close", self)
+        self.close_btn.setMinimumWidth(100)
+        self.close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.start_btn)
+        btn_layout.addSpacing(20)
+        btn_layout.addWidget(self.close_btn)
+        btn_layout.addStretch(1)
+        layout.addLayout(btn_layout)
+        self._shown_errors = 0
+        self._shown_warnings = 0
+
+    def browse(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Select Import File", os.getcwd(), "Import Files (*.jsonl *.ndjson *.bson *.csv);;All Files (*)"
+        )
+        if path:
+            self.path_edit.setText(path)
+
+    def start_import(self) -> None:
+        path = self.path_edit.text().strip()
+        if not path or not os.path.isfile(path):
+            self.status_label.setText("Select a file to import.")
+            return
+        if self.db_handler.db is None:
+            self.status_label.setText("Not connected to MongoDB.")
+            return
+        self.errors_edit.clear()
+        self._shown_errors = 0
+        self._shown_warnings = 0
+        self.progress.setRange(0, 1000)
+        self.progress.setValue(0)
+        self.status_label.setText("Importing...")
+        self.start_btn.setEnabled(False)
+        self.close_btn.setText("Cancel")
+        self.worker = ImportWorker(
+            self.db_handler.db, self.collection_combo.currentText(), path,
+            batch_size=self.batch_size_edit.value(), upsert=self.upsert_check.isChecked(), parent=self
+        )
+        self.worker.importProgress.connect(self.on_progress)
+        self.worker.importFinished.connect(self.on_finished)
+        self.worker.importFailed.connect(self.on_failed)
+        self.worker.start()
+
+    def on_progress(self, report: ImportReport, done: int, total: int) -> None:
+        self.progress.setValue(int(1000 * done / total) if total else 1000)
+        self.status_label.setText(report.summary())
+        self._show_errors(report)
+        if report.inserted or report.updated:
+            self.imported = True
+
+    def on_finished(self, report: ImportReport) -> None:
+        self.progress.setValue(self.progress.maximum())
+        self.status_label.setText(report.summary())
+        self._show_errors(report)
+        if report.failed > len(report.errors):
+            self.errors_edit.appendPlainText(f"... {report.failed - len(report.errors)} more errors not shown")
+        self.imported = self.imported or bool(report.inserted or report.updated)
+        self._finish()
+
+    def on_failed(self, message: str) -> None:
+        self.status_label.setText(f"Import failed: {message}")
+        self._finish()
+
+    def _show_errors(self, report: ImportReport) -> None:
+        for error in report.errors[self._shown_errors:]:
+            tag = f" ({error.full_tag})" if error.full_tag else ""
+            self.errors_edit.appendPlainText(f"Row {error.row}{tag}: {error.message}")
+        self._shown_errors = len(report.errors)
+        for warning in report.warnings[self._shown_warnings:]:
+            tag = f" ({warning.full_tag})" if warning.full_tag else ""
+            self.errors_edit.appendPlainText(f"Row {warning.row}{tag} skipped: {warning.message}")
+        self._shown_warnings = len(report.warnings)
+
+    def _finish(self) -> None:
+        self.worker = None
+        self.start_btn.setEnabled(True)
+        self.close_btn.setText("Close")
+
+    def reject(self) -> None:
+        if self.worker is not None:
+            # First press cancels after the current batch; the dialog closes once the worker stops
+            self.worker.cancel()
+            self.status_label.setText("Cancelling...")
+            return
+        super().reject()
+
+    def done(self, result: int) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().done(result)
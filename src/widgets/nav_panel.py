@@ -1,29 +1,94 @@
 """
 Navigation panel widget for the left side of the application.
 """
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem, QDialog
-from PyQt6.QtCore import Qt
-from typing import Optional, Any
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QTreeView, QDialog
+from PyQt6.QtCore import Qt, QModelIndex, QTimer, pyqtSignal
+from typing import Optional, Any, Dict, List
 from widgets.new_dialog import NewDialog
+from widgets.nav_tree_model import HierarchyTreeModel, HierarchyFilterProxy, CREATE_NEW
+from models.hierarchy import HierarchyModel, ExpansionState, DEFAULT_EXPAND_DEPTH
+from utils.helpers import ensure_writable
+
+# Quiet time after the last keystroke before the filter runs
+FILTER_DELAY_MS = 200
+# Search results whose path is opened automatically; the rest are reached by expanding
+MAX_EXPANDED_MATCHES = 200
 
 class NavPanel(QWidget):
-    """Navigation panel for displaying tag hierarchy and create item."""
+    """Navigation panel for displaying tag hierarchy and create item.
+
+    The tree is a lazy model over the shared hierarchy: rows below a path are
+    built when it is first expanded. Paths below the expand depth start
+    collapsed, and what the user expands or collapses is remembered per
+    collection across reloads. The search box filters the tree through a
+    proxy that keeps the ancestors of every match visible.
+    """
+    pathSelected = pyqtSignal(str)  # tag path of the current row
+
     def __init__(self, parent: Optional[QWidget] = None) -> None:
         super().__init__(parent)
         self._layout = QVBoxLayout(self)
         self.label = QLabel(self)
         self._layout.addWidget(self.label)
-        self.tree = QTreeWidget(self)
+        self.search = QLineEdit(self)
+        self.search.setPlaceholderText("Filter by name, tag or description")
+        self.search.setClearButtonEnabled(True)
+        self._layout.addWidget(self.search)
+        self.model = HierarchyTreeModel(self)
+        self.proxy = HierarchyFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.tree = QTreeView(self)
+        self.tree.setModel(self.proxy)
         self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
         self._layout.addWidget(self.tree)
         self.setLayout(self._layout)
         self.active_collection = None
-        self.tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.hierarchy = HierarchyModel('')
+        self.expand_depth = DEFAULT_EXPAND_DEPTH
+        self._expansion: Dict[str, ExpansionState] = {}
+        self._pending_selection: Optional[str] = None
+        self._loading = False
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self.apply_filter)
+        self.search.textChanged.connect(lambda text: self._filter_timer.start())
+        self.tree.doubleClicked.connect(self.on_item_double_clicked)
+        self.tree.expanded.connect(lambda index: self._record_expanded(index, True))
+        self.tree.collapsed.connect(lambda index: self._record_expanded(index, False))
+        self.tree.selectionModel().currentChanged.connect(self.on_current_changed)
+
+    def expansion_state(self, collection: str) -> ExpansionState:
+        state = self._expansion.get(collection)
+        if state is None:
+            state = self._expansion[collection] = ExpansionState(self.expand_depth)
+        return state
+
+    def _path(self, index: QModelIndex) -> str:
+        """Tag path of a tree (proxy) index."""
+        return self.model.path(self.proxy.mapToSource(index))
 
-    def on_item_double_clicked(self, item: QTreeWidgetItem, column: int) -> None:
-        if item.data(0, Qt.ItemDataRole.UserRole) == "create_new":
+    def _tree_index(self, path: str) -> QModelIndex:
+        """Tree (proxy) index of a tag path, fetching its ancestors' rows; invalid when filtered out."""
+        return self.proxy.mapFromSource(self.model.index_for(path))
+
+    def _record_expanded(self, index: QModelIndex, expanded: bool) -> None:
+        # Paths opened to show search results are not the user's own choice
+        if self.active_collection is not None and not self.proxy.filtering:
+            path = self._path(index)
+            self.expansion_state(self.active_collection).set_expanded(path, self.model.depth(path), expanded)
+
+    def on_item_double_clicked(self, index: QModelIndex) -> None:
+        if index.data(Qt.ItemDataRole.UserRole) == "create_new":
             self.show_create_dialog()
 
+    def on_current_changed(self, current: QModelIndex, previous: QModelIndex) -> None:
+        if current.isValid():
+            path = self._path(current)
+            if path != CREATE_NEW:
+                self.pathSelected.emit(path)
+
     def show_create_dialog(self) -> None:
         from models.pydantic_models import DocumentModel_Race, DocumentModel_Base
         collection = self.active_collection
@@ -33,81 +98,183 @@ class NavPanel(QWidget):
             model_cls = DocumentModel_Base
         else:
             return
+        if not ensure_writable(self):
+            return
         dialog = NewDialog(collection, model_cls, self)
-        # No need to call refresh_app here; NewDialog handles refresh after creation
+        # NewDialog patches the hierarchy and this panel after creation
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            # Optionally, select the newly added document in the tree
-            parent_app = self.parent()
-            if parent_app and hasattr(parent_app, 'documents'):
-                docs = parent_app.documents
-                if docs:
-                    new_doc = docs[-1]
-                    full_tag = new_doc.get('full_tag', '')
-                    if full_tag.startswith(collection + "."):
-                        nav_label = full_tag[len(collection) + 1:]
-                    else:
-                        nav_label = full_tag
-                    for i in range(self.tree.topLevelItemCount()):
-                        item = self.tree.topLevelItem(i)
-                        if item.text(0) == nav_label:
-                            self.tree.setCurrentItem(item)
-                            break
+            # Select the newly added document (deferred if a reload is still bringing it in)
+            self._pending_selection = dialog.full_tag_edit.text()
+            self._select_pending()
+
+    def select_path(self, full_tag: str) -> None:
+        """Select a tag path (e.g. a search result), clearing a filter that hides it.
+
+        While the collection is loading the selection waits for finish_load().
+        """
+        self._pending_selection = full_tag
+        if self._loading:
+            return
+        if self.proxy.filtering and not self._tree_index(full_tag).isValid():
+            self.search.clear()
+            self.apply_filter()
+        current = self.tree.currentIndex()
+        if current.isValid() and self._path(current) == full_tag:
+            # Already current, so currentChanged will not announce it
+            self._pending_selection = None
+            self.tree.scrollTo(current)
+            self.pathSelected.emit(full_tag)
+            return
+        self._select_pending()
+
+    def _select_pending(self) -> None:
+        index = self._tree_index(self._pending_selection) if self._pending_selection else QModelIndex()
+        if index.isValid():
+            self._select(index)
+            self._pending_selection = None
+
+    def _select(self, index: QModelIndex) -> None:
+        self._expand_to(index)
+        self.tree.setCurrentIndex(index)
+        self.tree.scrollTo(index)
+
+    def _expand_to(self, index: QModelIndex) -> None:
+        parent = index.parent()
+        while parent.isValid():
+            if not self.tree.isExpanded(parent):
+                self.tree.expand(parent)
+            parent = parent.parent()
+
+    def apply_filter(self) -> None:
+        """Filter the tree by the search text, opening the paths down to the first matches."""
+        self._filter_timer.stop()
+        text = self.search.text().strip()
+        if not text:
+            if self.proxy.filtering:
+                current = self.tree.currentIndex()
+                path = self._path(current) if current.isValid() else None
+                self.proxy.set_filter('')
+                # Back to the user's own expansion state, keeping the row they picked from the results
+                self._rebuild()
+                if path and path != CREATE_NEW:
+                    index = self._tree_index(path)
+                    if index.isValid():
+                        self._select(index)
+                self.label.setText(f"{self.active_collection} Collection")
+            return
+        matches = self.proxy.set_filter(text)
+        updates = self.tree.updatesEnabled()  # still off while a load is streaming in
+        self.tree.setUpdatesEnabled(False)
+        for full_tag in matches[:MAX_EXPANDED_MATCHES]:
+            index = self._tree_index(full_tag)
+            if index.isValid():
+                self._expand_to(index)
+        self.tree.setUpdatesEnabled(updates)
+        self.label.setText(f"{self.active_collection} Collection: {len(matches)} matches")
+
+    def _refilter(self) -> None:
+        # Documents changed under an active filter; run it again once the edits settle
+        self.proxy.invalidate_index()
+        if self.proxy.filtering:
+            self._filter_timer.start()
 
     def update_panel(self, collection: str, docs: list[dict[str, Any]]) -> None:
         """Update the navigation panel for the selected collection and its documents as a tree."""
+        self.begin_load(collection, HierarchyModel(collection, docs))
+        self.finish_load()
+
+    def redraw(self) -> None:
+        """Rebuild the tree from the current hierarchy model."""
+        if self.active_collection is None:
+            return
+        self.begin_load(self.active_collection, self.hierarchy)
+        self.finish_load()
+
+    def set_expand_depth(self, depth: Optional[int]) -> None:
+        """Collapse every collection below depth (None expands everything), dropping per-path toggles."""
+        self.expand_depth = depth
+        for state in self._expansion.values():
+            state.reset(depth)
+        self.redraw()
+
+    def begin_load(self, collection: str, hierarchy: HierarchyModel) -> None:
+        """Reset the tree for a collection whose documents are streamed into the shared hierarchy model."""
         self.active_collection = collection
+        self.hierarchy = hierarchy
         self.label.setText(f"{collection} Collection")
-        self.tree.clear()
-        # Add 'Create New' item
-        create_item = QTreeWidgetItem([f"Create New {collection}"])
-        create_item.setData(0, Qt.ItemDataRole.UserRole, "create_new")
-        self.tree.addTopLevelItem(create_item)
-        # Build a mapping from full_tag to doc
-        tag_map = {doc.get('full_tag', ''): doc for doc in docs}
-        # Helper to find or create a child item
-        def find_or_create_child(parent, text):
-            for i in range(parent.childCount()):
-                item = parent.child(i)
-                if item.text(0) == text:
-                    return item
-            new_item = QTreeWidgetItem([text])
-            parent.addChild(new_item)
-            return new_item
-        # Build the tree
-        root_items = {}
+        self._loading = True
+        # Rows are built from the model in finish_load(); keep the half-loaded tree out of paint until then
+        self.tree.setUpdatesEnabled(False)
+        self.proxy.invalidate_index()
+        self.model.reset(collection, hierarchy)
+
+    def finish_load(self) -> None:
+        """Rebuild the tree from the loaded hierarchy, re-applying the search filter or the expanded paths."""
+        self._loading = False
+        self.proxy.invalidate_index()
+        if self.proxy.filtering:
+            self.model.reset(self.active_collection or '', self.hierarchy)
+            self.apply_filter()
+        else:
+            self._rebuild()
+        self.tree.setUpdatesEnabled(True)
+        if self._pending_selection:
+            self.select_path(self._pending_selection)
+
+    def _rebuild(self) -> None:
+        """Reset the model and re-open the expanded paths, breadth first."""
+        collection = self.active_collection
+        if collection is None:
+            return
+        state = self.expansion_state(collection)
+        self.model.reset(collection, self.hierarchy)
+        depth = 0
+        level = [path for path in self.model.fetched_children(collection) if path != CREATE_NEW]
+        while level:
+            next_level: List[str] = []
+            for path in level:
+                index = self.model.index_of(path)
+                if state.is_expanded(path, depth) and self.model.hasChildren(index):
+                    self.model.fetchMore(index)
+                    self.tree.expand(self.proxy.mapFromSource(index))
+                    children = self.model.fetched_children(path)
+                    # Below the default depth only explicitly expanded paths need a look
+                    next_level.extend(children if state.default(depth + 1) else (c for c in children if c in state.expanded))
+            level = next_level
+            depth += 1
+
+    def append_documents(self, docs: list[dict[str, Any]]) -> None:
+        """Rows are built from the hierarchy in finish_load(), which also makes any pending selection."""
+
+    def insert_documents(self, docs: list[dict[str, Any]], reveal: bool = True) -> None:
+        """Add rows for documents inserted after the load.
+
+        With reveal (the user's own inserts) the path down to them is
+        expanded, which is remembered like any expansion; documents others
+        inserted leave the tree's expansion as it is.
+        """
         for doc in docs:
             full_tag = doc.get('full_tag', '')
-            if not full_tag.startswith(collection + "."):
+            self.model.insert_path(full_tag)
+            if not reveal:
                 continue
-            tag_parts = full_tag.split('.')[1:]  # skip collection name
-            parent = self.tree
-            for i, part in enumerate(tag_parts):
-                # Only add as top-level if parent is self.tree
-                if parent is self.tree:
-                    # Check if already exists as top-level
-                    found = None
-                    for j in range(self.tree.topLevelItemCount()):
-                        item = self.tree.topLevelItem(j)
-                        if item.text(0) == part:
-                            found = item
-                            break
-                    if not found:
-                        found = QTreeWidgetItem([part])
-                        found.setData(0, Qt.ItemDataRole.UserRole, "doc")
-                        self.tree.addTopLevelItem(found)
-                    parent = found
-                else:
-                    found = find_or_create_child(parent, part)
-                    found.setData(0, Qt.ItemDataRole.UserRole, "doc")
-                    parent = found
-        # Expand all items by default
-        def expand_all_items(item: Optional[QTreeWidgetItem]) -> None:
-            if item is None:
-                return
-            for i in range(item.childCount()):
-                child = item.child(i)
-                expand_all_items(child)
-            item.setExpanded(True)
-        for i in range(self.tree.topLevelItemCount()):
-            item = self.tree.topLevelItem(i)
-            expand_all_items(item)
\ No newline at end of file
+            index = self._tree_index(full_tag)
+            if index.isValid():
+                self._expand_to(index)
+        self._refilter()
+
+    def refresh_documents(self, full_tags: List[str]) -> None:
+        """Documents whose text changed in the hierarchy (same full_tag, so the rows stay)."""
+        self._refilter()
+
+    def remove_documents(self, full_tag: str) -> None:
+        """Drop the rows of a path that left the hierarchy, and intermediate rows that now lead nowhere.
+
+        Rows whose trie node survives (e.g. a removed document that still has
+        descendants) are kept.
+        """
+        path = full_tag
+        while path and path != self.active_collection and self.hierarchy.node(path) is None:
+            self.model.remove_path(path)
+            path = path.rpartition('.')[0]
+        self._refilter()
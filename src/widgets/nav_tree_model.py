@@ -0,0 +1,238 @@
+"""
+Lazy item model and search filter for the navigation tree.
+"""
+from PyQt6.QtCore import Qt, QAbstractItemModel, QSortFilterProxyModel, QModelIndex, QObject
+from typing import Any, Dict, List, Optional, Set, Tuple
+from models.hierarchy import HierarchyModel
+
+# Top-level row that opens the create dialog; never a tag path (tags have no spaces)
+CREATE_NEW = " create_new"
+FULL_TAG_ROLE = Qt.ItemDataRole.UserRole + 1
+# Document fields the search box matches against (all part of the skeleton projection)
+SEARCH_FIELDS = ('displayName', 'full_tag', 'description')
+
+class HierarchyTreeModel(QAbstractItemModel):
+    """Tree model over the tag trie of a HierarchyModel, one row per path segment.
+
+    A node's rows are read from the trie only when the view first expands it
+    (canFetchMore/fetchMore), so opening a 40k-document collection builds just
+    the rows that are on screen. Every index points at its tag path; the
+    strings are the ones held in _rows, which keeps them alive for Qt.
+    """
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.collection = ''
+        self.hierarchy = HierarchyModel('')
+        self._rows: Dict[str, List[str]] = {}  # fetched path -> child paths, in trie order
+        self._row_of: Dict[str, int] = {}  # displayed path -> row under its parent
+
+    def reset(self, collection: str, hierarchy: HierarchyModel) -> None:
+        """Show a collection again from scratch; only the top level is read."""
+        self.beginResetModel()
+        self.collection = collection
+        self.hierarchy = hierarchy
+        self._rows = {}
+        self._row_of = {}
+        self._set_rows(collection, [CREATE_NEW] + self._trie_children(collection))
+        self.endResetModel()
+
+    def path(self, index: QModelIndex) -> str:
+        """Tag path of an index; the collection itself for the invisible root."""
+        return index.internalPointer() if index.isValid() else self.collection
+
+    def path_at(self, row: int, parent: QModelIndex) -> str:
+        """Tag path of a fetched row, without creating an index."""
+        return self._rows[self.path(parent)][row]
+
+    def depth(self, path: str) -> int:
+        """Top-level rows are depth 0."""
+        return path.count('.') - self.collection.count('.') - 1
+
+    def _parent_path(self, path: str) -> str:
+        return path.rpartition('.')[0]
+
+    def _trie_children(self, path: str) -> List[str]:
+        node = self.hierarchy.node(path)
+        return [child.path for child in node.children.values()] if node is not None else []
+
+    def fetched_children(self, path: str) -> List[str]:
+        """Child paths of path if its rows have been fetched, otherwise none."""
+        return self._rows.get(path, [])
+
+    def index_of(self, path: str) -> QModelIndex:
+        """Index of a displayed path without fetching or consulting the trie (it may already be gone from there)."""
+        row = self._row_of.get(path)
+        if path == self.collection or row is None:
+            return QModelIndex()
+        return self.createIndex(row, 0, self._rows[self._parent_path(path)][row])
+
+    def _set_rows(self, path: str, children: List[str]) -> None:
+        self._rows[path] = children
+        for row, child in enumerate(children):
+            self._row_of[child] = row
+
+    # --- QAbstractItemModel ---
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        rows = self._rows.get(self.path(parent))
+        if column != 0 or rows is None or not 0 <= row < len(rows):
+            return QModelIndex()
+        return self.createIndex(row, 0, rows[row])
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:  # type: ignore[override]
+        path = self.path(index)
+        if not index.isValid() or path == CREATE_NEW:
+            return QModelIndex()
+        return self.index_of(self._parent_path(path))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self._rows.get(self.path(parent), ()))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        path = self.path(parent)
+        if path in self._rows:
+            return bool(self._rows[path])
+        node = self.hierarchy.node(path) if path != CREATE_NEW else None
+        return node is not None and bool(node.children)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        path = self.path(parent)
+        return parent.isValid() and path not in self._rows and self.hasChildren(parent)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        path = self.path(parent)
+        if path in self._rows:
+            return
+        children = self._trie_children(path)
+        if not children:
+            self._rows[path] = []
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        self._set_rows(path, children)
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        path = self.path(index)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"Create New {self.collection}" if path == CREATE_NEW else path.rpartition('.')[2]
+        if role == Qt.ItemDataRole.UserRole:
+            return "create_new" if path == CREATE_NEW else "doc"
+        if role == FULL_TAG_ROLE and path != CREATE_NEW:
+            return path
+        return None
+
+    # --- Patching ---
+    def index_for(self, path: str) -> QModelIndex:
+        """Index of a tag path, fetching the rows of its ancestors on the way down."""
+        if not path.startswith(self.collection + '.') or self.hierarchy.node(path) is None:
+            return QModelIndex()
+        index = QModelIndex()
+        segments = path[len(self.collection) + 1:].split('.')
+        current = self.collection
+        for segment in segments:
+            if self.canFetchMore(index):
+                self.fetchMore(index)
+            current = f"{current}.{segment}"
+            row = self._row_of.get(current)
+            if row is None:
+                return QModelIndex()
+            index = self.index(row, 0, index)
+        return index
+
+    def insert_path(self, path: str) -> None:
+        """Show a path just added to the trie under the nearest ancestor whose rows are already fetched."""
+        node = self.hierarchy.node(path)
+        while node is not None and node.path != self.collection:
+            parent_path = self._parent_path(node.path)
+            if node.path in self._row_of:
+                # Already shown; it may have just gained its first children
+                index = self.index_of(node.path)
+                self.dataChanged.emit(index, index)
+                return
+            if parent_path in self._rows:
+                rows = self._rows[parent_path]
+                self.beginInsertRows(self.index_of(parent_path), len(rows), len(rows))
+                rows.append(node.path)
+                self._row_of[node.path] = len(rows) - 1
+                self.endInsertRows()
+                return
+            node = node.parent
+
+    def remove_path(self, path: str) -> None:
+        """Drop the row of a path (and its fetched rows) that left the trie."""
+        row = self._row_of.get(path)
+        parent_path = self._parent_path(path)
+        rows = self._rows.get(parent_path)
+        if row is None or rows is None:
+            return
+        self.beginRemoveRows(self.index_of(parent_path), row, row)
+        del rows[row]
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            self._row_of.pop(current, None)
+            stack.extend(self._rows.pop(current, ()))
+        for i in range(row, len(rows)):
+            self._row_of[rows[i]] = i
+        self.endRemoveRows()
+
+class HierarchyFilterProxy(QSortFilterProxyModel):
+    """Hides the rows that neither match the search text nor lead to a match.
+
+    Matching runs once per filter change over a cached list of lowercased
+    search fields rather than row by row through the proxy, so a search over
+    100k documents costs a few milliseconds; the proxy then only looks the
+    fetched rows up in the resulting set of paths. Changing the filter resets
+    the proxy, so the view's expansion has to be re-applied afterwards. Call
+    invalidate_index() whenever documents change.
+    """
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._allowed: Optional[Set[str]] = None  # matches and their ancestor paths; None shows everything
+        self._entries: Optional[List[Tuple[str, str]]] = None  # (full_tag, searchable text)
+
+    @property
+    def filtering(self) -> bool:
+        return self._allowed is not None
+
+    def invalidate_index(self) -> None:
+        self._entries = None
+
+    def _search_entries(self) -> List[Tuple[str, str]]:
+        if self._entries is None:
+            hierarchy = self.sourceModel().hierarchy
+            self._entries = [
+                (doc.get('full_tag', ''), '\n'.join(str(doc.get(field) or '') for field in SEARCH_FIELDS).casefold())
+                for doc in hierarchy.documents()
+            ]
+        return self._entries
+
+    def set_filter(self, text: str) -> List[str]:
+        """Show only documents whose search fields contain every word of text; returns the matching full tags.
+
+        An empty text shows everything again.
+        """
+        terms = text.casefold().split()
+        matches = [full_tag for full_tag, searchable in self._search_entries() if all(term in searchable for term in terms)] if terms else []
+        allowed: Set[str] = set()
+        for path in matches:
+            while path and path not in allowed:
+                allowed.add(path)
+                path = path.rpartition('.')[0]
+        # A reset rather than invalidateFilter(): removing thousands of interleaved row
+        # ranges one signal at a time is quadratic in the tree view
+        self.beginResetModel()
+        self._allowed = allowed if terms else None
+        self.endResetModel()
+        return matches
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._allowed is None:
+            return True
+        return self.sourceModel().path_at(source_row, source_parent) in self._allowed
@@ -5,7 +5,7 @@ from PyQt6.QtWidgets import QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxL
 from PyQt6.QtCore import Qt, pyqtSignal
 from typing import Type, Any, Dict, TypeVar, Optional
 import os
-from utils.helpers import refresh_app
+from utils.helpers import apply_changes, writer_of
 
 T = TypeVar('T')
 
@@ -255,16 +255,12 @@ class NewDialog(QDialog):
                 while parent_app and not hasattr(parent_app, 'db_handler'):
                     parent_app = parent_app.parent()
                 if parent_app and hasattr(parent_app, 'db_handler'):
-                    db_handler = parent_app.db_handler # type: ignore
-                    result, msg = db_handler.insert_documents(collection, [doc.model_dump()]) # type: ignore
+                    # Queued; the new document is patched into the views before it reaches the server
+                    result, msg, inserted = writer_of(parent_app).insert_documents(collection, [doc.model_dump()]) # type: ignore
                     if result:
                         QMessageBox.information(self, "Success", f"{collection} created successfully.")
-                        # Centralized refresh
-                        parent = self.parent()
-                        while parent and not hasattr(parent, 'db_handler'):
-                            parent = parent.parent()
-                        if parent:
-                            refresh_app(parent)
+                        # Patch the views with the new document instead of reloading the collection
+                        apply_changes(parent_app, inserted=inserted)
                         self.created.emit()
                         self.accept()
                     else:
@@ -1,82 +1,211 @@
-from PyQt6.QtWidgets import QFrame, QLabel, QVBoxLayout, QWidget, QMenu
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QMouseEvent, QContextMenuEvent
+from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
+from PyQt6.QtCore import Qt, QRectF, QPointF
+from PyQt6.QtGui import QPainter, QPen, QBrush, QColor, QFont, QFontMetrics
+from utils.org_chart_layout import OrgChartLayout, BOX_SIZE
 
-class OrgChartBox(QFrame):
-    boxDoubleClicked = pyqtSignal(str)  # full_tag as identifier
-    boxActionRequested = pyqtSignal(str, str)  # (full_tag, action: 'edit'|'create_child')
+HEADER_HEIGHT = 60
+PADDING = 8
 
-    def __init__(self, display_name: str, full_tag: str, description: str, parent: QWidget | None = None):
+# Levels of detail, chosen by the view from its zoom factor
+LOD_FULL = 2  # header, full tag and wrapped description
+LOD_SIMPLE = 1  # plain box with the display name only
+LOD_DOTS = 0  # no box items; OrgChartDots marks each node
+# Expand/collapse pill at the bottom centre of a box with children, in box coordinates
+TOGGLE_RECT = QRectF((BOX_SIZE - 40) / 2, BOX_SIZE - PADDING - 18, 40, 16)
+# Heat map colours from well below to well above a stat's mean (see models.stat_analytics.HEAT_BOUNDS)
+HEAT_COLORS = ["#2c7bb6", "#74add1", "#c6dbef", "#f7f7f7", "#fdd0a2", "#f46d43", "#d73027"]
+
+class OrgChartBox(QGraphicsItem):
+    """Lightweight painted org chart node; created only while its document is on screen."""
+    # Shared paint resources, created once on first paint instead of per box
+    _resources: dict | None = None
+
+    def __init__(self, display_name: str, full_tag: str, description: str, parent: QGraphicsItem | None = None):
         super().__init__(parent)
+        self.display_name = display_name
         self.full_tag = full_tag
-        self.setFrameShape(QFrame.Shape.Box)
-        self.setLineWidth(2)
-        self.setStyleSheet("background: white; border-radius: 8px;")
-        self.setFixedSize(120, 120)  # Make the box square and fixed size
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(0)
-        # Header area (top 1/3)
-        header_widget = QWidget(self)
-        header_layout = QVBoxLayout(header_widget)
-        header_layout.setContentsMargins(8, 8, 8, 0)
-        header_layout.setSpacing(2)
-        header = QLabel(display_name)
-        header.setStyleSheet("font-weight: bold; font-size: 16px; color: #3a3a7a; background: #e0e6f8;") # border-top-left-radius: 8px; border-top-right-radius: 8px;
-        header.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        subtitle = QLabel(full_tag)
-        subtitle.setStyleSheet("font-style: italic; font-size: 11px; color: #555; background: #e0e6f8;")
-        subtitle.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        header_layout.addWidget(header)
-        header_layout.addWidget(subtitle)
-        header_widget.setFixedHeight(60)
-        layout.addWidget(header_widget, 1)
-        # Description area (bottom 2/3)
-        desc_widget = QWidget(self)
-        desc_layout = QVBoxLayout(desc_widget)
-        desc_layout.setContentsMargins(8, 0, 8, 8)
-        desc_layout.setSpacing(0)
-        desc = QLabel(description)
-        desc.setWordWrap(True)
-        desc.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter)
-        desc.setStyleSheet("font-size: 12px; margin-top: 6px; color: #2a2a2a; background: #f8f8fa; border-bottom-left-radius: 8px; border-bottom-right-radius: 8px;")
-        desc_layout.addWidget(desc)
-        desc_widget.setMinimumHeight(60)
-        layout.addWidget(desc_widget, 2)
-
-    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
-        self.boxDoubleClicked.emit(self.full_tag)
-        super().mouseDoubleClickEvent(event)
-
-    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
-        menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background: #fff;
-                color: #111;
-                border: 1px solid #888;
-                border-radius: 6px;
-                padding: 4px;
-                box-shadow: 0px 4px 16px rgba(0,0,0,0.18);
-            }
-            QMenu::item {
-                background: transparent;
-                color: #111;
-                padding: 6px 24px 6px 24px;
-            }
-            QMenu::item:selected {
-                background: #e0e6f8;
-                color: #111;
+        self.description = description or ""
+        self.lod = LOD_FULL
+        self.child_count = 0
+        self.expanded = True
+        self.highlighted = False
+        self.drop_target = False
+        self.heat: int | None = None  # HEAT_COLORS index while a heat map is shown
+        self.setZValue(1)
+
+    def set_highlighted(self, highlighted: bool) -> None:
+        if highlighted != self.highlighted:
+            self.highlighted = highlighted
+            self.update()
+
+    def set_drop_target(self, drop_target: bool) -> None:
+        """Outline the box while another box is dragged over it."""
+        if drop_target != self.drop_target:
+            self.drop_target = drop_target
+            self.update()
+
+    def set_heat(self, heat: int | None) -> None:
+        """Tint the box with a heat map colour, or None for the normal look."""
+        if heat != self.heat:
+            self.heat = heat
+            self.update()
+
+    def set_children(self, count: int, expanded: bool) -> None:
+        """Number of document children and whether they are shown; drives the toggle pill."""
+        if (count, expanded) != (self.child_count, self.expanded):
+            self.child_count = count
+            self.expanded = expanded
+            self.update()
+
+    def set_lod(self, lod: int) -> None:
+        if lod != self.lod:
+            self.lod = lod
+            self.update()
+
+    @classmethod
+    def resources(cls) -> dict:
+        if cls._resources is None:
+            title_font = QFont()
+            title_font.setBold(True)
+            title_font.setPixelSize(16)
+            subtitle_font = QFont()
+            subtitle_font.setItalic(True)
+            subtitle_font.setPixelSize(11)
+            desc_font = QFont()
+            desc_font.setPixelSize(12)
+            cls._resources = {
+                'border': QPen(QColor("#3a3a3a"), 2),
+                'highlight_border': QPen(QColor("#2f6fde"), 4),
+                'drop_border': QPen(QColor("#2e9e4f"), 4, Qt.PenStyle.DashLine),
+                'background': QBrush(QColor("white")),
+                'header': QBrush(QColor("#e0e6f8")),
+                'desc_background': QBrush(QColor("#f8f8fa")),
+                'title_font': title_font,
+                'title_metrics': QFontMetrics(title_font),
+                'title_color': QColor("#3a3a7a"),
+                'subtitle_font': subtitle_font,
+                'subtitle_metrics': QFontMetrics(subtitle_font),
+                'subtitle_color': QColor("#555"),
+                'desc_font': desc_font,
+                'desc_color': QColor("#2a2a2a"),
+                'toggle_border': QPen(QColor("#3a3a7a"), 1),
+                'toggle_background': QBrush(QColor("#e0e6f8")),
+                'toggle_font': subtitle_font,
+                'heat': [QBrush(QColor(color)) for color in HEAT_COLORS],
             }
-        """)
-        edit_action = menu.addAction("Edit")
-        create_child_action = menu.addAction("Create Child")
-        menu.addSeparator()
-        delete_action = menu.addAction("Delete")
-        action = menu.exec(event.globalPos())
-        if action == edit_action:
-            self.boxActionRequested.emit(self.full_tag, 'edit')
-        elif action == create_child_action:
-            self.boxActionRequested.emit(self.full_tag, 'create_child')
-        elif action == delete_action:
-            self.boxActionRequested.emit(self.full_tag, 'delete')
+        return cls._resources
+
+    def boundingRect(self) -> QRectF:
+        return QRectF(-2, -2, BOX_SIZE + 4, BOX_SIZE + 4)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
+        res = self.resources()
+        rect = QRectF(0, 0, BOX_SIZE, BOX_SIZE)
+        inner_width = BOX_SIZE - 2 * PADDING
+        painter.setPen(res['drop_border'] if self.drop_target else res['highlight_border'] if self.highlighted else res['border'])
+        painter.setBrush(res['background'] if self.heat is None else res['heat'][self.heat])
+        painter.drawRoundedRect(rect, 8, 8)
+        painter.setPen(Qt.PenStyle.NoPen)
+        if self.lod < LOD_FULL:
+            # Simplified: header band and display name, no subtitle or wrapped description
+            painter.setBrush(res['header'] if self.heat is None else res['heat'][self.heat])
+            painter.drawRect(QRectF(PADDING, PADDING, inner_width, HEADER_HEIGHT - PADDING))
+            painter.setPen(res['title_color'])
+            painter.setFont(res['title_font'])
+            title = res['title_metrics'].elidedText(self.display_name, Qt.TextElideMode.ElideRight, inner_width)
+            painter.drawText(QRectF(PADDING, PADDING, inner_width, HEADER_HEIGHT - PADDING), Qt.AlignmentFlag.AlignCenter, title)
+            self._paint_toggle(painter, res)
+            return
+        # Header area (top half): display name and full tag
+        painter.setBrush(res['header'] if self.heat is None else res['heat'][self.heat])
+        painter.drawRect(QRectF(PADDING, PADDING, inner_width, HEADER_HEIGHT - PADDING))
+        painter.setPen(res['title_color'])
+        painter.setFont(res['title_font'])
+        title = res['title_metrics'].elidedText(self.display_name, Qt.TextElideMode.ElideRight, inner_width)
+        painter.drawText(QRectF(PADDING, PADDING, inner_width, 30), Qt.AlignmentFlag.AlignCenter, title)
+        painter.setPen(res['subtitle_color'])
+        painter.setFont(res['subtitle_font'])
+        subtitle = res['subtitle_metrics'].elidedText(self.full_tag, Qt.TextElideMode.ElideMiddle, inner_width)
+        painter.drawText(QRectF(PADDING, PADDING + 30, inner_width, HEADER_HEIGHT - PADDING - 30), Qt.AlignmentFlag.AlignCenter, subtitle)
+        # Description area (bottom half), word-wrapped and clipped to the box
+        desc_rect = QRectF(PADDING, HEADER_HEIGHT, inner_width, BOX_SIZE - HEADER_HEIGHT - PADDING)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(res['desc_background'])
+        painter.drawRect(desc_rect)
+        if self.description:
+            painter.setPen(res['desc_color'])
+            painter.setFont(res['desc_font'])
+            painter.save()
+            painter.setClipRect(desc_rect)
+            painter.drawText(
+                desc_rect.adjusted(0, 6, 0, 0),
+                int(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter) | int(Qt.TextFlag.TextWordWrap),
+                self.description,
+            )
+            painter.restore()
+        self._paint_toggle(painter, res)
+
+    def _paint_toggle(self, painter: QPainter, res: dict) -> None:
+        # "+N" while the children are collapsed, "-" while they are shown
+        if not self.child_count:
+            return
+        painter.setPen(res['toggle_border'])
+        painter.setBrush(res['toggle_background'])
+        painter.drawRoundedRect(TOGGLE_RECT, 8, 8)
+        painter.setPen(res['title_color'])
+        painter.setFont(res['toggle_font'])
+        text = "\u2212" if self.expanded else f"+{self.child_count}"
+        painter.drawText(TOGGLE_RECT, Qt.AlignmentFlag.AlignCenter, text)
+
+class OrgChartDots(QGraphicsItem):
+    """Far-zoom stand-in for the boxes: one dot per node intersecting the exposed area."""
+    def __init__(self, layout: OrgChartLayout, parent: QGraphicsItem | None = None):
+        super().__init__(parent)
+        if layout.box_index is None:
+            layout.build_indexes()
+        self.positions = layout.positions
+        self.index = layout.box_index
+        self.pen = QPen(QColor("#3a3a7a"), 4)
+        self.pen.setCosmetic(True)
+        self.pen.setCapStyle(Qt.PenCapStyle.SquareCap)
+        self.heat: dict | None = None  # full_tag -> HEAT_COLORS index while a heat map is shown
+        self.heat_pens: list = []
+        self._bounds = QRectF(0, 0, layout.width, layout.height)
+        self.setZValue(1)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def set_heat(self, heat: dict | None) -> None:
+        """Colour each dot by its heat map index (nodes missing from heat keep the plain colour)."""
+        self.heat = heat
+        if heat is not None and not self.heat_pens:
+            for color in HEAT_COLORS:
+                pen = QPen(self.pen)
+                pen.setColor(QColor(color).darker(120))
+                self.heat_pens.append(pen)
+        self.update()
+
+    def set_bounds(self, width: float, height: float) -> None:
+        """Resize after the layout was patched in place."""
+        self.prepareGeometryChange()
+        self._bounds = QRectF(0, 0, width, height)
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
+        exposed = option.exposedRect
+        tags = self.index.query(exposed.left(), exposed.top(), exposed.right(), exposed.bottom())
+        if not tags:
+            return
+        half = BOX_SIZE / 2
+        if self.heat is None:
+            painter.setPen(self.pen)
+            painter.drawPoints([QPointF(self.positions[tag][0] + half, self.positions[tag][1] + half) for tag in tags])
+            return
+        # One drawPoints call per colour
+        groups: dict = {}
+        for tag in tags:
+            groups.setdefault(self.heat.get(tag), []).append(QPointF(self.positions[tag][0] + half, self.positions[tag][1] + half))
+        for heat, points in groups.items():
+            painter.setPen(self.pen if heat is None else self.heat_pens[heat])
+            painter.drawPoints(points)
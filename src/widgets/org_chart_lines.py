@@ -1,30 +1,58 @@
-from PyQt6.QtWidgets import QWidget
+from bisect import bisect_left, bisect_right
+from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
 from PyQt6.QtGui import QPainter, QPen
-from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtCore import Qt, QRectF, QLineF
+from utils.org_chart_layout import OrgChartLayout
 
-class OrgChartLines(QWidget):
-    def __init__(self, box_widgets, children_map, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.box_widgets = box_widgets
-        self.children_map = children_map
-        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
-        self.setStyleSheet("background: transparent;")
+class OrgChartLines(QGraphicsItem):
+    """Single scene item drawing the parent-to-child connectors that intersect the exposed area.
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        pen = QPen(Qt.GlobalColor.black, 2)
-        painter.setPen(pen)
-        for parent_tag, children in self.children_map.items():
-            parent_box = self.box_widgets.get(parent_tag)
-            if not parent_box:
-                continue
-            parent_rect = parent_box.geometry()
-            parent_bottom = QPoint(parent_rect.center().x(), parent_rect.bottom())
-            for child_tag in children:
-                child_box = self.box_widgets.get(child_tag)
-                if not child_box:
-                    continue
-                child_rect = child_box.geometry()
-                child_top = QPoint(child_rect.center().x(), child_rect.top())
-                painter.drawLine(parent_bottom, child_top)
-        painter.end()
+    Connectors come from the layout's fan index (one entry per parent). Within a
+    visible fan, only the child lines crossing the exposed x-range are drawn,
+    found by bisecting the children's sorted x coordinates.
+    """
+    def __init__(self, layout: OrgChartLayout, parent: QGraphicsItem | None = None):
+        super().__init__(parent)
+        self.pen = QPen(Qt.GlobalColor.black, 2)
+        self.far_pen = QPen(Qt.GlobalColor.black, 1)
+        self.far_pen.setCosmetic(True)
+        self.simplified = False
+        if layout.fan_index is None:
+            layout.build_indexes()
+        self.fans = layout.fans
+        self.index = layout.fan_index
+        self._bounds = QRectF(0, 0, layout.width, layout.height)
+        self.setZValue(0)
+        # Needed so paint() receives the exposed rect to cull against
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def set_simplified(self, simplified: bool) -> None:
+        """Use a thin cosmetic pen when zoomed out."""
+        if simplified != self.simplified:
+            self.simplified = simplified
+            self.update()
+
+    def set_bounds(self, width: float, height: float) -> None:
+        """Resize after the layout was patched in place."""
+        self.prepareGeometryChange()
+        self._bounds = QRectF(0, 0, width, height)
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
+        exposed = option.exposedRect
+        left, right = exposed.left(), exposed.right()
+        lines: list[QLineF] = []
+        for parent_tag in self.index.query(left, exposed.top(), right, exposed.bottom()):
+            px, py, child_xs, cy = self.fans[parent_tag]
+            if px < left:
+                first, last = bisect_left(child_xs, left), len(child_xs)
+            elif px > right:
+                first, last = 0, bisect_right(child_xs, right)
+            else:
+                first, last = 0, len(child_xs)
+            lines.extend(QLineF(px, py, child_xs[i], cy) for i in range(first, last))
+        if lines:
+            painter.setPen(self.far_pen if self.simplified else self.pen)
+            painter.drawLines(lines)
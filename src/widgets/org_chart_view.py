@@ -0,0 +1,343 @@
+"""
+Scene-graph view for the org chart.
+"""
+from PyQt6.QtWidgets import QApplication, QGraphicsView, QGraphicsScene, QMenu, QWidget
+from PyQt6.QtCore import Qt, QPoint, QRectF, pyqtSignal
+from PyQt6.QtGui import QPainter, QMouseEvent, QContextMenuEvent, QWheelEvent, QColor, QKeyEvent
+from typing import Optional, Dict, Iterable
+from .org_chart_box import OrgChartBox, OrgChartDots, LOD_FULL, LOD_SIMPLE, LOD_DOTS, TOGGLE_RECT
+from .org_chart_lines import OrgChartLines
+from utils.org_chart_layout import OrgChartLayout, BOX_SIZE
+from utils.spatial_index import GridIndex
+from models.hierarchy import VisibleHierarchy
+
+CONTEXT_MENU_STYLE = """
+    QMenu {
+        background: #fff;
+        color: #111;
+        border: 1px solid #888;
+        border-radius: 6px;
+        padding: 4px;
+        box-shadow: 0px 4px 16px rgba(0,0,0,0.18);
+    }
+    QMenu::item {
+        background: transparent;
+        color: #111;
+        padding: 6px 24px 6px 24px;
+    }
+    QMenu::item:selected {
+        background: #e0e6f8;
+        color: #111;
+    }
+"""
+
+MIN_ZOOM = 0.02
+MAX_ZOOM = 4.0
+ZOOM_STEP = 1.15
+# Zoom factors below which the chart switches to simpler drawing
+SIMPLE_ZOOM = 0.45
+DOTS_ZOOM = 0.15
+# Extra scene-space margin around the viewport in which boxes are kept alive
+VISIBLE_MARGIN = 2 * BOX_SIZE
+
+class OrgChartView(QGraphicsView):
+    """Zoomable, pannable view rendering the org chart with painted scene items.
+
+    Box items exist only for nodes intersecting the viewport (found through a
+    grid index over the layout positions), so scene size and repaint cost track
+    what is on screen rather than the collection size. Only the expanded part
+    of the hierarchy is laid out; the pill at the bottom of a box with
+    children asks for it to be expanded or collapsed. Dragging a box onto
+    another asks for it to be moved there; dragging empty space pans.
+    """
+    boxDoubleClicked = pyqtSignal(str)  # full_tag as identifier
+    boxActionRequested = pyqtSignal(str, str)  # (full_tag, action: 'edit'|'create_child'|'delete')
+    createRequested = pyqtSignal()  # context menu on empty space
+    toggleRequested = pyqtSignal(str)  # full_tag whose children should be shown/hidden
+    moveRequested = pyqtSignal(str, str)  # (full_tag, new parent full_tag), from dragging a box onto another
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._scene = QGraphicsScene(self)
+        self._scene.setBackgroundBrush(QColor("#ffffff"))
+        # Visibility is resolved through our own index, so skip Qt's BSP bookkeeping
+        self._scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        self.setScene(self._scene)
+        self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.OptimizationFlag.DontSavePainterState, True)
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.chart_layout: Optional[OrgChartLayout] = None
+        self.hierarchy: Optional[VisibleHierarchy] = None
+        self.index = GridIndex()
+        self.boxes: Dict[str, OrgChartBox] = {}
+        self.lines: Optional[OrgChartLines] = None
+        self.dots: Optional[OrgChartDots] = None
+        self.highlighted: Optional[str] = None  # box outlined after being picked in the navigation panel
+        self.heat: Optional[Dict[str, int]] = None  # full_tag -> heat map colour index, while a heat map is shown
+        # Box being dragged, where the press started, and the box it would be dropped on
+        self._drag_tag: Optional[str] = None
+        self._drag_origin = QPoint()
+        self._dragging = False
+        self.drop_target: Optional[str] = None
+        # Off while a move is being saved; boxes then only select and pan
+        self.moves_enabled = True
+
+    def set_chart(self, layout: OrgChartLayout, hierarchy: VisibleHierarchy) -> None:
+        """Replace the scene contents with the given layout; boxes are created lazily.
+
+        Layouts prepared off the GUI thread should already have their indexes built.
+        """
+        self._scene.clear()
+        self.chart_layout = layout
+        self.hierarchy = hierarchy
+        self.boxes = {}
+        if layout.box_index is None:
+            layout.build_indexes()
+        self.index = layout.box_index
+        self.lines = OrgChartLines(layout)
+        self._scene.addItem(self.lines)
+        self.dots = OrgChartDots(layout)
+        self.dots.set_heat(self.heat)
+        self._scene.addItem(self.dots)
+        self._scene.setSceneRect(QRectF(0, 0, layout.width, layout.height))
+        self.sync_visible_items()
+
+    def apply_layout_patch(self, moved: Iterable[str], removed: Iterable[str] = ()) -> None:
+        """Bring the scene in line with a layout patched in place by patch_layout()."""
+        layout = self.chart_layout
+        if layout is None or self.lines is None or self.dots is None:
+            return
+        self.refresh_boxes(removed)
+        positions = layout.positions
+        for tag in moved:
+            box = self.boxes.get(tag)
+            if box is not None:
+                box.setPos(*positions[tag])
+        self.lines.set_bounds(layout.width, layout.height)
+        self.dots.set_bounds(layout.width, layout.height)
+        self._scene.setSceneRect(QRectF(0, 0, layout.width, layout.height))
+        self.lines.update()
+        self.dots.update()
+        self.sync_visible_items()
+
+    def refresh_boxes(self, tags: Iterable[str]) -> None:
+        """Drop the box items for the given tags; visible ones are recreated from the hierarchy."""
+        for tag in tags:
+            box = self.boxes.pop(tag, None)
+            if box is not None:
+                self._scene.removeItem(box)
+
+    def level_of_detail(self) -> int:
+        zoom = self.transform().m11()
+        if zoom >= SIMPLE_ZOOM:
+            return LOD_FULL
+        if zoom >= DOTS_ZOOM:
+            return LOD_SIMPLE
+        return LOD_DOTS
+
+    def visible_scene_rect(self) -> QRectF:
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def sync_visible_items(self) -> None:
+        """Create box items entering the viewport and drop the ones that left it."""
+        if self.chart_layout is None or self.hierarchy is None or self.lines is None or self.dots is None:
+            return
+        lod = self.level_of_detail()
+        self.lines.set_simplified(lod < LOD_FULL)
+        self.dots.setVisible(lod == LOD_DOTS)
+        if lod == LOD_DOTS:
+            visible: set = set()
+        else:
+            rect = self.visible_scene_rect().adjusted(-VISIBLE_MARGIN, -VISIBLE_MARGIN, VISIBLE_MARGIN, VISIBLE_MARGIN)
+            visible = self.index.query(rect.left(), rect.top(), rect.right(), rect.bottom())
+        for tag in [tag for tag in self.boxes if tag not in visible]:
+            self._scene.removeItem(self.boxes.pop(tag))
+        positions = self.chart_layout.positions
+        for tag in visible:
+            box = self.boxes.get(tag)
+            if box is None:
+                doc = self.hierarchy.get(tag) or {}
+                box = OrgChartBox(doc.get('displayName', ''), doc.get('full_tag', ''), doc.get('description', ''))
+                box.set_children(self.hierarchy.child_count(tag), self.hierarchy.is_expanded(tag))
+                box.set_highlighted(tag == self.highlighted)
+                box.set_drop_target(tag == self.drop_target)
+                box.set_heat(self.heat.get(tag) if self.heat is not None else None)
+                box.setPos(*positions[tag])
+                self._scene.addItem(box)
+                self.boxes[tag] = box
+            box.set_lod(lod)
+
+    def set_heat(self, heat: Optional[Dict[str, int]]) -> None:
+        """Tint boxes and dots by heat map colour index (see HEAT_COLORS), or None to clear the heat map."""
+        self.heat = heat
+        for tag, box in self.boxes.items():
+            box.set_heat(heat.get(tag) if heat is not None else None)
+        if self.dots is not None:
+            self.dots.set_heat(heat)
+
+    def focus_box(self, tag: str) -> None:
+        """Scroll a laid-out box to the centre of the viewport and outline it."""
+        if self.chart_layout is None or tag not in self.chart_layout.positions:
+            return
+        previous = self.boxes.get(self.highlighted) if self.highlighted else None
+        if previous is not None:
+            previous.set_highlighted(False)
+        self.highlighted = tag
+        box = self.boxes.get(tag)
+        if box is not None:
+            box.set_highlighted(True)
+        x, y = self.chart_layout.positions[tag]
+        self.centerOn(x + BOX_SIZE / 2, y + BOX_SIZE / 2)
+        self.sync_visible_items()
+
+    def tag_at(self, pos) -> Optional[str]:
+        """Return the full_tag of the node under a viewport position, if any."""
+        scene_pos = self.mapToScene(pos)
+        return next(iter(self.index.query_point(scene_pos.x(), scene_pos.y())), None)
+
+    def toggle_at(self, pos) -> Optional[str]:
+        """Return the full_tag whose expand/collapse pill is under a viewport position, if any."""
+        if self.chart_layout is None or self.hierarchy is None or self.level_of_detail() == LOD_DOTS:
+            return None
+        tag = self.tag_at(pos)
+        if tag is None or not self.hierarchy.child_count(tag):
+            return None
+        scene_pos = self.mapToScene(pos)
+        x, y = self.chart_layout.positions[tag]
+        return tag if TOGGLE_RECT.contains(scene_pos.x() - x, scene_pos.y() - y) else None
+
+    def can_drop(self, tag: str, target: Optional[str]) -> bool:
+        """Whether tag may be moved under target: not onto itself, its own subtree or its current parent."""
+        if target is None or self.hierarchy is None or target == tag or target.startswith(tag + '.'):
+            return False
+        return self.hierarchy.parent(tag) != target
+
+    def _set_drop_target(self, target: Optional[str]) -> None:
+        if target == self.drop_target:
+            return
+        for tag, value in ((self.drop_target, False), (target, True)):
+            box = self.boxes.get(tag) if tag else None
+            if box is not None:
+                box.set_drop_target(value)
+        self.drop_target = target
+
+    def _end_drag(self) -> None:
+        self._set_drop_target(None)
+        self._drag_tag = None
+        self._dragging = False
+        self.viewport().unsetCursor()
+
+    def zoom_by(self, factor: float) -> None:
+        current = self.transform().m11()
+        factor = max(MIN_ZOOM / current, min(MAX_ZOOM / current, factor))
+        self.scale(factor, factor)
+        self.sync_visible_items()
+
+    def scrollContentsBy(self, dx: int, dy: int) -> None:
+        super().scrollContentsBy(dx, dy)
+        self.sync_visible_items()
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self.sync_visible_items()
+
+    def wheelEvent(self, event: QWheelEvent) -> None:
+        # Ctrl + wheel zooms around the cursor, plain wheel scrolls
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            steps = event.angleDelta().y() / 120
+            if steps:
+                self.zoom_by(ZOOM_STEP ** steps)
+            event.accept()
+        else:
+            super().wheelEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent) -> None:
+        if event.button() == Qt.MouseButton.LeftButton:
+            tag = self.toggle_at(event.position().toPoint())
+            if tag is not None:
+                self.toggleRequested.emit(tag)
+                event.accept()
+                return
+            tag = self.tag_at(event.position().toPoint())
+            if tag is not None and self.moves_enabled and self.level_of_detail() != LOD_DOTS:
+                # Might become a drag; pressing a box does not pan
+                self._drag_tag = tag
+                self._drag_origin = event.position().toPoint()
+                event.accept()
+                return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        if self._drag_tag is None:
+            super().mouseMoveEvent(event)
+            return
+        pos = event.position().toPoint()
+        if not self._dragging and (pos - self._drag_origin).manhattanLength() >= QApplication.startDragDistance():
+            self._dragging = True
+            self.viewport().setCursor(Qt.CursorShape.DragMoveCursor)
+        if self._dragging:
+            target = self.tag_at(pos)
+            self._set_drop_target(target if self.can_drop(self._drag_tag, target) else None)
+        event.accept()
+
+    def mouseReleaseEvent(self, event: QMouseEvent) -> None:
+        if self._drag_tag is None:
+            super().mouseReleaseEvent(event)
+            return
+        tag, target = self._drag_tag, self.drop_target
+        dragged = self._dragging
+        self._end_drag()
+        event.accept()
+        if dragged and target is not None:
+            self.moveRequested.emit(tag, target)
+
+    def keyPressEvent(self, event: QKeyEvent) -> None:
+        if event.key() == Qt.Key.Key_Escape and self._drag_tag is not None:
+            self._end_drag()
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
+        # A quick second click on the pill toggles again rather than opening the editor
+        tag = self.toggle_at(event.position().toPoint())
+        if tag is not None:
+            self.toggleRequested.emit(tag)
+            event.accept()
+            return
+        tag = self.tag_at(event.position().toPoint())
+        if tag is not None:
+            self.boxDoubleClicked.emit(tag)
+            event.accept()
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def contextMenuEvent(self, event: QContextMenuEvent) -> None:
+        menu = QMenu(self)
+        menu.setStyleSheet(CONTEXT_MENU_STYLE)
+        tag = self.tag_at(event.pos())
+        if tag is not None:
+            edit_action = menu.addAction("Edit")
+            create_child_action = menu.addAction("Create Child")
+            toggle_action = None
+            if self.hierarchy is not None and self.hierarchy.child_count(tag):
+                toggle_action = menu.addAction("Collapse" if self.hierarchy.is_expanded(tag) else "Expand")
+            menu.addSeparator()
+            delete_action = menu.addAction("Delete")
+            action = menu.exec(event.globalPos())
+            if action == edit_action:
+                self.boxActionRequested.emit(tag, 'edit')
+            elif action == create_child_action:
+                self.boxActionRequested.emit(tag, 'create_child')
+            elif toggle_action is not None and action == toggle_action:
+                self.toggleRequested.emit(tag)
+            elif action == delete_action:
+                self.boxActionRequested.emit(tag, 'delete')
+        else:
+            create_action = menu.addAction("Create New")
+            if menu.exec(event.globalPos()) == create_action:
+                self.createRequested.emit()
@@ -0,0 +1,127 @@
+"""
+Global search dialog (Ctrl+K) across all collections.
+"""
+from typing import List, Optional, Tuple
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QCheckBox, QListWidget, QListWidgetItem, QLabel, QWidget
+from PyQt6.QtCore import Qt, QEvent, QObject, QTimer
+from PyQt6.QtGui import QKeyEvent
+from db.mongo_handler import MongoDBHandler
+from db.search_indexer import TextSearchWorker
+from models.search_index import SearchIndex, SearchHit
+
+# Quiet time after the last keystroke before a query runs (longer for server round trips)
+SEARCH_DELAY_MS = 80
+SERVER_SEARCH_DELAY_MS = 300
+
+class SearchDialog(QDialog):
+    """Type to search names, tags, descriptions, granted tags, stats and abilities everywhere.
+
+    Up/Down move through the results and Enter picks one; `selected` then
+    holds its (collection, full_tag). Queries go to the in-memory index,
+    or with the server option to the MongoDB text index (whole words only,
+    no stat or ability keys). The index can arrive after the dialog opens
+    (set_index), in which case the current query runs again.
+    """
+    def __init__(self, index: Optional[SearchIndex], db_handler: MongoDBHandler, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Search")
+        self.resize(600, 450)
+        self.index = index
+        self.db_handler = db_handler
+        self.selected: Optional[Tuple[str, str]] = None
+        self._generation = 0
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText("Search all collections by name, tag, description, stat or ability")
+        self.query_edit.setClearButtonEnabled(True)
+        self.query_edit.installEventFilter(self)
+        layout.addWidget(self.query_edit)
+        self.server_check = QCheckBox("Search on the server (MongoDB text index)", self)
+        self.server_check.setEnabled(db_handler.db is not None)
+        layout.addWidget(self.server_check)
+        self.results = QListWidget(self)
+        layout.addWidget(self.results)
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.run_query)
+        self.query_edit.textChanged.connect(self._schedule)
+        self.server_check.toggled.connect(self._schedule)
+        self.results.itemActivated.connect(self.pick)
+        self._update_status()
+
+    def set_index(self, index: SearchIndex) -> None:
+        self.index = index
+        self.run_query()
+
+    def _schedule(self) -> None:
+        self._timer.start(SERVER_SEARCH_DELAY_MS if self.server_check.isChecked() else SEARCH_DELAY_MS)
+
+    def _update_status(self, text: str = '') -> None:
+        if not text and self.index is None and not self.server_check.isChecked():
+            text = "Building the search index..."
+        self.status_label.setText(text)
+
+    def run_query(self) -> None:
+        self._timer.stop()
+        self._generation += 1
+        query = self.query_edit.text().strip()
+        if not query:
+            self.show_hits([])
+            return
+        if self.server_check.isChecked():
+            worker = TextSearchWorker(self.db_handler, query, self._generation, parent=self)
+            worker.searchFinished.connect(self.on_server_hits)
+            worker.searchFailed.connect(lambda generation, message: generation == self._generation and self._update_status(message))
+            worker.finished.connect(worker.deleteLater)
+            worker.start()
+            self._update_status("Searching the server...")
+            return
+        if self.index is None:
+            self._update_status()
+            return
+        self.show_hits(self.index.search(query))
+
+    def on_server_hits(self, generation: int, hits: List[SearchHit]) -> None:
+        if generation == self._generation:
+            self.show_hits(hits)
+
+    def show_hits(self, hits: List[SearchHit]) -> None:
+        self.results.clear()
+        for hit in hits:
+            label = f"{hit.display_name or hit.full_tag.rpartition('.')[2]}  —  {hit.full_tag}  [{hit.collection}]"
+            item = QListWidgetItem(label)
+            item.setData(Qt.ItemDataRole.UserRole, (hit.collection, hit.full_tag))
+            if hit.fields:
+                item.setToolTip("Matched in: " + ", ".join(hit.fields))
+            self.results.addItem(item)
+        if hits:
+            self.results.setCurrentRow(0)
+        self._update_status(f"{len(hits)} results" if self.query_edit.text().strip() else "")
+
+    def pick(self, item: Optional[QListWidgetItem] = None) -> None:
+        item = item or self.results.currentItem()
+        if item is None:
+            return
+        self.selected = item.data(Qt.ItemDataRole.UserRole)
+        self.accept()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        # Keep typing in the query box while Up/Down/Enter drive the result list
+        if obj is self.query_edit and isinstance(event, QKeyEvent) and event.type() == QEvent.Type.KeyPress:
+            key = event.key()
+            if key in (Qt.Key.Key_Up, Qt.Key.Key_Down, Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+                self.results.keyPressEvent(event)
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                if self._timer.isActive():
+                    self.run_query()
+                self.pick()
+                return True
+        return super().eventFilter(obj, event)
+
+    def done(self, result: int) -> None:
+        self._timer.stop()
+        self._generation += 1  # drop server answers still in flight
+        super().done(result)
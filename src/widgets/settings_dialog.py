@@ -1,21 +1,91 @@
 """
-Stub settings dialog for future configuration options.
+Settings dialog for the MongoDB connection of the active profile.
 """
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QDialog, QFormLayout, QLabel, QPushButton, QHBoxLayout, QSpinBox, QComboBox, QCheckBox, QWidget, QMessageBox
+from db.connection_manager import ConnectionManager, ConnectionProfile, ConnectionSettings, READ_PREFERENCES, COMPRESSORS
 
 class SettingsDialog(QDialog):
-    def __init__(self, parent=None):
+    """Edits the pool, timeout, compression and read preference settings of a connection profile.
+
+    Saving persists the settings and drops the profile's client; the caller
+    reconnects so the new pool takes effect.
+    """
+    def __init__(self, manager: ConnectionManager, profile: ConnectionProfile, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Settings")
         self.resize(500, 600)  # Match NewDialog dimensions
-        layout = QVBoxLayout(self)
-        label = QLabel("TO DO", self)
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        label.setStyleSheet("font-size: 32px; color: #888; font-weight: bold;")
-        layout.addWidget(label, alignment=Qt.AlignmentFlag.AlignCenter)
-        btn_ok = QPushButton("OK", self)
+        self.manager = manager
+        self.profile = profile
+        self.changed = False
+        settings = manager.settings(profile.name)
+        layout = QFormLayout(self)
+        uri = profile.uri.split('@', 1)[-1] if '@' in profile.uri else profile.uri
+        layout.addRow("Server", QLabel(uri, self))
+        layout.addRow("Database", QLabel(profile.db_name, self))
+        self.max_pool_edit = self._spin_box(1, 1000, settings.max_pool_size)
+        layout.addRow("Max Pool Size", self.max_pool_edit)
+        self.min_pool_edit = self._spin_box(0, 1000, settings.min_pool_size)
+        layout.addRow("Min Pool Size", self.min_pool_edit)
+        self.server_selection_edit = self._spin_box(100, 120000, settings.server_selection_timeout_ms, " ms")
+        layout.addRow("Server Selection Timeout", self.server_selection_edit)
+        self.connect_timeout_edit = self._spin_box(100, 120000, settings.connect_timeout_ms, " ms")
+        layout.addRow("Connect Timeout", self.connect_timeout_edit)
+        self.socket_timeout_edit = self._spin_box(0, 600000, settings.socket_timeout_ms, " ms")
+        self.socket_timeout_edit.setSpecialValueText("None")
+        layout.addRow("Socket Timeout", self.socket_timeout_edit)
+        # Compression: one checkbox per compressor the driver supports
+        compressors_layout = QHBoxLayout()
+        self.compressor_checks = {}
+        for name in COMPRESSORS:
+            check = QCheckBox(name, self)
+            check.setChecked(name in settings.compressors)
+            compressors_layout.addWidget(check)
+            self.compressor_checks[name] = check
+        self.compressor_checks['zstd'].setToolTip("Requires the zstandard package")
+        self.compressor_checks['snappy'].setToolTip("Requires the python-snappy package")
+        compressors_widget = QWidget(self)
+        compressors_widget.setLayout(compressors_layout)
+        layout.addRow("Compression", compressors_widget)
+        self.read_preference_combo = QComboBox(self)
+        self.read_preference_combo.addItems(READ_PREFERENCES)
+        self.read_preference_combo.setCurrentText(settings.read_preference)
+        layout.addRow("Read Preference", self.read_preference_combo)
+        btn_ok = QPushButton("Save", self)
+        btn_cancel = QPushButton("Cancel", self)
+        btn_ok.setDefault(True)
         btn_ok.setMinimumWidth(100)
-        btn_ok.clicked.connect(self.accept)
-        layout.addWidget(btn_ok, alignment=Qt.AlignmentFlag.AlignCenter)
+        btn_cancel.setMinimumWidth(100)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch(1)
+        btn_layout.addWidget(btn_ok)
+        btn_layout.addSpacing(20)
+        btn_layout.addWidget(btn_cancel)
+        btn_layout.addStretch(1)
+        layout.addRow(btn_layout)
         self.setLayout(layout)
+        btn_ok.clicked.connect(self.save)
+        btn_cancel.clicked.connect(self.reject)
+
+    def _spin_box(self, minimum: int, maximum: int, value: int, suffix: str = "") -> QSpinBox:
+        spin_box = QSpinBox(self)
+        spin_box.setRange(minimum, maximum)
+        spin_box.setValue(value)
+        spin_box.setSuffix(suffix)
+        return spin_box
+
+    def save(self) -> None:
+        try:
+            settings = ConnectionSettings(
+                max_pool_size=self.max_pool_edit.value(),
+                min_pool_size=min(self.min_pool_edit.value(), self.max_pool_edit.value()),
+                server_selection_timeout_ms=self.server_selection_edit.value(),
+                connect_timeout_ms=self.connect_timeout_edit.value(),
+                socket_timeout_ms=self.socket_timeout_edit.value(),
+                compressors=[name for name, check in self.compressor_checks.items() if check.isChecked()],
+                read_preference=self.read_preference_combo.currentText(),
+            )
+            self.changed = self.manager.save_settings(self.profile.name, settings)
+        except Exception as e:
+            QMessageBox.warning(self, "Invalid Settings", str(e))
+            return
+        self.accept()
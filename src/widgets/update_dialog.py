@@ -1,13 +1,22 @@
 """
 Dialog for updating an existing document in the active collection.
 """
-from typing import Callable, Optional, Any, Dict, Type
+from typing import Callable, Optional, Any, Dict, Iterable, Tuple, Type
 from PyQt6.QtWidgets import (
-    QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout, QVBoxLayout, QWidget, QPlainTextEdit, QTableWidget, QTableWidgetItem, QMessageBox, QHeaderView, QFileDialog, QLabel
+    QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout, QVBoxLayout, QWidget, QPlainTextEdit, QTableWidget, QTableWidgetItem, QMessageBox, QHeaderView, QFileDialog, QLabel,
+    QComboBox
 )
 from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
 import os
-from utils.helpers import refresh_app
+from utils.helpers import apply_changes, refresh_app
+from db.mongo_handler import CONFLICT, NO_CHANGES
+from db.subtree_mover import MOVE_STARTED
+from models.effective_stats import Effective, merge_abilities, merge_tags
+from models.document_merge import MINE, MISSING, THEIRS, changes, merge
+
+# Marks read-only rows listing what is inherited but not granted by the document itself
+INHERITED_ROLE = Qt.ItemDataRole.UserRole + 1
 
 class TabTableWidget(QTableWidget):
     def __init__(self, *args: Any, **kwargs: Any):
@@ -40,9 +49,12 @@ class UpdateDialog(QDialog):
         collection: str,
         model_cls: Type[Any],
         document: Optional[Dict[str, Any]] = None,
-        on_update: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        on_update: Optional[Callable[[Dict[str, Any]], Any]] = None,
         parent: Optional[QWidget] = None,
         *args,
+        inherited: Optional[Effective] = None,
+        conflict: Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]] = None,
+        also_editing: Iterable[str] = (),
         **kwargs
     ):
         super().__init__(parent, *args, **kwargs)
@@ -50,8 +62,29 @@ class UpdateDialog(QDialog):
         self.on_update = on_update
         self._refresh_parent = parent
         self.document = document or {}
+        # What the document inherits from above; when known, the tables get a read-only Effective column
+        # Set through set_inherited(), which shows the Effective column (possibly after the dialog opened)
+        self.inherited: Optional[Effective] = None
         self.fields = {}
         layout = QFormLayout(self)
+        # Other editors who have this document open, from their presence heartbeats
+        self.presence_label = QLabel(self)
+        self.presence_label.setWordWrap(True)
+        self.presence_label.setStyleSheet("color: #a05a00;")
+        layout.addRow(self.presence_label)
+        self.set_also_editing(also_editing)
+        # Merge view, shown when a save lost to another editor's (see show_conflict)
+        self._merge: Optional[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], list]] = None
+        self.merge_label = QLabel(self)
+        self.merge_label.setWordWrap(True)
+        self.merge_table = QTableWidget(0, 5, self)
+        self.merge_table.setHorizontalHeaderLabels(["Field", "Original", "Theirs", "Yours", "Keep"])
+        self.merge_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.merge_table.verticalHeader().setVisible(False)
+        self.merge_label.hide()
+        self.merge_table.hide()
+        layout.addRow(self.merge_label)
+        layout.addRow(self.merge_table)
         # Name (displayName)
         self.display_name_edit = QLineEdit(self.document.get('displayName', ''))
         layout.addRow("Name", self.display_name_edit)
@@ -144,8 +177,8 @@ class UpdateDialog(QDialog):
         layout.addRow("Additional Tags", self.granted_tags_edit)
         self.fields['grantedTags'] = self.granted_tags_edit
         # Grants Stats (grantStats): key-value pairs with + and - buttons
-        self.stats_table = TabTableWidget(0, 2, self)
-        self.stats_table.setHorizontalHeaderLabels(["Stat", "Value"])
+        self.stats_table = TabTableWidget(0, 3, self)
+        self.stats_table.setHorizontalHeaderLabels(["Stat", "Value", "Effective"])
         self.stats_table.horizontalHeader().setStretchLastSection(True)
         self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         self.stats_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
@@ -157,10 +190,12 @@ class UpdateDialog(QDialog):
             self.stats_table.setItem(row, 0, QTableWidgetItem(""))
             self.stats_table.setItem(row, 1, QTableWidgetItem("0.0"))
             self.stats_table.setCurrentCell(row, 0)
+            self.refresh_effective()
         def remove_stat_row():
             row = self.stats_table.currentRow()
-            if row >= 0:
+            if row >= 0 and not self._is_inherited_row(self.stats_table, row):
                 self.stats_table.removeRow(row)
+                self.refresh_effective()
         self.add_stat_btn.clicked.connect(add_stat_row)
         self.remove_stat_btn.clicked.connect(remove_stat_row)
         stats_btn_layout = QVBoxLayout()
@@ -183,8 +218,8 @@ class UpdateDialog(QDialog):
                 self.stats_table.setItem(row, 0, QTableWidgetItem(str(stat)))
                 self.stats_table.setItem(row, 1, QTableWidgetItem(str(value)))
         # Grants Abilities (grantAbilities): Ability, Req. Level
-        self.abilities_table = TabTableWidget(0, 2, self)
-        self.abilities_table.setHorizontalHeaderLabels(["Ability", "Req. Level"])
+        self.abilities_table = TabTableWidget(0, 3, self)
+        self.abilities_table.setHorizontalHeaderLabels(["Ability", "Req. Level", "Effective"])
         self.abilities_table.horizontalHeader().setStretchLastSection(True)
         self.abilities_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         self.abilities_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
@@ -196,10 +231,12 @@ class UpdateDialog(QDialog):
             self.abilities_table.setItem(row, 0, QTableWidgetItem(""))
             self.abilities_table.setItem(row, 1, QTableWidgetItem("1"))
             self.abilities_table.setCurrentCell(row, 0)
+            self.refresh_effective()
         def remove_ability_row():
             row = self.abilities_table.currentRow()
-            if row >= 0:
+            if row >= 0 and not self._is_inherited_row(self.abilities_table, row):
                 self.abilities_table.removeRow(row)
+                self.refresh_effective()
         self.add_ability_btn.clicked.connect(add_ability_row)
         self.remove_ability_btn.clicked.connect(remove_ability_row)
         abilities_btn_layout = QVBoxLayout()
@@ -221,6 +258,16 @@ class UpdateDialog(QDialog):
                 self.abilities_table.insertRow(row)
                 self.abilities_table.setItem(row, 0, QTableWidgetItem(str(ability)))
                 self.abilities_table.setItem(row, 1, QTableWidgetItem(str(req_level)))
+        # Effective (own plus inherited) grants, kept current as the tables and tags are edited
+        self.effective_tags_label = QLabel("Effective Tags", self)
+        self.effective_tags_edit = QLineEdit(self)
+        self.effective_tags_edit.setReadOnly(True)
+        self.effective_tags_edit.setStyleSheet("font-style: italic; color: grey;")
+        layout.addRow(self.effective_tags_label, self.effective_tags_edit)
+        self.stats_table.cellChanged.connect(self.refresh_effective)
+        self.abilities_table.cellChanged.connect(self.refresh_effective)
+        self.granted_tags_edit.textChanged.connect(self.refresh_effective)
+        self.set_inherited(inherited)
         # Update full_tag as tag changes
         def update_full_tag():
             tag_parts = [collection]
@@ -259,7 +306,7 @@ class UpdateDialog(QDialog):
             for row in range(self.stats_table.rowCount()):
                 stat = self.stats_table.item(row, 0)
                 value = self.stats_table.item(row, 1)
-                if stat and value:
+                if stat and value and not stat.data(INHERITED_ROLE):
                     try:
                         stats[stat.text()] = float(value.text())
                     except ValueError:
@@ -270,7 +317,7 @@ class UpdateDialog(QDialog):
             for row in range(self.abilities_table.rowCount()):
                 ability = self.abilities_table.item(row, 0)
                 req_level = self.abilities_table.item(row, 1)
-                if ability and ability.text().strip():
+                if ability and ability.text().strip() and not ability.data(INHERITED_ROLE):
                     try:
                         abilities[ability.text().strip()] = int(req_level.text()) if req_level and req_level.text().strip() else 1
                     except ValueError:
@@ -279,13 +326,29 @@ class UpdateDialog(QDialog):
             if collection == "Race":
                 data['meshPath'] = self.mesh_edit.text()
             success = False
+            message = ""
+            updated = None
             if callable(self.on_update):
-                success = self.on_update(data)
+                # on_update may return a bool, or (success, message, the updated document)
+                result = self.on_update(data)
+                success, message, updated = result if isinstance(result, tuple) else (result, "", None)
+            if success and message in (NO_CHANGES, MOVE_STARTED):
+                # A move reports back (and patches the views) when it is done
+                QMessageBox.information(self, "No Changes" if message == NO_CHANGES else "Moving", message)
+                self.accept()
+                return
+            if not success and message == CONFLICT and isinstance(updated, dict):
+                # Another editor saved first: merge instead of failing; the next Save is checked against theirs
+                self.show_conflict(dict(self.document), {**self.document, **data}, updated)
+                return
             parent = self.parent()
             while parent and not hasattr(parent, 'db_handler'):
                 parent = parent.parent()
             if success and parent:
-                refresh_app(parent)
+                if updated is not None:
+                    apply_changes(parent, updated=[(self.document.get('full_tag', ''), updated)])
+                else:
+                    refresh_app(parent)
             info_box = QMessageBox(self)
             if success:
                 info_box.setIcon(QMessageBox.Icon.Information)
@@ -296,7 +359,7 @@ class UpdateDialog(QDialog):
             else:
                 info_box.setIcon(QMessageBox.Icon.Critical)
                 info_box.setWindowTitle("Update Failed")
-                info_box.setText("Failed to update document.")
+                info_box.setText(f"Failed to update document.\n\n{message}" if message else "Failed to update document.")
                 info_box.setStandardButtons(QMessageBox.StandardButton.Ok)
                 info_box.buttonClicked.connect(self.reject)
             info_box.exec()
@@ -304,3 +367,168 @@ class UpdateDialog(QDialog):
                 self.reject()
         btn_ok.clicked.connect(accept)
         btn_cancel.clicked.connect(self.reject)
+        if conflict is not None:
+            self.show_conflict(*conflict)
+
+    def set_inherited(self, inherited: Optional[Effective]) -> None:
+        """Show what the document inherits (the Effective column, inherited rows and tags), or hide it with None."""
+        self.inherited = inherited
+        for table in (self.stats_table, self.abilities_table):
+            table.setColumnHidden(2, inherited is None)
+            if inherited is None:
+                table.blockSignals(True)
+                for row in reversed(range(table.rowCount())):
+                    if self._is_inherited_row(table, row):
+                        table.removeRow(row)
+                table.blockSignals(False)
+        self.effective_tags_label.setVisible(inherited is not None)
+        self.effective_tags_edit.setVisible(inherited is not None)
+        self.refresh_effective()
+
+    def set_also_editing(self, editors: Iterable[str]) -> None:
+        editors = list(editors)
+        self.presence_label.setText(f"Also open in {', '.join(editors)}'s editor; whoever saves second will be asked to merge." if editors else "")
+        self.presence_label.setVisible(bool(editors))
+
+    def show_conflict(self, base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any]) -> None:
+        """Show a field-level merge of an edit that lost to another editor's save, and fill the form with it.
+
+        base is what the edit started from, mine the edit and theirs the
+        document as stored now. The dialog's document becomes theirs (in
+        place, so an on_update holding it saves against theirs' version).
+        """
+        found = changes(base, mine, theirs)
+        self._merge = (base, mine, theirs, found)
+        self.document.clear()
+        self.document.update(theirs)
+        both = [change for change in found if change.conflict]
+        who = theirs.get('updatedBy') or "Another editor"
+        text = f"{who} saved this document while you were editing it. "
+        if both:
+            text += f"{len(both)} of the changes below were made on both sides (highlighted); choose which value to keep. "
+        else:
+            text += "Your changes and theirs do not overlap. "
+        self.merge_label.setText(text + "The form shows the merged document; Save stores it.")
+        self.merge_table.setRowCount(len(found))
+        for row, change in enumerate(found):
+            for column, value in enumerate((change.path, change.base, change.theirs, change.mine)):
+                item = QTableWidgetItem(change.path if column == 0 else self._merge_text(value))
+                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                if change.conflict:
+                    item.setBackground(QColor("#fde2e2"))
+                self.merge_table.setItem(row, column, item)
+            keep = QComboBox(self.merge_table)
+            keep.addItem("Yours", MINE)
+            keep.addItem("Theirs", THEIRS)
+            keep.setCurrentIndex(0 if change.default == MINE else 1)
+            keep.currentIndexChanged.connect(self._apply_merge)
+            self.merge_table.setCellWidget(row, 4, keep)
+        self.merge_label.show()
+        self.merge_table.setVisible(bool(found))
+        self._apply_merge()
+
+    @staticmethod
+    def _merge_text(value: Any) -> str:
+        if value is MISSING:
+            return "(none)"
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value)
+        return str(value)
+
+    def _apply_merge(self) -> None:
+        """Fill the form with the merge of the sides picked in the merge view."""
+        if self._merge is None:
+            return
+        base, mine, theirs, found = self._merge
+        choices = {}
+        for row, change in enumerate(found):
+            keep = self.merge_table.cellWidget(row, 4)
+            if isinstance(keep, QComboBox):
+                choices[change.path] = keep.currentData()
+        self._fill_form(merge(base, mine, theirs, choices, found))
+
+    def _fill_form(self, document: Dict[str, Any]) -> None:
+        self.display_name_edit.setText(str(document.get('displayName') or ''))
+        self.tag_edit.setText(str(document.get('tag') or ''))
+        self.icon_edit.setText(str(document.get('iconPath') or ''))
+        if hasattr(self, 'mesh_edit'):
+            self.mesh_edit.setText(str(document.get('meshPath') or ''))
+        self.desc_edit.setPlainText(str(document.get('description') or ''))
+        granted = document.get('grantedTags') or []
+        self.granted_tags_edit.setPlainText("\n".join(str(tag) for tag in granted) if isinstance(granted, list) else str(granted))
+        for table, values in ((self.stats_table, document.get('grantStats')), (self.abilities_table, document.get('grantAbilities'))):
+            table.blockSignals(True)
+            table.setRowCount(0)
+            for key, value in (values or {}).items():
+                row = table.rowCount()
+                table.insertRow(row)
+                table.setItem(row, 0, QTableWidgetItem(str(key)))
+                table.setItem(row, 1, QTableWidgetItem(str(value)))
+            table.blockSignals(False)
+        self.refresh_effective()
+
+    @staticmethod
+    def _is_inherited_row(table: QTableWidget, row: int) -> bool:
+        item = table.item(row, 0)
+        return item is not None and bool(item.data(INHERITED_ROLE))
+
+    def refresh_effective(self) -> None:
+        """Recompute the Effective column and the inherited-only rows from the form and the inherited grants."""
+        if self.inherited is None:
+            return
+        def number(item: Optional[QTableWidgetItem], convert: Callable[[str], Any], default: Any) -> Any:
+            try:
+                return convert(item.text()) if item is not None and item.text().strip() else default
+            except ValueError:
+                return default
+        inherited_stats = self.inherited.stats
+        self._sync_effective_rows(self.stats_table, lambda item: number(item, float, 0.0), inherited_stats,
+                                  lambda own: {**inherited_stats, **{k: inherited_stats.get(k, 0.0) + v for k, v in own.items()}})
+        self._sync_effective_rows(self.abilities_table, lambda item: number(item, int, 1), self.inherited.abilities,
+                                  lambda own: merge_abilities(self.inherited.abilities, own))
+        own_tags = [t.strip() for t in self.granted_tags_edit.toPlainText().splitlines() if t.strip()]
+        self.effective_tags_edit.setText(", ".join(merge_tags(self.inherited.tags, own_tags)))
+
+    def _sync_effective_rows(
+        self,
+        table: QTableWidget,
+        value_of: Callable[[Optional[QTableWidgetItem]], Any],
+        inherited: Dict[str, Any],
+        merge: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ) -> None:
+        # Own rows come first; inherited-only rows are rebuilt after them, greyed out and read-only
+        table.blockSignals(True)
+        try:
+            for row in reversed(range(table.rowCount())):
+                if self._is_inherited_row(table, row):
+                    table.removeRow(row)
+            own: Dict[str, Any] = {}
+            for row in range(table.rowCount()):
+                key_item = table.item(row, 0)
+                key = key_item.text().strip() if key_item is not None else ''
+                if key:
+                    own[key] = value_of(table.item(row, 1))
+            effective = merge(own)
+            grey = QColor("grey")
+            for row in range(table.rowCount()):
+                key_item = table.item(row, 0)
+                key = key_item.text().strip() if key_item is not None else ''
+                item = QTableWidgetItem(str(effective[key]) if key in effective else "")
+                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                item.setForeground(grey)
+                table.setItem(row, 2, item)
+            for key in inherited:
+                if key in own:
+                    continue
+                row = table.rowCount()
+                table.insertRow(row)
+                for column, text in enumerate((key, "", str(effective[key]))):
+                    item = QTableWidgetItem(text)
+                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                    item.setForeground(grey)
+                    item.setToolTip("Inherited")
+                    if column == 0:
+                        item.setData(INHERITED_ROLE, True)
+                    table.setItem(row, column, item)
+        finally:
+            table.blockSignals(False)
@@ -0,0 +1,89 @@
+"""
+Bulk importer writes against an in-memory collection.
+"""
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from db.bulk_importer import BulkImporter, prepare_document
+
+NOW = datetime(2026, 1, 1)
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(name, self))
+
+    def command(self, name):
+        return {'localTime': NOW}
+
+class FakeCollection:
+    """Just enough of insert_many and bulk_write (upserts with $set/$setOnInsert/$inc) for the importer."""
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+        self.docs = {}
+        self.requests = []
+
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            self.docs[document['full_tag']] = dict(document)
+        return SimpleNamespace(inserted_ids=[document['full_tag'] for document in documents])
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests.extend(requests)
+        matched = upserted = 0
+        for request in requests:
+            update = request._doc
+            stored = self.docs.get(request._filter['full_tag'])
+            if stored is None:
+                stored = self.docs[request._filter['full_tag']] = dict(update.get('$setOnInsert', {}))
+                upserted += 1
+            else:
+                matched += 1
+            stored.update(update['$set'])
+            stored['version'] = stored.get('version', 0) + update['$inc']['version']
+            stored['updatedAt'] = NOW
+        return SimpleNamespace(matched_count=matched, upserted_count=upserted)
+
+def jsonl(*records):
+    return io.BytesIO(''.join(json.dumps(record) + '\n' for record in records).encode())
+
+def test_prepare_document_separates_defaults():
+    fields, defaults = prepare_document('Race', {'tag': 'Elf.Wood', 'description': 'Green'})
+    assert fields['full_tag'] == 'Race.Elf.Wood' and fields['displayName'] == 'Wood'
+    assert fields['description'] == 'Green' and fields['parent_tag'] == 'Race.Elf'
+    assert 'description' not in defaults and defaults['grantedTags'] == []
+
+def test_insert_stamps_version_and_updated_at():
+    db = FakeDatabase()
+    report = BulkImporter(db, 'Race').run(jsonl({'tag': 'Elf'}), 'jsonl')
+    assert report.inserted == 1
+    stored = db['Race'].docs['Race.Elf']
+    assert stored['version'] == 1 and stored['updatedAt'] == NOW
+    assert stored['grantedTags'] == [] and stored['depth'] == 1
+
+def test_upsert_keeps_fields_missing_from_the_file():
+    db = FakeDatabase()
+    db['Race'].docs['Race.Elf'] = {'full_tag': 'Race.Elf', 'tag': 'Elf', 'description': 'Kept', 'grantedTags': ['Race.Human'], 'version': 3}
+    report = BulkImporter(db, 'Race', upsert=True).run(jsonl({'tag': 'Elf', 'iconPath': 'elf.png'}, {'tag': 'Orc'}), 'jsonl')
+    assert (report.inserted, report.updated) == (1, 1)
+    elf = db['Race'].docs['Race.Elf']
+    assert elf['description'] == 'Kept' and elf['grantedTags'] == ['Race.Human']
+    assert elf['iconPath'] == 'elf.png' and elf['version'] == 4
+    # New documents still get the model's defaults
+    orc = db['Race'].docs['Race.Orc']
+    assert orc['grantedTags'] == [] and orc['description'] == ''
+    update = db['Race'].requests[0]._doc
+    assert 'description' not in update['$set'] and 'description' in update['$setOnInsert']
+
+def test_duplicate_rows_in_a_batch_are_counted_as_skipped():
+    db = FakeDatabase()
+    rows = jsonl({'tag': 'Elf', 'description': 'First'}, {'tag': 'Orc'}, {'tag': 'Elf', 'description': 'Last'}, {'description': 'No tag'})
+    report = BulkImporter(db, 'Race', upsert=True).run(rows, 'jsonl')
+    assert report.read == report.inserted + report.updated + report.failed + report.skipped == 4
+    assert report.skipped == 1 and report.warnings[0].row == 1 and report.warnings[0].full_tag == 'Race.Elf'
+    assert db['Race'].docs['Race.Elf']['description'] == 'Last'
+    assert '1 skipped' in report.summary()
@@ -0,0 +1,83 @@
+"""
+Three-way merge of a refused edit with the document another editor saved.
+"""
+from models.document_merge import MINE, MISSING, THEIRS, changes, flatten, merge
+
+BASE = {
+    '_id': 1, 'version': 3, 'full_tag': 'Race.Elf', 'displayName': 'Elf', 'description': 'Old',
+    'grantStats': {'Strength': 1.0, 'Agility': 2.0}, 'grantAbilities': {'Blink': 1}, 'grantedTags': ['Race.Human'],
+}
+
+def edited(**fields):
+    return {**BASE, **fields}
+
+def by_path(found):
+    return {change.path: change for change in found}
+
+def test_unchanged_documents_have_no_changes():
+    assert changes(BASE, dict(BASE), dict(BASE)) == []
+    assert merge(BASE, dict(BASE), edited(version=4)) == edited(version=4)
+
+def test_disjoint_stat_keys_keep_both_sides():
+    mine = edited(grantStats={'Strength': 5.0, 'Agility': 2.0})
+    theirs = edited(version=4, grantStats={'Strength': 1.0, 'Agility': 7.0})
+    found = changes(BASE, mine, theirs)
+    assert not any(change.conflict for change in found)
+    merged = merge(BASE, mine, theirs)
+    assert merged['grantStats'] == {'Strength': 5.0, 'Agility': 7.0}
+    # Saved against the other editor's version
+    assert merged['version'] == 4 and merged['_id'] == 1
+
+def test_disjoint_fields_keep_both_sides():
+    merged = merge(BASE, edited(displayName='High Elf'), edited(description='New'))
+    assert merged['displayName'] == 'High Elf' and merged['description'] == 'New'
+
+def test_conflicts_default_to_mine_until_theirs_is_chosen():
+    mine = edited(displayName='Mine', grantStats={'Strength': 5.0, 'Agility': 2.0})
+    theirs = edited(displayName='Theirs', grantStats={'Strength': 9.0, 'Agility': 2.0})
+    found = by_path(changes(BASE, mine, theirs))
+    assert found['displayName'].conflict and found['displayName'].default == MINE
+    assert found['grantStats.Strength'].conflict
+    assert merge(BASE, mine, theirs)['displayName'] == 'Mine'
+    merged = merge(BASE, mine, theirs, {'displayName': THEIRS, 'grantStats.Strength': THEIRS})
+    assert merged['displayName'] == 'Theirs' and merged['grantStats']['Strength'] == 9.0
+
+def test_same_change_on_both_sides_is_no_conflict():
+    found = by_path(changes(BASE, edited(displayName='Same'), edited(displayName='Same')))
+    assert not found['displayName'].conflict
+
+def test_deletions_merge_per_key():
+    # Mine removed Agility, theirs removed Blink; both removals stand
+    mine = edited(grantStats={'Strength': 1.0})
+    theirs = edited(grantAbilities={})
+    found = by_path(changes(BASE, mine, theirs))
+    assert found['grantStats.Agility'].mine is MISSING
+    assert found['grantAbilities.Blink'].theirs is MISSING
+    merged = merge(BASE, mine, theirs)
+    assert merged['grantStats'] == {'Strength': 1.0}
+    assert merged['grantAbilities'] == {}
+
+def test_deletion_against_an_edit_is_a_conflict():
+    mine = edited(grantStats={'Strength': 1.0})
+    theirs = edited(grantStats={'Strength': 1.0, 'Agility': 4.0})
+    found = by_path(changes(BASE, mine, theirs))
+    assert found['grantStats.Agility'].conflict
+    assert 'Agility' not in merge(BASE, mine, theirs)['grantStats']
+    assert merge(BASE, mine, theirs, {'grantStats.Agility': THEIRS})['grantStats']['Agility'] == 4.0
+
+def test_none_maps_count_as_empty():
+    assert flatten({'grantStats': None, 'grantAbilities': 'junk'}) == {}
+    # An unset map in base and theirs against the dialog's empty map is no change at all
+    assert changes({'grantStats': None}, {'grantStats': {}}, {'grantStats': None}) == []
+
+def test_none_maps_against_added_keys_merge_without_errors():
+    base, mine, theirs = {'grantStats': None}, {'grantStats': {'Str': 5}}, {'grantStats': None}
+    assert [change.path for change in changes(base, mine, theirs)] == ['grantStats.Str']
+    assert merge(base, mine, theirs) == {'grantStats': {'Str': 5}}
+    assert merge(base, mine, theirs, {'grantStats.Str': THEIRS}) == {'grantStats': {}}
+    # A choice for the whole field (no such row exists any more) is ignored
+    assert merge(base, mine, theirs, {'grantStats': THEIRS}) == {'grantStats': {'Str': 5}}
+
+def test_keys_added_to_none_on_their_side():
+    merged = merge({'grantAbilities': None}, {'grantAbilities': None}, {'grantAbilities': {'Blink': 2}})
+    assert merged == {'grantAbilities': {'Blink': 2}}
@@ -0,0 +1,85 @@
+"""
+Effective grants kept up to date by update()/remove_subtree() must match a rebuild from scratch.
+"""
+import random
+from typing import Dict
+import pytest
+from models.effective_stats import EffectiveStats
+
+STATS = ['Strength', 'Agility', 'Intellect', 'Luck']
+ABILITIES = ['Blink', 'Cleave', 'Heal']
+
+def random_grants(rng: random.Random) -> dict:
+    return {
+        'grantStats': {stat: rng.randint(-3, 5) for stat in rng.sample(STATS, rng.randint(0, 3))},
+        'grantAbilities': {ability: rng.randint(1, 10) for ability in rng.sample(ABILITIES, rng.randint(0, 2))},
+        'grantedTags': rng.sample(['Race.Elf', 'Race.Orc', 'Profession.Smith'], rng.randint(0, 2)),
+    }
+
+def random_tree(rng: random.Random, count: int) -> Dict[str, dict]:
+    tags = ['Class.Warrior']
+    for i in range(count):
+        tags.append(f"{rng.choice(tags)}.N{i}")
+    # Some paths have no document; their children inherit from the nearest document above
+    return {tag: {'full_tag': tag, **random_grants(rng)} for tag in tags if rng.random() < 0.85}
+
+def assert_matches_rebuild(stats: EffectiveStats, documents: Dict[str, dict]) -> None:
+    fresh = EffectiveStats('Class', [dict(doc) for doc in documents.values()])
+    assert set(stats.matrix()[0]) == set(documents)
+    for tag in documents:
+        assert stats.effective(tag) == fresh.effective(tag), tag
+    for tag in ['Class.Warrior.Missing', 'Class.Other']:
+        assert stats.inherited(tag) == fresh.inherited(tag)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_changes_match_a_rebuild(seed):
+    rng = random.Random(seed)
+    documents = random_tree(rng, 60)
+    stats = EffectiveStats('Class', [dict(doc) for doc in documents.values()])
+    for step in range(25):
+        # Query everything first, so the next change goes through the incremental paths
+        for tag in documents:
+            stats.effective(tag)
+        action = rng.random()
+        if action < 0.4 and documents:
+            tag = rng.choice(sorted(documents))
+            documents[tag].update(random_grants(rng))
+            stats.update(dict(documents[tag]))
+        elif action < 0.55:
+            parent = rng.choice(sorted(documents) or ['Class.Warrior'])
+            tag = f"{parent}.S{step}"
+            documents[tag] = {'full_tag': tag, **random_grants(rng)}
+            stats.update(dict(documents[tag]))
+        elif action < 0.7 and documents:
+            tag = rng.choice(sorted(documents))
+            stats.remove_subtree(tag)
+            for removed in [t for t in documents if t == tag or t.startswith(tag + '.')]:
+                del documents[removed]
+        elif documents:
+            # Reparent a subtree: each document arrives retagged, carrying no grant fields
+            tag = rng.choice(sorted(documents))
+            targets = [t for t in documents if not (t == tag or t.startswith(tag + '.'))]
+            new_tag = f"{rng.choice(targets) if targets else 'Class'}.M{step}"
+            for old in sorted(t for t in documents if t == tag or t.startswith(tag + '.')):
+                moved = new_tag + old[len(tag):]
+                documents[moved] = {**documents.pop(old), 'full_tag': moved}
+                stats.update({'full_tag': moved}, old_tag=old)
+        assert_matches_rebuild(stats, documents)
+
+def test_reparented_subtree_inherits_from_its_new_parent():
+    documents = {
+        'Class.Warrior': {'full_tag': 'Class.Warrior', 'grantStats': {'Strength': 2}, 'grantAbilities': {'Cleave': 3}},
+        'Class.Mage': {'full_tag': 'Class.Mage', 'grantStats': {'Intellect': 4}, 'grantedTags': ['Race.Elf']},
+        'Class.Warrior.Berserker': {'full_tag': 'Class.Warrior.Berserker', 'grantStats': {'Strength': 1}},
+        'Class.Warrior.Berserker.Rage': {'full_tag': 'Class.Warrior.Berserker.Rage', 'grantAbilities': {'Cleave': 1}},
+    }
+    stats = EffectiveStats('Class', [dict(doc) for doc in documents.values()])
+    assert stats.effective('Class.Warrior.Berserker.Rage').stats == {'Strength': 3.0}
+    for old in ['Class.Warrior.Berserker', 'Class.Warrior.Berserker.Rage']:
+        new = 'Class.Mage' + old[len('Class.Warrior'):]
+        documents[new] = {**documents.pop(old), 'full_tag': new}
+        stats.update({'full_tag': new}, old_tag=old)
+    rage = stats.effective('Class.Mage.Berserker.Rage')
+    assert rage.stats == {'Intellect': 4.0, 'Strength': 1.0}
+    assert rage.abilities == {'Cleave': 1} and rage.tags == ['Race.Elf']
+    assert_matches_rebuild(stats, documents)
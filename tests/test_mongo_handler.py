@@ -0,0 +1,72 @@
+"""
+Update documents built by diff_update: only changed fields and map keys are sent.
+"""
+from db.mongo_handler import NO_CHANGES, MongoDBHandler, diff_update, with_hierarchy_fields
+
+ORIGINAL = {
+    '_id': 1, 'full_tag': 'Race.Elf', 'displayName': 'Elf', 'description': 'Old',
+    'grantStats': {'Strength': 1.0, 'Agility': 2.0}, 'grantAbilities': {'Blink': 1},
+    'grantedTags': ['Race.Human', 'Race.Orc'],
+}
+
+def test_unchanged_document_needs_no_update():
+    assert diff_update(ORIGINAL, dict(ORIGINAL)) == {}
+    # Fields the form does not send are left alone, and None stands for a field never set
+    assert diff_update(ORIGINAL, {'displayName': 'Elf', 'iconPath': None}) == {}
+
+def test_changed_fields_and_map_keys_are_set_individually():
+    update = diff_update(ORIGINAL, {**ORIGINAL, 'description': 'New', 'grantStats': {'Strength': 3.0, 'Agility': 2.0, 'Luck': 1.0}})
+    assert update == {'$set': {'description': 'New', 'grantStats.Strength': 3.0, 'grantStats.Luck': 1.0}}
+
+def test_map_keys_dropped_by_the_form_are_unset():
+    update = diff_update(ORIGINAL, {**ORIGINAL, 'grantStats': {'Strength': 1.0}, 'grantAbilities': {}})
+    assert update == {'$unset': {'grantStats.Agility': '', 'grantAbilities.Blink': ''}}
+
+def test_nested_map_keys_are_diffed_recursively():
+    original = {'customFields': {'lore': {'origin': 'Forest', 'era': 'First'}}}
+    update = diff_update(original, {'customFields': {'lore': {'origin': 'Forest'}, 'extra': 1}})
+    assert update == {'$set': {'customFields.extra': 1}, '$unset': {'customFields.lore.era': ''}}
+
+def test_lists_are_replaced_whole():
+    update = diff_update(ORIGINAL, {**ORIGINAL, 'grantedTags': ['Race.Human']})
+    assert update == {'$set': {'grantedTags': ['Race.Human']}}
+    assert diff_update(ORIGINAL, {'grantedTags': ['Race.Orc', 'Race.Human']}) == {'$set': {'grantedTags': ['Race.Orc', 'Race.Human']}}
+
+def test_maps_with_keys_unusable_in_paths_are_replaced_whole():
+    original = {'grantStats': {'Fire.Resist': 1}}
+    new = {'grantStats': {'Fire.Resist': 2}}
+    assert diff_update(original, new) == {'$set': {'grantStats': {'Fire.Resist': 2}}}
+
+def test_map_replacing_a_scalar_is_set_whole():
+    assert diff_update({'grantStats': None}, {'grantStats': {'Strength': 1}}) == {'$set': {'grantStats': {'Strength': 1}}}
+    assert diff_update({}, {'grantStats': {'Strength': 1}}) == {'$set': {'grantStats': {'Strength': 1}}}
+
+class FakeCollection:
+    def __init__(self, document):
+        self.document = document
+        self.calls = []
+
+    def find_one_and_update(self, query, update, **kwargs):
+        self.calls.append((query, update))
+        return {**self.document, **update.get('$set', {})}
+
+def handler_with(document):
+    handler = MongoDBHandler('mongodb://localhost', 'test')
+    handler.db = {'Race': FakeCollection(document)}
+    return handler
+
+def test_update_document_without_changes_sends_nothing():
+    stored = with_hierarchy_fields({**ORIGINAL, 'version': 4})
+    handler = handler_with(stored)
+    assert handler.update_document('Race', 1, dict(stored), original=dict(stored)) == (True, NO_CHANGES, stored)
+    assert handler.db['Race'].calls == []
+
+def test_update_document_sends_the_diff_at_the_next_version():
+    stored = with_hierarchy_fields({**ORIGINAL, 'version': 4})
+    handler = handler_with(stored)
+    success, _, _ = handler.update_document('Race', 1, {**stored, 'grantStats': {'Strength': 1.0}}, original=dict(stored))
+    [(query, update)] = handler.db['Race'].calls
+    assert success and query == {'_id': 1, 'version': 4}
+    assert update['$unset'] == {'grantStats.Agility': ''}
+    assert update['$set'] == {'version': 5, 'updatedBy': handler.editor}
+    assert update['$currentDate'] == {'updatedAt': True}
@@ -0,0 +1,203 @@
+"""
+The layout engine must place boxes exactly where the recursive layout in
+Canvas._draw_org_chart placed them before it was replaced.
+"""
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+import pytest
+from models.hierarchy import ExpansionState, HierarchyModel, VisibleHierarchy
+from utils.org_chart_layout import (
+    BOX_SIZE, H_SPACING, MARGIN, V_SPACING, compute_positions, compute_subtree_widths, layout_documents, layout_hierarchy,
+    patch_layout,
+)
+
+def legacy_tree(documents: List[dict]) -> Tuple[List[str], Dict[str, List[str]]]:
+    # The tree building of the old _draw_org_chart: a document hangs under its parent tag if that came first
+    nodes, children_map, roots = {}, {}, []
+    for doc in documents:
+        full_tag = doc.get('full_tag', '')
+        nodes[full_tag] = doc
+        parent_tag = '.'.join(full_tag.split('.')[:-1]) if '.' in full_tag else None
+        if parent_tag and parent_tag in nodes:
+            children_map.setdefault(parent_tag, []).append(full_tag)
+        else:
+            roots.append(full_tag)
+    return roots, children_map
+
+def legacy_layout(roots: List[str], children_map: Dict[str, List[str]]) -> Dict[str, Tuple[int, int]]:
+    # calc_subtree_width/place_boxes as they were, minus the widgets
+    positions: Dict[str, Tuple[int, int]] = {}
+    def calc_subtree_width(tag: str) -> int:
+        children = children_map.get(tag, [])
+        if not children:
+            return BOX_SIZE
+        width = 0
+        for child in children:
+            width += calc_subtree_width(child)
+        width += H_SPACING * (len(children) - 1) if len(children) > 1 else 0
+        return max(width, BOX_SIZE)
+    def place_boxes(tag: str, x: int, y: int) -> None:
+        children = children_map.get(tag, [])
+        subtree_width = calc_subtree_width(tag)
+        positions[tag] = (int(x + subtree_width / 2 - BOX_SIZE / 2), y)
+        total_width = 0
+        for child in children:
+            child_width = calc_subtree_width(child)
+            place_boxes(child, x + total_width, y + BOX_SIZE + V_SPACING)
+            total_width += child_width + H_SPACING
+    x = y = 40
+    for root in roots:
+        width = calc_subtree_width(root)
+        place_boxes(root, x, y)
+        x += width + H_SPACING
+    return positions
+
+def random_documents(rng: random.Random, count: int, max_children: int = 6) -> List[dict]:
+    """A random tree under Race, parents listed before their children."""
+    tags = ['Race.R0']
+    documents = [{'full_tag': 'Race.R0'}]
+    counters: Dict[str, int] = {}
+    while len(documents) < count:
+        parent = rng.choice(tags) if rng.random() < 0.9 else 'Race'
+        if counters.get(parent, 0) >= max_children:
+            continue
+        counters[parent] = counters.get(parent, 0) + 1
+        tag = f"{parent}.N{len(documents)}"
+        tags.append(tag)
+        documents.append({'full_tag': tag})
+    return documents
+
+@pytest.mark.parametrize('seed', range(20))
+def test_in_order_trees_match_legacy(seed):
+    documents = random_documents(random.Random(seed), 300)
+    roots, children_map = legacy_tree(documents)
+    expected = legacy_layout(roots, children_map)
+    widths = compute_subtree_widths(roots, children_map)
+    assert compute_positions(roots, children_map, widths) == expected
+    assert layout_documents(documents).positions == expected
+    assert layout_hierarchy(HierarchyModel('Race', documents)).positions == expected
+
+@pytest.mark.parametrize('seed', range(10))
+def test_shuffled_documents_lay_out_like_in_order(seed):
+    # The hierarchy model resolves parents whatever the load order, which the old code did not
+    documents = random_documents(random.Random(seed), 300)
+    expected = legacy_layout(*legacy_tree(documents))
+    shuffled = documents[:]
+    random.Random(seed).shuffle(shuffled)
+    hierarchy = HierarchyModel('Race', shuffled)
+    # Sibling order follows load order; lay both out from the model's tree to compare placement rules
+    assert layout_hierarchy(hierarchy).positions == legacy_layout(hierarchy.roots(), hierarchy.children_map())
+    assert set(layout_hierarchy(hierarchy).positions) == set(expected)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_virtual_gaps_match_legacy_placement(seed):
+    rng = random.Random(seed)
+    documents = random_documents(rng, 300)
+    # Drop some inner documents: their children hang under the nearest document above the gap
+    inner = {doc['full_tag'].rpartition('.')[0] for doc in documents}
+    gaps = {tag for tag in inner if tag.count('.') > 1 and rng.random() < 0.3}
+    documents = [doc for doc in documents if doc['full_tag'] not in gaps]
+    hierarchy = HierarchyModel('Race', documents)
+    roots, children_map = hierarchy.roots(), hierarchy.children_map()
+    for parent, children in children_map.items():
+        for child in children:
+            between = child[len(parent) + 1:].split('.')[:-1]
+            assert all(f"{parent}.{'.'.join(between[:i + 1])}" in gaps for i in range(len(between)))
+    widths = compute_subtree_widths(roots, children_map)
+    assert compute_positions(roots, children_map, widths) == legacy_layout(roots, children_map)
+    assert layout_hierarchy(hierarchy).positions == legacy_layout(roots, children_map)
+
+def test_deep_hierarchy_matches_legacy():
+    depth = 1500
+    tags = ['Race.' + '.'.join(f'L{i}' for i in range(level + 1)) for level in range(depth)]
+    # A side branch every few levels, so widths change along the chain
+    documents = [{'full_tag': tag} for tag in tags] + [{'full_tag': f'{tag}.Side'} for tag in tags[::7]]
+    roots, children_map = legacy_tree(documents)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 20 * depth))
+    try:
+        expected = legacy_layout(roots, children_map)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert layout_documents(documents).positions == expected
+
+def test_roots_start_at_margin_and_size_covers_boxes():
+    layout = layout_documents([{'full_tag': 'Race.A'}, {'full_tag': 'Race.B'}, {'full_tag': 'Race.A.C'}])
+    assert layout.positions['Race.A'] == (MARGIN, MARGIN)
+    assert layout.width == max(x for x, _ in layout.positions.values()) + BOX_SIZE + MARGIN
+    assert layout.height == max(y for _, y in layout.positions.values()) + BOX_SIZE + MARGIN
+
+def test_fifty_thousand_nodes_lay_out_quickly():
+    documents = random_documents(random.Random(50), 50_000, max_children=8)
+    hierarchy = HierarchyModel('Race', documents)
+    started = time.perf_counter()
+    layout = layout_hierarchy(hierarchy)
+    elapsed = time.perf_counter() - started
+    assert len(layout.positions) == 50_000
+    # About a quarter of a second on a desktop; the bound leaves room for slow CI machines
+    assert elapsed < 3.0
+
+def laid_out_subtree(layout, full_tag: str) -> List[str]:
+    tags, stack = [], [full_tag]
+    while stack:
+        tag = stack.pop()
+        tags.append(tag)
+        stack.extend(layout.children_map.get(tag, []))
+    return tags
+
+@pytest.mark.parametrize('seed', range(15))
+def test_patched_layout_matches_fresh_layout(seed):
+    # Expand, collapse, insert and remove as the canvas does, checking every patch against a full layout
+    rng = random.Random(seed)
+    hierarchy = HierarchyModel('Race', random_documents(rng, 150, max_children=4))
+    visible = VisibleHierarchy(hierarchy, ExpansionState(depth=2))
+    layout = layout_hierarchy(visible)
+    layout.build_indexes()
+    for step in range(40):
+        shown = list(layout.positions)
+        action = rng.random() if shown else 0.5
+        if action < 0.3:
+            tag = rng.choice(shown)
+            if not hierarchy.children(tag):
+                continue
+            expanded = not visible.is_expanded(tag)
+            removed = [] if expanded else laid_out_subtree(layout, tag)[1:]
+            visible.set_expanded(tag, expanded)
+            patch_layout(layout, visible, tag, removed)
+        elif action < 0.65:
+            # A new leaf, sometimes behind a path without a document, sometimes at the top level
+            parent = rng.choice(shown + ['Race'])
+            tag = f"{parent}.S{step}" + (f".T{step}" if rng.random() < 0.3 else "")
+            hierarchy.add({'full_tag': tag})
+            owner = hierarchy.parent(tag)
+            if owner is not None and not visible.is_expanded(owner):
+                continue
+            patch_layout(layout, visible, owner)
+        elif action < 0.75:
+            # A document filling a path without one captures the documents below it
+            gaps = sorted(path for path in {tag.rpartition('.')[0] for tag in shown} if path not in hierarchy and '.' in path)
+            if not gaps:
+                continue
+            tag = rng.choice(gaps)
+            hierarchy.add({'full_tag': tag})
+            owner = hierarchy.parent(tag)
+            if owner is not None and not (owner in layout.positions and visible.is_expanded(owner)):
+                continue
+            removed = []
+            if not visible.is_expanded(tag):
+                for child in hierarchy.children(tag):
+                    if child in layout.positions:
+                        removed.extend(laid_out_subtree(layout, child))
+            patch_layout(layout, visible, owner, removed)
+        else:
+            # Mostly below the top level, so the chart does not empty out
+            tag = rng.choice([tag for tag in shown if hierarchy.parent(tag) is not None] or shown)
+            removed = [doc['full_tag'] for doc in hierarchy.remove_subtree(tag)]
+            patch_layout(layout, visible, hierarchy.parent(tag), [t for t in removed if t in layout.positions])
+        fresh = layout_hierarchy(visible)
+        fresh.build_indexes()
+        assert layout.positions == fresh.positions, f"step {step}"
+        assert layout.fans == fresh.fans, f"step {step}"
+        assert (layout.width, layout.height) == (fresh.width, fresh.height), f"step {step}"
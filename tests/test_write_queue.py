@@ -0,0 +1,162 @@
+"""
+Write-behind queue flushes against an in-memory collection.
+"""
+import re
+from types import SimpleNamespace
+import pytest
+from PyQt6.QtCore import QCoreApplication
+from pymongo import DeleteMany, InsertOne, UpdateOne, errors
+from db.mongo_handler import CONFLICT
+from db.write_queue import PendingWrite, WriteQueue, _check_versions, flush_writes
+
+def matches(doc, query):
+    for key, value in query.items():
+        if key == '$or':
+            if not any(matches(doc, branch) for branch in value):
+                return False
+        elif isinstance(value, dict) and '$in' in value:
+            if doc.get(key) not in value['$in']:
+                return False
+        elif isinstance(value, dict) and '$regex' in value:
+            if not re.search(value['$regex'], doc.get(key) or ''):
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+class FakeCollection:
+    """Ordered bulk_write of InsertOne/UpdateOne/DeleteMany, with a unique full_tag."""
+    def __init__(self, *docs):
+        self.docs = {doc['_id']: dict(doc) for doc in docs}
+        self.batches = []
+
+    def find(self, query):
+        return [dict(doc) for doc in self.docs.values() if matches(doc, query)]
+
+    def bulk_write(self, requests, ordered=True):
+        self.batches.append(list(requests))
+        matched = 0
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                if any(doc.get('full_tag') == request._doc.get('full_tag') for doc in self.docs.values()):
+                    raise errors.BulkWriteError({'writeErrors': [{'index': index, 'code': 11000, 'errmsg': 'duplicate key'}], 'nMatched': matched})
+                self.docs[request._doc['_id']] = dict(request._doc)
+            elif isinstance(request, UpdateOne):
+                for doc in self.find(request._filter):
+                    stored = self.docs[doc['_id']]
+                    stored.update(request._doc.get('$set', {}))
+                    for path in request._doc.get('$unset', {}):
+                        field, _, key = path.partition('.')
+                        if key:
+                            (stored.get(field) or {}).pop(key, None)
+                        else:
+                            stored.pop(field, None)
+                    matched += 1
+            elif isinstance(request, DeleteMany):
+                for doc in self.find(request._filter):
+                    del self.docs[doc['_id']]
+        return SimpleNamespace(matched_count=matched)
+
+class FakeHandler:
+    editor = 'me'
+
+    def __init__(self, **collections):
+        self.db = collections
+
+    def cache_document(self, collection_name, document):
+        pass
+
+    def invalidate_cached(self, collection_name, document_id):
+        pass
+
+    def invalidate_cached_subtree(self, collection_name, full_tag):
+        pass
+
+    def get_document(self, collection_name, document_id):
+        return next(iter(self.db[collection_name].find({'_id': document_id})), None)
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+def elf(**fields):
+    return {'_id': 1, 'full_tag': 'Race.Elf', 'displayName': 'Elf', 'version': 2, **fields}
+
+def test_repeated_edits_of_a_document_coalesce_into_one_update():
+    race = FakeCollection(elf())
+    queue = WriteQueue(FakeHandler(Race=race))
+    queue.update_document('Race', 1, {'displayName': 'Elves'}, original=elf())
+    queue.update_document('Race', 1, {'description': 'Pointy ears'}, original=elf())
+    assert queue.pending == 1
+    assert queue.wait()
+    [[request]] = race.batches
+    # Diffed against the document the first edit started from, at its version
+    assert request._filter == {'_id': 1, 'version': 2}
+    assert request._doc['$set']['displayName'] == 'Elves' and request._doc['$set']['description'] == 'Pointy ears'
+    assert race.docs[1]['version'] == 3 and race.docs[1]['updatedBy'] == 'me'
+
+def test_flush_sends_one_ordered_bulk_write_per_collection():
+    race, cls = FakeCollection(elf()), FakeCollection()
+    queue = WriteQueue(FakeHandler(Race=race, Class=cls))
+    saved = []
+    queue.writesSaved.connect(saved.append)
+    queue.insert_documents('Race', [{'full_tag': 'Race.Orc'}])
+    queue.insert_documents('Class', [{'full_tag': 'Class.Ranger'}])
+    queue.update_document('Race', 1, {'displayName': 'Elves'}, original=elf())
+    queue.delete_subtree('Race', 'Race.Orc')
+    assert queue.wait()
+    assert [[type(request) for request in batch] for batch in race.batches] == [[InsertOne, UpdateOne, DeleteMany]]
+    assert len(cls.batches) == 1
+    assert saved == [4]
+    assert [doc['full_tag'] for doc in race.docs.values()] == ['Race.Elf']
+
+def test_failed_write_rolls_back_it_and_the_writes_after_it():
+    race, cls = FakeCollection(elf()), FakeCollection()
+    queue = WriteQueue(FakeHandler(Race=race, Class=cls))
+    failed, saved = [], []
+    queue.writeFailed.connect(lambda collection, message, rollback: failed.append((collection, message, rollback)))
+    queue.writesSaved.connect(saved.append)
+    queue.insert_documents('Race', [{'full_tag': 'Race.Elf'}])  # taken on the server
+    queue.update_document('Race', 1, {'displayName': 'Elves'}, original=elf())
+    queue.insert_documents('Class', [{'full_tag': 'Class.Ranger'}])
+    queue.wait()
+    assert [collection for collection, _, _ in failed] == ['Race', 'Race']
+    assert 'already exists' in failed[0][1] and failed[0][2] == {'removed': ['Race.Elf']}
+    assert failed[1][1].startswith('Not saved because an earlier write failed')
+    # Undoing the update puts back the document it started from
+    assert failed[1][2] == {'updated': [('Race.Elf', elf())]}
+    assert race.docs[1]['displayName'] == 'Elf'
+    assert saved == [1] and len(cls.docs) == 1
+    assert queue.pending == 0
+
+def test_update_beaten_by_another_editor_is_a_conflict():
+    theirs = elf(displayName='Theirs', version=3, updatedBy='them')
+    race = FakeCollection(theirs)
+    queue = WriteQueue(FakeHandler(Race=race))
+    conflicts = []
+    queue.writeConflict.connect(lambda collection, base, mine, current: conflicts.append((collection, base, mine, current)))
+    queue.update_document('Race', 1, {'displayName': 'Mine'}, original=elf())
+    queue.wait()
+    [(collection, base, mine, current)] = conflicts
+    assert collection == 'Race' and base == elf() and mine['displayName'] == 'Mine'
+    assert current == theirs and race.docs[1] == theirs
+
+def test_check_versions_reads_back_only_when_updates_did_not_match():
+    race = FakeCollection(elf(version=3, updatedBy='me'), {'_id': 2, 'full_tag': 'Race.Orc', 'version': 5, 'updatedBy': 'them'})
+    saved = PendingWrite('update', 'Race', 1, 'Race.Elf', document=elf(version=3, updatedBy='me'), original=elf())
+    beaten = PendingWrite('update', 'Race', 2, 'Race.Orc', document={'_id': 2, 'full_tag': 'Race.Orc', 'version': 5, 'updatedBy': 'me'})
+    gone = PendingWrite('update', 'Race', 3, 'Race.Human', document={'_id': 3, 'full_tag': 'Race.Human', 'version': 1})
+    insert = PendingWrite('insert', 'Race', 4, 'Race.Dwarf', document={'_id': 4, 'full_tag': 'Race.Dwarf'})
+    writes = [saved, beaten, gone, insert]
+    # Every update matched: nothing is read, everything saved
+    assert _check_versions(None, 'Race', writes, 3) == [(write, None) for write in writes]
+    results = dict(_check_versions({'Race': race}, 'Race', writes, 1))
+    assert results[saved] is None and results[insert] is None
+    assert results[beaten] == CONFLICT and beaten.current['updatedBy'] == 'them'
+    assert 'was deleted by another editor' in results[gone]
+
+def test_unchanged_update_is_not_sent():
+    race = FakeCollection(elf())
+    write = PendingWrite('update', 'Race', 1, 'Race.Elf', document=elf(), original=elf())
+    assert flush_writes({'Race': race}, [write]) == [(write, None)]
+    assert race.batches == []